@@ -24,7 +24,15 @@ Or with schema validation:
 
 # Core - always available, zero heavy deps
 from .core import reliable, reliable_node
-from .fuse import Fuse, LoopError
+from .fuse import (
+    Fuse,
+    CycleDetector,
+    CycleError,
+    FingerprintSpec,
+    LoopError,
+    SimilarityFuse,
+    SketchHistory,
+)
 from .sentinel import Sentinel, SentinelError
 from .storage import (
     InMemoryStorage,
@@ -39,7 +47,24 @@ from .storage import (
 from .medic import Medic, MedicError, RecoveryResult
 
 # Budget - cost-saving circuit breakers
-from .budget import BudgetFuse, TimeoutFuse, GlobalBudget
+from .budget import (
+    BudgetFuse,
+    SpendVelocityFuse,
+    TimeoutFuse,
+    GlobalBudget,
+    BudgetTree,
+    BudgetLedger,
+    SQLiteLedger,
+    SharedMemoryLedger,
+    RateLimiter,
+    SlidingWindowLimiter,
+    TokenBucketLimiter,
+    GCRALimiter,
+    deadline,
+    time_remaining,
+)
+from .cache import BaseCache, LRUCache, SQLiteCache, ShelveCache, create_cache
+from .breaker import BreakerState, CircuitBreaker, FallbackCache, get_breaker
 
 # Pricing - model cost calculation
 from .pricing import CostCalculator, ModelPricing, MODEL_PRICING, get_model_pricing
@@ -56,6 +81,8 @@ from .errors import (
     ProviderError,
     BudgetExceededError,
     TimeoutExceededError,
+    CircuitOpenError,
+    RateLimitExceededError,
 )
 
 # Strategies - lightweight
@@ -111,6 +138,11 @@ __all__ = [
     "reliable_node",
     # Core components
     "Fuse",
+    "FingerprintSpec",
+    "CycleDetector",
+    "CycleError",
+    "SimilarityFuse",
+    "SketchHistory",
     "LoopError",
     "Medic",
     "MedicError",
@@ -119,8 +151,30 @@ __all__ = [
     "SentinelError",
     # Budget / Cost-saving
     "BudgetFuse",
+    "SpendVelocityFuse",
     "TimeoutFuse",
     "GlobalBudget",
+    "BudgetTree",
+    "BudgetLedger",
+    "SQLiteLedger",
+    "SharedMemoryLedger",
+    "RateLimiter",
+    "SlidingWindowLimiter",
+    "TokenBucketLimiter",
+    "GCRALimiter",
+    "deadline",
+    "time_remaining",
+    # Result cache
+    "BaseCache",
+    "LRUCache",
+    "SQLiteCache",
+    "ShelveCache",
+    "create_cache",
+    # Circuit breaker
+    "BreakerState",
+    "CircuitBreaker",
+    "FallbackCache",
+    "get_breaker",
     # Pricing
     "CostCalculator",
     "ModelPricing",
@@ -144,6 +198,8 @@ __all__ = [
     "ProviderError",
     "BudgetExceededError",
     "TimeoutExceededError",
+    "CircuitOpenError",
+    "RateLimitExceededError",
     # Strategies
     "RepairStrategy",
     "StrategyChain",
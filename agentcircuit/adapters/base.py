@@ -7,6 +7,8 @@ from typing import Any, Callable, Dict, List, Optional, Type, TypeVar
 
 from pydantic import BaseModel
 
+from ..fuse import CycleDetector
+
 
 @dataclass
 class AdapterConfig:
@@ -15,6 +17,8 @@ class AdapterConfig:
     # Fuse settings
     fuse_enabled: bool = True
     fuse_limit: int = 3
+    # Shared run-level detector for loops spanning several agents/nodes
+    cycle_detector: Optional[CycleDetector] = None
 
     # Medic settings
     medic_enabled: bool = True
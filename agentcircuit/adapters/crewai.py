@@ -118,26 +118,27 @@ class CrewAIAdapter(FrameworkAdapter):
             diagnosis = None
             current_error = None
 
-            # Fuse check
-            if fuse and storage:
-                history = storage.get_run_history(run_id)
-                node_history = [
-                    fuse._hash_state(h["input_state"])
-                    for h in history if h["node_id"] == actual_name
-                ]
-                try:
-                    fuse.check(history=node_history, current_state=state)
-                except LoopError as e:
-                    if storage:
-                        storage.log_trace(
-                            run_id=run_id,
-                            node_id=actual_name,
-                            input_state=state,
-                            output_state=None,
-                            status="failed_loop",
-                            recovery_attempts=0
-                        )
-                    raise e
+            # Fuse check (this node) and cycle check (across agents)
+            state_hash = None
+            cycle_detector = self.config.cycle_detector
+            try:
+                if fuse and storage:
+                    state_hash = fuse._hash_state(state)
+                    fuse.check_run(storage, run_id, actual_name, state_hash)
+                if cycle_detector is not None:
+                    cycle_detector.observe(run_id, actual_name, state, state_hash=state_hash)
+            except LoopError as e:
+                if storage:
+                    storage.log_trace(
+                        run_id=run_id,
+                        node_id=actual_name,
+                        input_state=state,
+                        output_state=None,
+                        status="failed_loop",
+                        recovery_attempts=0,
+                        state_hash=state_hash
+                    )
+                raise e
 
             # Execute
             try:
@@ -201,7 +202,8 @@ class CrewAIAdapter(FrameworkAdapter):
                         status="failed",
                         recovery_attempts=recovery_count,
                         diagnosis=diagnosis,
-                        duration_ms=duration_ms
+                        duration_ms=duration_ms,
+                        state_hash=state_hash
                     )
                 raise current_error
 
@@ -215,7 +217,8 @@ class CrewAIAdapter(FrameworkAdapter):
                     status=status,
                     recovery_attempts=recovery_count,
                     diagnosis=diagnosis,
-                    duration_ms=duration_ms
+                    duration_ms=duration_ms,
+                    state_hash=state_hash
                 )
 
             return result
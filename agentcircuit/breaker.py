@@ -0,0 +1,297 @@
+"""
+Per-node circuit breaker for AgentCircuit.
+
+Provides:
+- CircuitBreaker: closed/open/half-open state machine with fast rejection
+- BreakerState: The breaker states
+- FallbackCache: Last-known-good outputs served while a breaker is open
+- get_breaker: Process-wide breaker registry keyed by node name
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict, deque
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+from .errors import CircuitOpenError
+from .fuse import FingerprintSpec, hash_state
+
+
+class BreakerState(Enum):
+    """States of a circuit breaker."""
+    CLOSED = "closed"        # Calls flow; failures are counted
+    OPEN = "open"            # Calls are rejected without running the node
+    HALF_OPEN = "half_open"  # A limited number of probe calls are let through
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker for one node.
+
+    Opens after failure_threshold failures within window_seconds. While
+    open, calls are rejected immediately with CircuitOpenError: the node,
+    its Medic repairs and their LLM spend are all skipped. After
+    recovery_timeout seconds the breaker goes half-open and lets up to
+    half_open_max_calls probes through at a time; success_threshold
+    successful probes close it again, and any failed probe reopens it.
+
+    Thread-safe. The state and counters are plain attributes, so reading
+    them is cheap; see stats for a snapshot.
+
+    Usage:
+        @reliable(circuit_breaker=CircuitBreaker(failure_threshold=3))
+        def call_search_api(state):
+            ...
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        window_seconds: float = 60.0,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        success_threshold: int = 1,
+        name: Optional[str] = None,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        if half_open_max_calls < 1 or success_threshold < 1:
+            raise ValueError("half_open_max_calls and success_threshold must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.success_threshold = success_threshold
+        self.name = name
+
+        self.state = BreakerState.CLOSED
+        self._failures: "deque[float]" = deque()
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejections = 0
+        self.times_opened = 0
+
+    def before_call(self) -> bool:
+        """
+        Admit or reject a call.
+
+        Returns:
+            True if the call took a half-open probe slot. Its outcome must be
+            recorded, or the slot handed back with release_probe().
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with all
+                probe slots taken
+        """
+        if self.state is BreakerState.CLOSED:
+            # Unlocked fast path; a racing open only admits one extra call
+            self.calls += 1
+            return False
+
+        with self._lock:
+            now = time.monotonic()
+            if self.state is BreakerState.OPEN:
+                if now - self._opened_at < self.recovery_timeout:
+                    self.rejections += 1
+                    raise CircuitOpenError(
+                        f"Circuit open for node '{self.name}': call rejected",
+                        node_id=self.name,
+                        retry_after=self.recovery_timeout - (now - self._opened_at),
+                    )
+                self.state = BreakerState.HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+
+            if self.state is BreakerState.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_max_calls:
+                    self.rejections += 1
+                    raise CircuitOpenError(
+                        f"Circuit half-open for node '{self.name}': probe limit reached",
+                        node_id=self.name,
+                        retry_after=0.0,
+                    )
+                self._probes_in_flight += 1
+                self.calls += 1
+                return True
+            self.calls += 1
+            return False
+
+    def record_success(self) -> None:
+        """Record a successful call."""
+        with self._lock:
+            self.successes += 1
+            if self.state is BreakerState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._probe_successes += 1
+                if self._probe_successes >= self.success_threshold:
+                    self.state = BreakerState.CLOSED
+                    self._failures.clear()
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the breaker if needed."""
+        with self._lock:
+            self.failures += 1
+            now = time.monotonic()
+            if self.state is BreakerState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._open(now)
+                return
+            if self.state is BreakerState.OPEN:
+                return
+
+            failures = self._failures
+            failures.append(now)
+            cutoff = now - self.window_seconds
+            while failures and failures[0] < cutoff:
+                failures.popleft()
+            if len(failures) >= self.failure_threshold:
+                self._open(now)
+
+    def release_probe(self) -> None:
+        """Hand back a probe slot whose call ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            if self.state is BreakerState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _open(self, now: float) -> None:
+        self.state = BreakerState.OPEN
+        self._opened_at = now
+        self._failures.clear()
+        self.times_opened += 1
+
+    def reset(self) -> None:
+        """Close the breaker and forget recent failures (counters are kept)."""
+        with self._lock:
+            self.state = BreakerState.CLOSED
+            self._failures.clear()
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the breaker state and counters."""
+        return {
+            "name": self.name,
+            "state": self.state.value,
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejections": self.rejections,
+            "times_opened": self.times_opened,
+        }
+
+
+class FallbackCache:
+    """
+    Last-known-good outputs of one node, keyed by input fingerprint.
+
+    reliable_node stores every output that passed Sentinel on the first
+    attempt (Medic repairs are not stored), and while the node's circuit
+    breaker is open serves the stored output for an equivalent input
+    instead of rejecting the call. Such calls are traced with status
+    "fallback".
+
+    Bounded to max_size entries (least recently used are evicted) and
+    entries older than ttl_seconds are never served. Served outputs are
+    copies, so callers cannot alter the cached value.
+
+    Usage:
+        @reliable(
+            circuit_breaker=True,
+            fallback=FallbackCache(ttl_seconds=600, fingerprint=FingerprintSpec(include=["query"])),
+        )
+        def search(state):
+            ...
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl_seconds: Optional[float] = 3600.0,
+        fingerprint: Optional[FingerprintSpec] = None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._extract = fingerprint.compile() if fingerprint is not None else None
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, state: Any) -> str:
+        """Fingerprint of an input state."""
+        if self._extract is not None:
+            state = self._extract(state)
+        return hash_state(state)
+
+    def store(self, state: Any, result: Any) -> None:
+        """Remember a validated output for this input."""
+        key = self.key(state)
+        # Copy so the caller that produced result cannot alter the stored one
+        result = copy.deepcopy(result)
+        with self._lock:
+            entries = self._entries
+            entries[key] = (time.monotonic(), result)
+            entries.move_to_end(key)
+            if len(entries) > self.max_size:
+                entries.popitem(last=False)
+
+    def lookup(self, state: Any) -> Tuple[bool, Any]:
+        """
+        Find the last good output for an equivalent input.
+
+        Returns:
+            (found, output); output is a copy of the stored value
+        """
+        key = self.key(state)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None:
+                if time.monotonic() - entry[0] > self.ttl_seconds:
+                    del self._entries[key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+        return True, copy.deepcopy(entry[1])
+
+    def clear(self) -> None:
+        """Drop all stored outputs."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(node_id: str, **settings: Any) -> CircuitBreaker:
+    """
+    Get the process-wide breaker for a node, creating it on first use.
+
+    Every reliable node with the same name shares one breaker, across runs.
+    settings are CircuitBreaker arguments, only used on creation.
+    """
+    breaker = _breakers.get(node_id)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(node_id)
+            if breaker is None:
+                breaker = _breakers[node_id] = CircuitBreaker(name=node_id, **settings)
+    return breaker
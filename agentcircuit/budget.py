@@ -3,14 +3,38 @@ Cost-saving circuit breakers for AgentCircuit.
 
 Provides:
 - BudgetFuse: Trips when cumulative dollar spend exceeds a threshold
-- TimeoutFuse: Trips when execution time exceeds a limit
+- SpendVelocityFuse: Trips a run whose cost or latency per step spikes above the node's baseline
+- TimeoutFuse: Trips when execution time exceeds a limit, cutting off slow nodes
 - GlobalBudget: Thread-safe shared budget across multiple nodes/runs
+- SQLiteLedger / SharedMemoryLedger: Share a GlobalBudget across processes
+- BudgetTree: Hierarchical global → tenant → run → node budgets
+- SlidingWindowLimiter / TokenBucketLimiter / GCRALimiter: Throughput limits
+- deadline / time_remaining: The current call's deadline, for I/O timeouts
 """
+import asyncio
+import contextlib
+import contextvars
+import json
+import math
+import multiprocessing
+import os
+import socket
+import sqlite3
+import struct
+import tempfile
 import time
 import threading
-from typing import Optional
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 
-from .errors import BudgetExceededError, TimeoutExceededError
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .errors import BudgetExceededError, RateLimitExceededError, TimeoutExceededError
 
 
 class BudgetFuse:
@@ -20,6 +44,13 @@ class BudgetFuse:
     Trips when the cumulative cost for a run exceeds max_cost_usd.
     Queries the storage layer to get the current run cost.
 
+    Concurrent calls in one run reserve their estimated cost up front
+    (reserve), so they cannot all pass the check and overshoot together;
+    the hold is dropped (commit/release) once the actual cost is logged.
+    Holds are kept per run in one process-wide table shared by every
+    BudgetFuse, so parallel branches of a run through different nodes see
+    each other's reservations.
+
     Usage:
         @reliable(max_cost_usd=1.0)
         def my_node(state):
@@ -31,6 +62,10 @@ class BudgetFuse:
             raise ValueError("max_cost_usd must be positive")
         self.max_cost_usd = max_cost_usd
 
+    # run_id -> total held, shared by all BudgetFuse instances (all nodes)
+    _reserved: Dict[str, float] = {}
+    _lock = threading.Lock()
+
     def check(self, current_cost: float) -> None:
         """
         Check if the current cumulative cost exceeds the budget.
@@ -48,12 +83,267 @@ class BudgetFuse:
                 limit=self.max_cost_usd,
             )
 
+    def reserve(self, run_id: str, current_cost: float, amount: float) -> None:
+        """
+        Hold amount of the run's budget for a call about to start.
+
+        Args:
+            run_id: The run the call belongs to
+            current_cost: The run's logged cost so far
+            amount: Estimated cost of the call
+
+        Raises:
+            BudgetExceededError: If logged cost, other holds and amount exceed the budget
+        """
+        with self._lock:
+            held = self._reserved.get(run_id, 0.0)
+            if current_cost + held + amount > self.max_cost_usd:
+                raise BudgetExceededError(
+                    f"Budget reservation refused: ${current_cost + held:.4f} spent or reserved "
+                    f"+ ${amount:.4f} estimated > ${self.max_cost_usd:.4f} limit",
+                    spent=current_cost + held,
+                    limit=self.max_cost_usd,
+                )
+            self._reserved[run_id] = held + amount
+
+    def release(self, run_id: str, amount: float) -> None:
+        """Drop a hold, e.g. when the call did not run."""
+        with self._lock:
+            held = self._reserved.get(run_id, 0.0) - amount
+            if held > 1e-12:
+                self._reserved[run_id] = held
+            else:
+                self._reserved.pop(run_id, None)
+
+    def commit(self, run_id: str, amount: float) -> None:
+        """Drop a hold once the call's actual cost has been logged to storage."""
+        self.release(run_id, amount)
+
+    def reserved(self, run_id: str) -> float:
+        """Total held for a run."""
+        with self._lock:
+            return self._reserved.get(run_id, 0.0)
+
+
+class SpendVelocityFuse:
+    """
+    Anomaly breaker on spend velocity.
+
+    A runaway run shows up as a jump in cost (or latency) per step long
+    before it reaches an absolute limit. Each node keeps an exponentially
+    weighted baseline (mean and variance) of its per-step estimated_cost
+    and latency across runs, and each run an EWMA of its own recent steps.
+    A run whose EWMA exceeds the node's baseline mean by k standard
+    deviations trips before its next step. Its anomalous steps are kept out
+    of the baseline.
+
+    The baseline is updated one step at a time and saved through the
+    storage settings (key "spend_velocity:<node_id>"), so it survives
+    restarts without rescanning traces.
+
+    Usage:
+        @reliable(spend_velocity=SpendVelocityFuse(k=4.0))
+        def my_node(state):
+            return expensive_llm_call(state)
+    """
+
+    METRICS = ("cost", "latency")
+
+    def __init__(
+        self,
+        k: float = 4.0,
+        alpha: float = 0.3,
+        baseline_alpha: float = 0.02,
+        min_samples: int = 20,
+        min_std_ratio: float = 0.1,
+        metrics: Tuple[str, ...] = METRICS,
+        persist_every: int = 10,
+        max_runs: int = 10_000,
+    ):
+        """
+        Args:
+            k: Standard deviations above the baseline mean that trip a run
+            alpha: EWMA weight of a run's latest step
+            baseline_alpha: EWMA weight of a step in the node baseline
+            min_samples: Baseline steps needed before anything trips
+            min_std_ratio: Floor on the standard deviation as a fraction of
+                the mean, so a near-constant baseline does not trip on noise
+            metrics: Which of "cost" and "latency" to watch
+            persist_every: Save the baseline to storage every this many steps
+            max_runs: Runs tracked at once (least recently seen are dropped)
+        """
+        if k <= 0:
+            raise ValueError("k must be positive")
+        if not 0 < alpha <= 1 or not 0 < baseline_alpha <= 1:
+            raise ValueError("alpha and baseline_alpha must be in (0, 1]")
+        unknown = set(metrics) - set(self.METRICS)
+        if unknown:
+            raise ValueError(f"unknown metrics {sorted(unknown)}, expected {self.METRICS}")
+        self.k = k
+        self.alpha = alpha
+        self.baseline_alpha = baseline_alpha
+        self.min_samples = min_samples
+        self.min_std_ratio = min_std_ratio
+        self.metrics = tuple(metrics)
+        self.persist_every = persist_every
+        self.max_runs = max_runs
+        # node_id -> [count, cost mean, cost variance, latency mean, latency variance]
+        self._baselines: Dict[str, List[float]] = {}
+        # (run_id, node_id) -> [cost EWMA, latency EWMA]
+        self._runs: "OrderedDict[Tuple[Any, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(node_id: str) -> str:
+        return f"spend_velocity:{node_id}"
+
+    def _baseline(self, node_id: str, storage: Any) -> List[float]:
+        baseline = self._baselines.get(node_id)
+        if baseline is None:
+            saved = storage.get_setting(self._key(node_id)) if storage is not None else None
+            baseline = json.loads(saved) if saved else [0, 0.0, 0.0, 0.0, 0.0]
+            self._baselines[node_id] = baseline
+        return baseline
+
+    def _anomaly(self, baseline: List[float], run: List[float]) -> Optional[Tuple[str, float, float]]:
+        """The first watched metric whose run EWMA is past the threshold, as (metric, value, threshold)."""
+        if baseline[0] < self.min_samples:
+            return None
+        for metric in self.metrics:
+            i = self.METRICS.index(metric)
+            mean, variance = baseline[1 + 2 * i], baseline[2 + 2 * i]
+            if mean <= 0:
+                continue
+            threshold = mean + self.k * max(math.sqrt(variance), self.min_std_ratio * mean)
+            if run[i] > threshold:
+                return metric, run[i], threshold
+        return None
+
+    def check(self, run_id: Any, node_id: str, storage: Any = None) -> None:
+        """
+        Check the run's recent steps at this node against the node's baseline.
+
+        Raises:
+            BudgetExceededError: If the run's cost or latency per step is anomalous
+        """
+        with self._lock:
+            run = self._runs.get((run_id, node_id))
+            if run is None:
+                return
+            anomaly = self._anomaly(self._baseline(node_id, storage), run)
+        if anomaly is not None:
+            metric, value, threshold = anomaly
+            unit = "$" if metric == "cost" else ""
+            suffix = "" if metric == "cost" else "s"
+            raise BudgetExceededError(
+                f"Spend velocity anomaly in run {run_id} at {node_id}: {metric} per step "
+                f"{unit}{value:.4f}{suffix} > {unit}{threshold:.4f}{suffix} (baseline + {self.k:g} std)",
+                spent=value,
+                limit=threshold,
+            )
+
+    def observe(self, run_id: Any, node_id: str, cost: float, seconds: float, storage: Any = None) -> None:
+        """Record one completed step of a run, folding it into the baseline unless it is anomalous."""
+        sample = (cost, seconds)
+        persist = None
+        with self._lock:
+            key = (run_id, node_id)
+            run = self._runs.get(key)
+            if run is None:
+                run = self._runs[key] = list(sample)
+                if len(self._runs) > self.max_runs:
+                    self._runs.popitem(last=False)
+            else:
+                self._runs.move_to_end(key)
+                for i, x in enumerate(sample):
+                    run[i] += self.alpha * (x - run[i])
+
+            baseline = self._baseline(node_id, storage)
+            if self._anomaly(baseline, run) is not None:
+                return
+            # Incremental EWMA mean and variance; a plain average until 1/alpha steps
+            count = baseline[0] + 1
+            weight = max(self.baseline_alpha, 1.0 / count)
+            baseline[0] = count
+            for i, x in enumerate(sample):
+                mean, variance = baseline[1 + 2 * i], baseline[2 + 2 * i]
+                diff = x - mean
+                baseline[1 + 2 * i] = mean + weight * diff
+                baseline[2 + 2 * i] = (1 - weight) * (variance + weight * diff * diff)
+            if storage is not None and count % self.persist_every == 0:
+                persist = json.dumps(baseline)
+        if persist is not None:
+            storage.set_setting(self._key(node_id), persist)
+
+    def baseline(self, node_id: str, storage: Any = None) -> Dict[str, float]:
+        """The node's baseline: samples, and mean and std of cost and latency per step."""
+        with self._lock:
+            count, cost, cost_var, latency, latency_var = self._baseline(node_id, storage)
+        return {
+            "samples": count,
+            "cost_mean": cost,
+            "cost_std": math.sqrt(cost_var),
+            "latency_mean": latency,
+            "latency_std": math.sqrt(latency_var),
+        }
+
+    def forget(self, run_id: Any) -> None:
+        """Drop a run's recent-step averages, e.g. to let a tripped run resume."""
+        with self._lock:
+            for key in [key for key in self._runs if key[0] == run_id]:
+                del self._runs[key]
+
+
+# Absolute time.monotonic() deadline of the innermost timed call
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "agentcircuit_deadline", default=None
+)
+
+
+@contextlib.contextmanager
+def deadline(seconds: float) -> Iterator[float]:
+    """
+    Set the deadline for the code in the block, never extending an outer one.
+
+    Yields:
+        The effective absolute deadline (time.monotonic() based)
+    """
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None and outer < at:
+        at = outer
+    token = _deadline.set(at)
+    try:
+        yield at
+    finally:
+        _deadline.reset(token)
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current deadline (may be negative), or None without one."""
+    at = _deadline.get()
+    if at is None:
+        return None
+    return at - time.monotonic()
+
 
 class TimeoutFuse:
     """
     Time-based circuit breaker.
 
-    Trips when elapsed execution time exceeds max_seconds.
+    Trips when elapsed execution time exceeds max_seconds. reliable_node
+    enforces the limit preemptively through run/arun: a sync node runs
+    under a watchdog and the caller gets TimeoutExceededError at the limit,
+    an async node is cancelled. Provider calls made inside the node see the
+    remaining time through time_remaining() and shorten their timeouts.
+
+    With isolation="thread" (default) the node runs in a worker thread,
+    which cannot be killed: a timed-out node keeps running in the
+    background, but its result is discarded. isolation="process" runs the
+    node in a forked child process that is terminated at the limit; the
+    node's arguments are inherited, its return value must be picklable and
+    side effects on its arguments are not seen by the caller. Requires the
+    fork start method (POSIX).
 
     Usage:
         @reliable(max_seconds=30)
@@ -61,10 +351,105 @@ class TimeoutFuse:
             return slow_operation(state)
     """
 
-    def __init__(self, max_seconds: float):
+    def __init__(self, max_seconds: float, isolation: str = "thread"):
         if max_seconds <= 0:
             raise ValueError("max_seconds must be positive")
+        if isolation not in ("thread", "process"):
+            raise ValueError("isolation must be 'thread' or 'process'")
+        if isolation == "process" and "fork" not in multiprocessing.get_all_start_methods():
+            raise ValueError("isolation='process' needs the fork start method")
         self.max_seconds = max_seconds
+        self.isolation = isolation
+
+    def _expired(self, start_time: float) -> TimeoutExceededError:
+        elapsed = time.time() - start_time
+        return TimeoutExceededError(
+            f"Timeout exceeded: node cut off after {elapsed:.1f}s ({self.max_seconds:.1f}s limit)",
+            elapsed=elapsed,
+            limit=self.max_seconds,
+        )
+
+    def run(self, func: Callable[..., Any], args: tuple, kwargs: dict, start_time: float) -> Any:
+        """
+        Call func, giving up when max_seconds have passed since start_time.
+
+        Raises:
+            TimeoutExceededError: If func has not returned in time
+        """
+        remaining = self.max_seconds - (time.time() - start_time)
+        if remaining <= 0:
+            raise self._expired(start_time)
+        if self.isolation == "process":
+            return self._run_in_process(func, args, kwargs, remaining, start_time)
+
+        # Copy the context so the node sees the deadline
+        context = contextvars.copy_context()
+        outcome: dict = {}
+        done = threading.Event()
+
+        def target():
+            try:
+                outcome["result"] = context.run(func, *args, **kwargs)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                done.set()
+
+        # A fresh thread per call: a hung node must not hold up later calls
+        threading.Thread(target=target, name="agentcircuit-timeout", daemon=True).start()
+        if not done.wait(remaining):
+            raise self._expired(start_time)
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def _run_in_process(
+        self, func: Callable[..., Any], args: tuple, kwargs: dict, remaining: float, start_time: float
+    ) -> Any:
+        ctx = multiprocessing.get_context("fork")
+        receiver, sender = ctx.Pipe(duplex=False)
+
+        def target():
+            try:
+                outcome = (True, func(*args, **kwargs))
+            except BaseException as e:
+                outcome = (False, e)
+            try:
+                sender.send(outcome)
+            except Exception as e:
+                # Unpicklable result or exception
+                sender.send((False, RuntimeError(f"Node outcome could not be returned: {e!r}")))
+
+        process = ctx.Process(target=target, name="agentcircuit-timeout", daemon=True)
+        process.start()
+        sender.close()
+        try:
+            if not receiver.poll(remaining):
+                process.terminate()
+                raise self._expired(start_time)
+            ok, value = receiver.recv()
+        except EOFError:
+            raise RuntimeError(f"Node process exited with code {process.exitcode} without a result")
+        finally:
+            receiver.close()
+            process.join(1.0)
+        if not ok:
+            raise value
+        return value
+
+    async def arun(self, awaitable: Awaitable[Any], start_time: float) -> Any:
+        """
+        Await a coroutine, cancelling it when max_seconds have passed since start_time.
+
+        Raises:
+            TimeoutExceededError: If it has not completed in time
+        """
+        remaining = self.max_seconds - (time.time() - start_time)
+        try:
+            # asyncio.timeout needs 3.11; wait_for gives the same cancellation
+            return await asyncio.wait_for(awaitable, max(remaining, 0))
+        except asyncio.TimeoutError:
+            raise self._expired(start_time) from None
 
     def check(self, start_time: float) -> None:
         """
@@ -85,6 +470,289 @@ class TimeoutFuse:
             )
 
 
+class BudgetLedger(ABC):
+    """
+    Spend counter and start time shared by GlobalBudget instances.
+
+    A GlobalBudget without a ledger only counts its own process. Give every
+    worker process a ledger with the same name (and path) to enforce one
+    limit across all of them.
+    """
+
+    @abstractmethod
+    def add(self, cost: float) -> Tuple[float, float]:
+        """Atomically add cost; returns the new (spent, start_time)."""
+        pass
+
+    @abstractmethod
+    def read(self) -> Tuple[float, float]:
+        """Current (spent, start_time)."""
+        pass
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Zero the spend and restart the clock for every process."""
+        pass
+
+    def hold(self, amount: float) -> Tuple[float, float]:
+        """
+        Add a reservation owned by this process; returns the new (spent, start_time).
+
+        Ledgers that track owners override this (and settle/reap) so holds of
+        a process that died mid-call can be reclaimed.
+        """
+        return self.add(amount)
+
+    def settle(self, reserved: float, actual: float) -> Tuple[float, float]:
+        """Replace this process's hold of reserved with the actual cost."""
+        return self.add(actual - reserved)
+
+    def reap(self, stale_seconds: float) -> float:
+        """Drop holds of dead processes (or untouched for stale_seconds); returns the amount freed."""
+        return 0.0
+
+
+def _pid_alive(pid: int) -> bool:
+    """Whether a process with this pid exists on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SQLiteLedger(BudgetLedger):
+    """
+    Ledger kept in one row of a SQLite table, updated atomically.
+
+    Works across any processes that can open the file, and survives
+    restarts (call reset to start a new budget period). Holds are kept per
+    process ("host:pid") in a side table, so those of a process killed
+    mid-call can be reaped instead of shrinking the budget for good.
+    """
+
+    def __init__(self, db_path: str = "agentcircuit_budget.db", name: str = "default"):
+        self.db_path = db_path
+        self.name = name
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS budget_ledger ("
+            "name TEXT PRIMARY KEY, spent REAL NOT NULL, start_time REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS budget_holds ("
+            "name TEXT NOT NULL, owner TEXT NOT NULL, held REAL NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (name, owner))"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO budget_ledger (name, spent, start_time) VALUES (?, 0.0, ?)",
+            (name, time.time()),
+        )
+        self._host = socket.gethostname()
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _add_held(self, conn: sqlite3.Connection, held: float, spent: float) -> Tuple[float, float]:
+        # Owner is looked up per call: a forked child must not reuse its parent's
+        owner = f"{self._host}:{os.getpid()}"
+        conn.execute(
+            "INSERT INTO budget_holds (name, owner, held, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name, owner) DO UPDATE SET held = held + excluded.held, updated_at = excluded.updated_at",
+            (self.name, owner, held, time.time()),
+        )
+        conn.execute("DELETE FROM budget_holds WHERE name = ? AND owner = ? AND held <= 1e-12", (self.name, owner))
+        return conn.execute(
+            "UPDATE budget_ledger SET spent = spent + ? WHERE name = ? RETURNING spent, start_time",
+            (spent, self.name),
+        ).fetchone()
+
+    def hold(self, amount: float) -> Tuple[float, float]:
+        with self._transaction() as conn:
+            return self._add_held(conn, amount, amount)
+
+    def settle(self, reserved: float, actual: float) -> Tuple[float, float]:
+        with self._transaction() as conn:
+            return self._add_held(conn, -reserved, actual - reserved)
+
+    def reap(self, stale_seconds: float) -> float:
+        cutoff = time.time() - stale_seconds
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT owner, held, updated_at FROM budget_holds WHERE name = ?", (self.name,)
+            ).fetchall()
+            dead = []
+            for owner, held, updated_at in rows:
+                host, _, pid = owner.rpartition(":")
+                gone = host == self._host and pid.isdigit() and not _pid_alive(int(pid))
+                if gone or updated_at < cutoff:
+                    dead.append((owner, held))
+            if not dead:
+                return 0.0
+            conn.executemany(
+                "DELETE FROM budget_holds WHERE name = ? AND owner = ?", [(self.name, o) for o, _ in dead]
+            )
+            freed = sum(held for _, held in dead)
+            conn.execute("UPDATE budget_ledger SET spent = spent - ? WHERE name = ?", (freed, self.name))
+            return freed
+
+    def add(self, cost: float) -> Tuple[float, float]:
+        with self._lock:
+            # A single UPDATE is atomic across connections
+            return self._conn.execute(
+                "UPDATE budget_ledger SET spent = spent + ? WHERE name = ? RETURNING spent, start_time",
+                (cost, self.name),
+            ).fetchone()
+
+    def read(self) -> Tuple[float, float]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT spent, start_time FROM budget_ledger WHERE name = ?", (self.name,)
+            ).fetchone()
+
+    def reset(self) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE budget_ledger SET spent = 0.0, start_time = ? WHERE name = ?",
+                (time.time(), self.name),
+            )
+            conn.execute("DELETE FROM budget_holds WHERE name = ?", (self.name,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SharedMemoryLedger(BudgetLedger):
+    """
+    Ledger in a multiprocessing.shared_memory block, for workers on one host.
+
+    Two doubles (spent, start_time) guarded by an flock()ed lock file, so
+    updates are atomic across unrelated processes (e.g. gunicorn workers).
+    The first process creates the block; it outlives every process until
+    unlink() is called. POSIX only.
+
+    Holds are kept in per-pid slots after the header, so those of a worker
+    killed mid-call are reaped once its pid is gone. Past HOLD_SLOTS
+    concurrent processes, further holds are counted without an owner.
+    """
+
+    _LAYOUT = struct.Struct("dd")
+    _SLOT = struct.Struct("qd")  # pid, held
+    HOLD_SLOTS = 64
+
+    def __init__(self, name: str = "agentcircuit_budget", lock_dir: Optional[str] = None):
+        if fcntl is None:
+            raise ValueError("SharedMemoryLedger needs fcntl (POSIX)")
+        self.name = name
+        self._thread_lock = threading.Lock()
+        lock_path = os.path.join(lock_dir or tempfile.gettempdir(), f"{name}.lock")
+        self._lock_file = open(lock_path, "a+b")
+        with self._locked():
+            try:
+                size = self._LAYOUT.size + self.HOLD_SLOTS * self._SLOT.size
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                self._shm.buf[:size] = bytes(size)
+                self._LAYOUT.pack_into(self._shm.buf, 0, 0.0, time.time())
+            except FileExistsError:
+                self._shm = shared_memory.SharedMemory(name=name)
+        # The resource tracker would unlink the block when this process exits
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._thread_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def add(self, cost: float) -> Tuple[float, float]:
+        with self._locked():
+            spent, start_time = self._LAYOUT.unpack_from(self._shm.buf, 0)
+            spent += cost
+            self._LAYOUT.pack_into(self._shm.buf, 0, spent, start_time)
+        return spent, start_time
+
+    def read(self) -> Tuple[float, float]:
+        with self._locked():
+            return self._LAYOUT.unpack_from(self._shm.buf, 0)
+
+    def _slots(self) -> Iterator[Tuple[int, int, float]]:
+        """(offset, pid, held) of every hold slot (caller holds the lock)."""
+        for i in range(self.HOLD_SLOTS):
+            offset = self._LAYOUT.size + i * self._SLOT.size
+            pid, held = self._SLOT.unpack_from(self._shm.buf, offset)
+            yield offset, pid, held
+
+    def _add_held(self, held: float, spent_delta: float) -> Tuple[float, float]:
+        with self._locked():
+            pid, free = os.getpid(), None
+            for offset, owner, current in self._slots():
+                if owner == pid:
+                    current += held
+                    self._SLOT.pack_into(self._shm.buf, offset, pid if current > 1e-12 else 0, max(current, 0.0))
+                    break
+                if owner == 0 and free is None:
+                    free = offset
+            else:
+                if free is not None and held > 0:
+                    self._SLOT.pack_into(self._shm.buf, free, pid, held)
+            spent, start_time = self._LAYOUT.unpack_from(self._shm.buf, 0)
+            spent += spent_delta
+            self._LAYOUT.pack_into(self._shm.buf, 0, spent, start_time)
+        return spent, start_time
+
+    def hold(self, amount: float) -> Tuple[float, float]:
+        return self._add_held(amount, amount)
+
+    def settle(self, reserved: float, actual: float) -> Tuple[float, float]:
+        return self._add_held(-reserved, actual - reserved)
+
+    def reap(self, stale_seconds: float) -> float:
+        """Drop holds of processes that no longer exist (slots carry no timestamp)."""
+        freed = 0.0
+        with self._locked():
+            for offset, pid, held in self._slots():
+                if pid and not _pid_alive(pid):
+                    self._SLOT.pack_into(self._shm.buf, offset, 0, 0.0)
+                    freed += held
+            if freed:
+                spent, start_time = self._LAYOUT.unpack_from(self._shm.buf, 0)
+                self._LAYOUT.pack_into(self._shm.buf, 0, spent - freed, start_time)
+        return freed
+
+    def reset(self) -> None:
+        with self._locked():
+            size = self._LAYOUT.size + self.HOLD_SLOTS * self._SLOT.size
+            self._shm.buf[:size] = bytes(size)
+            self._LAYOUT.pack_into(self._shm.buf, 0, 0.0, time.time())
+
+    def close(self) -> None:
+        """Detach this process from the block."""
+        self._shm.close()
+        self._lock_file.close()
+
+    def unlink(self) -> None:
+        """Destroy the block for every process."""
+        # unlink() unregisters the block, so hand it back to the tracker first
+        resource_tracker.register(self._shm._name, "shared_memory")
+        self._shm.unlink()
+
+
 class GlobalBudget:
     """
     Thread-safe shared budget across multiple nodes/runs.
@@ -93,6 +761,22 @@ class GlobalBudget:
     functions to enforce a total cost and/or time limit for an entire
     agent graph execution.
 
+    By default the budget lives in this process only. Pass a ledger
+    (SQLiteLedger or SharedMemoryLedger) to share it between worker
+    processes. Checks then use a local copy of the spend, refreshed from
+    the ledger when older than max_staleness seconds, so they stay cheap;
+    record_cost always updates the ledger. Other processes' spend is thus
+    seen at most max_staleness late.
+
+    Calls reserve their estimated cost before running and reconcile it to
+    the actual cost afterwards (reserve / commit / release), so concurrent
+    calls cannot all pass check_cost and overshoot together. Holds count
+    as spend until settled, in every process sharing the ledger. The ledger
+    records which process owns each hold; holds of processes that died
+    mid-call (or untouched for stale_hold_seconds) are reaped when a
+    GlobalBudget is created, when a reservation is refused, and by
+    reap_stale_holds().
+
     Usage:
         from agentcircuit import reliable, GlobalBudget
 
@@ -109,12 +793,18 @@ class GlobalBudget:
         # After execution:
         print(f"Total spent: ${budget.total_spent:.4f}")
         print(f"Remaining: ${budget.remaining:.4f}")
+
+        # One $5 limit across all gunicorn workers:
+        budget = GlobalBudget(max_cost_usd=5.0, ledger=SQLiteLedger("budget.db", name="api"))
     """
 
     def __init__(
         self,
         max_cost_usd: float,
         max_seconds: Optional[float] = None,
+        ledger: Optional[BudgetLedger] = None,
+        max_staleness: float = 0.1,
+        stale_hold_seconds: float = 3600.0,
     ):
         if max_cost_usd <= 0:
             raise ValueError("max_cost_usd must be positive")
@@ -123,9 +813,27 @@ class GlobalBudget:
 
         self.max_cost_usd = max_cost_usd
         self.max_seconds = max_seconds
+        self.ledger = ledger
+        self.max_staleness = max_staleness
+        self.stale_hold_seconds = stale_hold_seconds
         self._total_spent = 0.0
         self._start_time = time.time()
+        self._synced_at = float("-inf")
+        self._reserved = 0.0
         self._lock = threading.Lock()
+        if ledger is not None:
+            ledger.reap(stale_hold_seconds)
+            self._sync(ledger.read())
+
+    def _sync(self, snapshot: Tuple[float, float]) -> None:
+        """Store a ledger snapshot as the local copy (caller may hold the lock)."""
+        self._total_spent, self._start_time = snapshot
+        self._synced_at = time.monotonic()
+
+    def _refresh(self) -> None:
+        """Refresh the local copy from the ledger if it is too old."""
+        if self.ledger is not None and time.monotonic() - self._synced_at > self.max_staleness:
+            self._sync(self.ledger.read())
 
     def check_cost(self) -> None:
         """
@@ -134,6 +842,7 @@ class GlobalBudget:
         Raises:
             BudgetExceededError: If the budget is exceeded
         """
+        self._refresh()
         with self._lock:
             if self._total_spent >= self.max_cost_usd:
                 raise BudgetExceededError(
@@ -152,6 +861,7 @@ class GlobalBudget:
         if self.max_seconds is None:
             return
 
+        self._refresh()
         elapsed = time.time() - self._start_time
         if elapsed >= self.max_seconds:
             raise TimeoutExceededError(
@@ -167,28 +877,529 @@ class GlobalBudget:
         Args:
             cost: The cost to add to the running total
         """
+        if self.ledger is not None:
+            snapshot = self.ledger.add(cost)
+            with self._lock:
+                self._sync(snapshot)
+            return
         with self._lock:
             self._total_spent += cost
 
+    def reserve(self, amount: float) -> None:
+        """
+        Hold amount for a call about to start.
+
+        Raises:
+            BudgetExceededError: If the spend, other holds included, plus amount
+                would exceed max_cost_usd
+        """
+        if self.ledger is not None:
+            snapshot = self._try_hold(amount)
+            # Holds left by workers that died mid-call may be what is in the way
+            if snapshot is None and self.ledger.reap(self.stale_hold_seconds):
+                snapshot = self._try_hold(amount)
+            if snapshot is None:
+                self._refuse(self._total_spent, amount)
+            with self._lock:
+                self._sync(snapshot)
+                self._reserved += amount
+            return
+        with self._lock:
+            if self._total_spent + amount > self.max_cost_usd:
+                self._refuse(self._total_spent, amount)
+            self._total_spent += amount
+            self._reserved += amount
+
+    def _try_hold(self, amount: float) -> Optional[Tuple[float, float]]:
+        """Hold amount on the ledger, or undo it and return None if that would exceed the limit."""
+        snapshot = self.ledger.hold(amount)
+        if snapshot[0] > self.max_cost_usd:
+            snapshot = self.ledger.settle(amount, 0.0)
+            with self._lock:
+                self._sync(snapshot)
+            return None
+        return snapshot
+
+    def _refuse(self, spent: float, amount: float) -> None:
+        raise BudgetExceededError(
+            f"Global budget reservation refused: ${spent:.4f} spent or reserved "
+            f"+ ${amount:.4f} estimated > ${self.max_cost_usd:.4f} limit",
+            spent=spent,
+            limit=self.max_cost_usd,
+        )
+
+    def commit(self, reserved: float, actual: float) -> None:
+        """Settle a hold to the call's actual cost."""
+        if self.ledger is not None:
+            snapshot = self.ledger.settle(reserved, actual)
+            with self._lock:
+                self._sync(snapshot)
+                self._reserved -= reserved
+            return
+        self.record_cost(actual - reserved)
+        with self._lock:
+            self._reserved -= reserved
+
+    def reap_stale_holds(self) -> float:
+        """
+        Reclaim ledger holds of processes that died mid-call.
+
+        Returns:
+            The amount returned to the budget
+        """
+        if self.ledger is None:
+            return 0.0
+        freed = self.ledger.reap(self.stale_hold_seconds)
+        if freed:
+            with self._lock:
+                self._sync(self.ledger.read())
+        return freed
+
+    def release(self, reserved: float) -> None:
+        """Drop a hold for a call that incurred no cost."""
+        self.commit(reserved, 0.0)
+
+    @property
+    def reserved(self) -> float:
+        """Get the amount held by this process's unsettled calls."""
+        with self._lock:
+            return self._reserved
+
     @property
     def total_spent(self) -> float:
-        """Get the total amount spent so far."""
+        """Get the total amount spent so far, unsettled holds included."""
+        if self.ledger is not None:
+            self._sync(self.ledger.read())
         with self._lock:
             return self._total_spent
 
     @property
     def remaining(self) -> float:
         """Get the remaining budget."""
-        with self._lock:
-            return max(0.0, self.max_cost_usd - self._total_spent)
+        return max(0.0, self.max_cost_usd - self.total_spent)
 
     @property
     def elapsed_seconds(self) -> float:
         """Get the elapsed time since the budget was created."""
+        self._refresh()
         return time.time() - self._start_time
 
+    @property
+    def remaining_seconds(self) -> Optional[float]:
+        """Get the time left before max_seconds (None without a time limit)."""
+        if self.max_seconds is None:
+            return None
+        self._refresh()
+        return self.max_seconds - (time.time() - self._start_time)
+
     def reset(self) -> None:
-        """Reset the budget (useful for restarting a graph run)."""
+        """Reset the budget (useful for restarting a graph run); resets the ledger too."""
+        if self.ledger is not None:
+            self.ledger.reset()
+            with self._lock:
+                self._sync(self.ledger.read())
+            return
         with self._lock:
             self._total_spent = 0.0
             self._start_time = time.time()
+
+
+class BudgetTree:
+    """
+    Hierarchical budget: global → tenant → run → node.
+
+    Spend is recorded against a path (tenant, run_id, node) and rolls up to
+    every level above it in one atomic step; a reservation is refused if any
+    level would go over its limit. Each level has a default limit (None: no
+    limit) that set_limit overrides for specific tenants, runs or nodes.
+
+    Counters are lock-striped: a path's levels are guarded by the stripes
+    their keys hash to, so concurrent runs rarely share a lock. The global
+    total is sharded across the stripes and summed without locking, so the
+    global limit can be passed by the amounts reserved in the same instant.
+
+    Run and node counters of the least recently active runs are dropped
+    past max_runs (spend rolled up to tenant and global is kept), so a
+    long-lived tree does not grow with every run it has seen.
+
+    Usage:
+        tree = BudgetTree(max_cost_usd=500.0, tenant_limit=20.0, run_limit=2.0)
+        tree.set_limit(("acme",), 100.0)
+
+        @reliable(budget_tree=tree)
+        def node_a(state):
+            ...
+
+        node_a(state, config={"configurable": {"tenant_id": "acme", "thread_id": "run-1"}})
+        tree.spent(("acme",))
+    """
+
+    LEVELS = ("global", "tenant", "run", "node")
+
+    def __init__(
+        self,
+        max_cost_usd: Optional[float] = None,
+        tenant_limit: Optional[float] = None,
+        run_limit: Optional[float] = None,
+        node_limit: Optional[float] = None,
+        stripes: int = 64,
+        max_runs: int = 10000,
+    ):
+        for limit in (max_cost_usd, tenant_limit, run_limit, node_limit):
+            if limit is not None and limit <= 0:
+                raise ValueError("budget limits must be positive")
+        if stripes < 1:
+            raise ValueError("stripes must be at least 1")
+        if max_runs < 1:
+            raise ValueError("max_runs must be at least 1")
+        self.max_runs = max_runs
+        self._defaults = (max_cost_usd, tenant_limit, run_limit, node_limit)
+        self._limits: Dict[Tuple[str, ...], float] = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._spent: List[Dict[Tuple[str, ...], float]] = [{} for _ in range(stripes)]
+        self._global = [0.0] * stripes
+        # (tenant, run) -> its node paths, least recently active first
+        self._runs: "OrderedDict[Tuple[str, ...], set]" = OrderedDict()
+        self._runs_lock = threading.Lock()
+
+    def _stripe(self, key: Tuple[str, ...]) -> int:
+        return hash(key) % len(self._locks)
+
+    def set_limit(self, path: Tuple[str, ...], max_cost_usd: Optional[float]) -> None:
+        """Set the limit of one tenant, run or node (None restores the level default)."""
+        if not 1 <= len(path) <= 3:
+            raise ValueError("path must be (tenant,), (tenant, run) or (tenant, run, node)")
+        if max_cost_usd is None:
+            self._limits.pop(path, None)
+        elif max_cost_usd <= 0:
+            raise ValueError("budget limits must be positive")
+        else:
+            self._limits[path] = max_cost_usd
+
+    def limit(self, path: Tuple[str, ...] = ()) -> Optional[float]:
+        """Effective limit of a level (() is the global level)."""
+        return self._limits.get(path, self._defaults[len(path)])
+
+    def spent(self, path: Tuple[str, ...] = ()) -> float:
+        """Spend of a level, unsettled reservations included (() is the global level)."""
+        if not path:
+            return sum(self._global)
+        stripe = self._stripe(path)
+        with self._locks[stripe]:
+            return self._spent[stripe].get(path, 0.0)
+
+    def reserve(self, path: Tuple[str, ...], amount: float) -> None:
+        """
+        Hold amount on every level of path.
+
+        Raises:
+            BudgetExceededError: If any level is spent, or would go over its limit
+        """
+        self._apply(path, amount, check=True)
+
+    def commit(self, path: Tuple[str, ...], reserved: float, actual: float) -> None:
+        """Settle a hold to the actual cost."""
+        self._apply(path, actual - reserved, check=False)
+
+    def release(self, path: Tuple[str, ...], reserved: float) -> None:
+        """Drop a hold for a call that incurred no cost."""
+        self._apply(path, -reserved, check=False)
+
+    def record_cost(self, path: Tuple[str, ...], cost: float) -> None:
+        """Add a cost to every level of path."""
+        self._apply(path, cost, check=False)
+
+    def _apply(self, path: Tuple[str, ...], amount: float, check: bool) -> None:
+        keys = [path[:depth] for depth in range(1, len(path) + 1)]
+        stripes = [self._stripe(key) for key in keys]
+        # The global shard lives under the stripe of the full path
+        shard = self._stripe(path)
+        held = sorted(set(stripes) | {shard})
+        for index in held:  # Always in ascending order, so no deadlocks
+            self._locks[index].acquire()
+        try:
+            if check:
+                for key, stripe in zip(keys, stripes):
+                    self._check(key, self._spent[stripe].get(key, 0.0), amount)
+                self._check((), sum(self._global), amount)
+            for key, stripe in zip(keys, stripes):
+                counters = self._spent[stripe]
+                counters[key] = counters.get(key, 0.0) + amount
+            self._global[shard] += amount
+        finally:
+            for index in reversed(held):
+                self._locks[index].release()
+        if len(path) >= 2:
+            self._touch(path)
+
+    def _touch(self, path: Tuple[str, ...]) -> None:
+        """Mark path's run as active, dropping the counters of runs past max_runs."""
+        run = path[:2]
+        with self._runs_lock:
+            nodes = self._runs.get(run)
+            if nodes is None:
+                nodes = self._runs[run] = set()
+            else:
+                self._runs.move_to_end(run)
+            if len(path) > 2:
+                nodes.add(path)
+            evicted = []
+            while len(self._runs) > self.max_runs:
+                evicted.append(self._runs.popitem(last=False))
+        for run, nodes in evicted:
+            for key in (run, *nodes):
+                stripe = self._stripe(key)
+                with self._locks[stripe]:
+                    self._spent[stripe].pop(key, None)
+
+    def _check(self, key: Tuple[str, ...], spent: float, amount: float) -> None:
+        limit = self.limit(key)
+        if limit is not None and (spent >= limit or spent + amount > limit):
+            level = self.LEVELS[len(key)]
+            where = f" {'/'.join(key)}" if key else ""
+            raise BudgetExceededError(
+                f"Budget exceeded at {level}{where}: ${spent:.4f} spent or reserved "
+                f"+ ${amount:.4f} estimated > ${limit:.4f} limit",
+                spent=spent,
+                limit=limit,
+            )
+
+    def forget(self, path: Tuple[str, ...]) -> None:
+        """
+        Drop the counters of a finished run (or tenant) and everything below it.
+
+        Spend already rolled up to the levels above is kept.
+        """
+        depth = len(path)
+        for lock, counters in zip(self._locks, self._spent):
+            with lock:
+                for key in [key for key in counters if key[:depth] == path]:
+                    del counters[key]
+        with self._runs_lock:
+            if depth > 2:
+                nodes = self._runs.get(path[:2])
+                if nodes is not None:
+                    nodes.discard(path)
+            else:
+                for run in [run for run in self._runs if run[:depth] == path]:
+                    del self._runs[run]
+
+
+class RateLimiter(ABC):
+    """
+    Base class for throughput limits (requests, tokens or dollars per period).
+
+    acquire() takes capacity before work starts. When there is not enough,
+    the caller sleeps until there is, unless that takes longer than
+    max_wait or the current deadline, in which case RateLimitExceededError
+    is raised at once. Work whose size is only known afterwards (tokens,
+    cost) is reconciled with record(actual - estimate); negative amounts
+    give capacity back.
+
+    Attributes:
+        unit: What amounts count: "requests", "tokens" or "usd"
+        delays: Acquisitions that had to wait
+        rejections: Acquisitions refused
+    """
+
+    UNITS = ("requests", "tokens", "usd")
+
+    def __init__(self, capacity: float, unit: str = "requests", max_wait: Optional[float] = None):
+        if capacity <= 0:
+            raise ValueError("rate limits must be positive")
+        if unit not in self.UNITS:
+            raise ValueError(f"unit must be one of {self.UNITS}")
+        self.capacity = capacity
+        self.unit = unit
+        self.max_wait = max_wait
+        self.delays = 0
+        self.rejections = 0
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _take(self, amount: float, now: float) -> float:
+        """Consume amount if available (returns 0), else return the seconds to wait."""
+        pass
+
+    @abstractmethod
+    def _add(self, amount: float, now: float) -> None:
+        """Consume amount unconditionally (negative gives capacity back)."""
+        pass
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """
+        Take amount without waiting.
+
+        Returns:
+            0.0 if taken, otherwise the seconds until it could be
+        """
+        if amount > self.capacity:
+            return float("inf")
+        with self._lock:
+            return self._take(amount, time.monotonic())
+
+    def acquire(self, amount: float = 1.0) -> None:
+        """
+        Take amount, sleeping until it is available.
+
+        Raises:
+            RateLimitExceededError: If the wait would pass max_wait or the deadline
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                if waited:
+                    self.delays += 1
+                return
+            allowed = float("inf") if self.max_wait is None else self.max_wait - waited
+            remaining = time_remaining()
+            if remaining is not None:
+                allowed = min(allowed, remaining)
+            if wait > allowed or wait == float("inf"):
+                self.rejections += 1
+                raise RateLimitExceededError(
+                    f"Rate limit exceeded: {amount:g} {self.unit} not available for {wait:.2f}s",
+                    retry_after=wait,
+                    limit=self.capacity,
+                )
+            time.sleep(wait)
+            waited += wait
+
+    def record(self, amount: float) -> None:
+        """Count amount without waiting, e.g. to reconcile an estimate."""
+        with self._lock:
+            self._add(amount, time.monotonic())
+
+
+class SlidingWindowLimiter(RateLimiter):
+    """
+    At most limit units in any window_seconds (exact sliding log).
+
+    Usage:
+        SlidingWindowLimiter(90_000, window_seconds=60, unit="tokens")
+    """
+
+    def __init__(
+        self, limit: float, window_seconds: float = 60.0, unit: str = "requests", max_wait: Optional[float] = None
+    ):
+        super().__init__(limit, unit=unit, max_wait=max_wait)
+        self.window_seconds = window_seconds
+        self._events: "deque[Tuple[float, float]]" = deque()
+        self._used = 0.0
+
+    def _expire(self, now: float) -> None:
+        events, cutoff = self._events, now - self.window_seconds
+        while events and events[0][0] <= cutoff:
+            self._used -= events.popleft()[1]
+
+    def _take(self, amount: float, now: float) -> float:
+        self._expire(now)
+        excess = self._used + amount - self.capacity
+        if excess <= 0:
+            self._add(amount, now)
+            return 0.0
+        # Wait until enough of the oldest usage has left the window
+        for at, used in self._events:
+            excess -= used
+            if excess <= 0:
+                return at + self.window_seconds - now
+        return self.window_seconds
+
+    def _add(self, amount: float, now: float) -> None:
+        if amount >= 0:
+            self._events.append((now, amount))
+            self._used += amount
+            return
+        # A refund shrinks the newest usage it corrects rather than being
+        # logged itself, so it can never outlive that usage in the window
+        self._expire(now)
+        refund, events = -amount, self._events
+        while refund > 0 and events:
+            at, used = events.pop()
+            if used > refund:
+                events.append((at, used - refund))
+                self._used -= refund
+                break
+            refund -= used
+            self._used -= used
+
+    @property
+    def used(self) -> float:
+        """Units used in the current window."""
+        with self._lock:
+            self._expire(time.monotonic())
+            return self._used
+
+
+class TokenBucketLimiter(RateLimiter):
+    """
+    Refills at rate units per `per` seconds, holding at most capacity (the burst).
+
+    Usage:
+        TokenBucketLimiter(rate=10.0, per=3600, unit="usd")  # $10/hour
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        per: float = 1.0,
+        capacity: Optional[float] = None,
+        unit: str = "requests",
+        max_wait: Optional[float] = None,
+    ):
+        super().__init__(capacity if capacity is not None else rate, unit=unit, max_wait=max_wait)
+        self.refill_per_second = rate / per
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def _take(self, amount: float, now: float) -> float:
+        self._refill(now)
+        if self._level >= amount:
+            self._level -= amount
+            return 0.0
+        return (amount - self._level) / self.refill_per_second
+
+    def _add(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self._level = min(self.capacity, self._level - amount)
+
+
+class GCRALimiter(RateLimiter):
+    """
+    Generic cell rate algorithm: rate units per `per` seconds with a burst.
+
+    Same limits as a token bucket, kept as a single theoretical arrival
+    time instead of a level, so there is no refill arithmetic per call.
+
+    Usage:
+        GCRALimiter(rate=500, per=60, burst=50)  # 500 requests/minute
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        per: float = 1.0,
+        burst: Optional[float] = None,
+        unit: str = "requests",
+        max_wait: Optional[float] = None,
+    ):
+        super().__init__(burst if burst is not None else rate, unit=unit, max_wait=max_wait)
+        self.interval = per / rate  # Seconds per unit
+        self._tolerance = self.capacity * self.interval
+        self._tat = 0.0  # Theoretical arrival time
+
+    def _take(self, amount: float, now: float) -> float:
+        tat = max(self._tat, now) + amount * self.interval
+        wait = tat - now - self._tolerance
+        if wait > 0:
+            return wait
+        self._tat = tat
+        return 0.0
+
+    def _add(self, amount: float, now: float) -> None:
+        self._tat = max(self._tat, now) + amount * self.interval
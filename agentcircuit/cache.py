@@ -0,0 +1,260 @@
+"""
+Node result memoization for AgentCircuit.
+
+Provides:
+- BaseCache: Interface for result cache tiers
+- LRUCache: Bounded in-process cache
+- SQLiteCache: Persistent cache shared by processes on one machine
+- ShelveCache: On-disk cache backed by the standard shelve module
+- create_cache: Factory for the tiers above
+"""
+import copy
+import hashlib
+import pickle
+import shelve
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from .fuse import FingerprintSpec, hash_state
+
+
+class BaseCache(ABC):
+    """
+    Abstract base class for node result caches.
+
+    reliable_node(cache=...) looks up a key built from the node name, the
+    node's cache_version and the input fingerprint. A hit skips execution,
+    validation and cost accounting and is traced with status "cached"; a
+    first-attempt success is stored. Only use it for nodes whose output is
+    determined by their input.
+
+    Args:
+        ttl_seconds: Entries older than this are not served (None: no expiry)
+        fingerprint: Which parts of the state identify an input
+    """
+
+    # Whether lookups may block on disk I/O (async nodes run them off the loop)
+    blocking_io: bool = True
+
+    def __init__(self, ttl_seconds: Optional[float] = None, fingerprint: Optional[FingerprintSpec] = None):
+        self.ttl_seconds = ttl_seconds
+        self._extract = fingerprint.compile() if fingerprint is not None else None
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, node_id: str, version: str, state: Any) -> str:
+        """Cache key of a node input."""
+        if self._extract is not None:
+            state = self._extract(state)
+        raw = f"{node_id}\x00{version}\x00{hash_state(state)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a cached output.
+
+        Returns:
+            (found, output)
+        """
+        entry = self._get(key)
+        if entry is not None and self.ttl_seconds is not None:
+            if time.time() - entry[0] > self.ttl_seconds:
+                self._delete(key)
+                entry = None
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        """Store an output."""
+        self._set(key, time.time(), value)
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """Return (stored_at, value) or None."""
+        pass
+
+    @abstractmethod
+    def _set(self, key: str, stored_at: float, value: Any) -> None:
+        pass
+
+    @abstractmethod
+    def _delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop all entries."""
+        pass
+
+    def close(self) -> None:
+        """Release any open files or connections."""
+        pass
+
+
+class LRUCache(BaseCache):
+    """In-process cache holding up to max_size outputs, least recently used evicted first."""
+
+    blocking_io = False
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: Optional[float] = None,
+        fingerprint: Optional[FingerprintSpec] = None,
+    ):
+        super().__init__(ttl_seconds=ttl_seconds, fingerprint=fingerprint)
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        found, value = super().get(key)
+        # Copy so callers cannot alter the cached output
+        return found, copy.deepcopy(value) if found else None
+
+    def _get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set(self, key: str, stored_at: float, value: Any) -> None:
+        # Copy on store too: the caller that produced value still holds it
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(BaseCache):
+    """
+    Persistent cache in a SQLite file; outputs are pickled.
+
+    Survives restarts and can be shared by processes on one machine.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "agentcircuit_cache.db",
+        ttl_seconds: Optional[float] = None,
+        fingerprint: Optional[FingerprintSpec] = None,
+    ):
+        super().__init__(ttl_seconds=ttl_seconds, fingerprint=fingerprint)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS node_cache ("
+            "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value BLOB NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    def _get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, value FROM node_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], pickle.loads(row[1])
+
+    def _set(self, key: str, stored_at: float, value: Any) -> None:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO node_cache (key, stored_at, value) VALUES (?, ?, ?)",
+                (key, stored_at, data),
+            )
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM node_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM node_cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ShelveCache(BaseCache):
+    """On-disk cache in a shelve file (dbm + pickle), for a single process."""
+
+    def __init__(
+        self,
+        path: str = "agentcircuit_cache",
+        ttl_seconds: Optional[float] = None,
+        fingerprint: Optional[FingerprintSpec] = None,
+    ):
+        super().__init__(ttl_seconds=ttl_seconds, fingerprint=fingerprint)
+        self.path = path
+        self._lock = threading.Lock()
+        self._shelf = shelve.open(path, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            return self._shelf.get(key)
+
+    def _set(self, key: str, stored_at: float, value: Any) -> None:
+        with self._lock:
+            self._shelf[key] = (stored_at, value)
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._shelf.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._shelf.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._shelf.close()
+
+
+def create_cache(backend: str = "memory", **kwargs) -> BaseCache:
+    """
+    Factory function to create a result cache.
+
+    Args:
+        backend: Cache tier ("memory", "sqlite" or "shelve")
+        **kwargs: Tier-specific configuration (max_size, db_path, path,
+            ttl_seconds, fingerprint)
+
+    Returns:
+        Configured cache instance
+    """
+    backend = backend.lower()
+    if backend == "memory":
+        return LRUCache(**kwargs)
+    elif backend == "sqlite":
+        return SQLiteCache(**kwargs)
+    elif backend == "shelve":
+        return ShelveCache(**kwargs)
+    raise ValueError(f"Unknown cache backend: {backend}")
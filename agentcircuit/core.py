@@ -1,54 +1,239 @@
+import asyncio
+import contextlib
 import functools
 import inspect
+import threading
 import time
-from typing import Any, Optional, Callable, Dict, Type, Union
+import weakref
+from dataclasses import dataclass
+from typing import Any, List, Optional, Callable, Dict, Sequence, Tuple, Type, Union
 from pydantic import BaseModel
 
-from .fuse import Fuse, LoopError
+from .fuse import Fuse, CycleDetector, FingerprintSpec, LoopError, SimilarityFuse, SketchHistory
 from .medic import Medic, MedicError
 from .sentinel import Sentinel, SentinelError
 from .storage import get_default_storage, BaseStorage
-from .budget import BudgetFuse, TimeoutFuse, GlobalBudget
-from .errors import BudgetExceededError, TimeoutExceededError
+from .budget import (
+    BudgetFuse,
+    BudgetTree,
+    TimeoutFuse,
+    GlobalBudget,
+    RateLimiter,
+    SpendVelocityFuse,
+    deadline,
+)
+from .breaker import CircuitBreaker, FallbackCache, get_breaker
+from .cache import BaseCache, create_cache
+from .errors import BudgetExceededError, TimeoutExceededError, CircuitOpenError, RateLimitExceededError
 from .pricing import CostCalculator, estimate_tokens as _estimate_tokens
 
+# Seconds a storage's cost_per_token setting is reused before it is read again
+_SETTING_TTL = 5.0
 
-def reliable_node(
-    sentinel_schema: Optional[Type[BaseModel]] = None,
-    medic_repair: Optional[Callable[[Exception, Any], Any]] = None,
-    llm_callable: Optional[Callable[[str], str]] = None,
-    fuse_limit: int = 3,
-    node_name: Optional[str] = None,
-    storage: Optional[BaseStorage] = None,
-    max_cost_usd: Optional[float] = None,
-    max_seconds: Optional[float] = None,
-    budget: Optional[GlobalBudget] = None,
-    cost_per_token: Optional[float] = None,
-    model: Optional[str] = None,
-):
-    """
-    Decorator to make any AI agent node reliable.
-    Integrates Fuse (loop detection), Medic (recovery), and Sentinel (validation).
 
-    Args:
-        sentinel_schema: Pydantic model to validate outputs against
-        medic_repair: Legacy callback for custom repair logic
-        llm_callable: LLM callable for intelligent error repair
-        fuse_limit: Max identical states before tripping loop detection (default 3)
-        node_name: Override the node name (defaults to function name)
-        storage: Custom storage backend (defaults to in-memory)
-        max_cost_usd: Maximum dollar cost for this node's run before tripping
-        max_seconds: Maximum execution time in seconds before tripping
-        budget: Shared GlobalBudget instance for cross-node cost/time limits
-        cost_per_token: Override cost per token (USD). Overrides model pricing lookup.
-        model: Model name for pricing table lookup (e.g. "gpt-4o", "claude-3-5-sonnet")
+def _discover_model_name(llm_callable: Any) -> Optional[str]:
+    """Best-effort model name lookup from a provider or provider chain."""
+    if hasattr(llm_callable, 'config'):
+        name = getattr(llm_callable.config, 'model_id', None)
+        if name:
+            return name
+    if hasattr(llm_callable, '_last_provider'):
+        lp = getattr(llm_callable, '_last_provider', None)
+        if lp and hasattr(lp, 'config'):
+            return getattr(lp.config, 'model_id', None)
+    return None
+
+
+class _NodeRunner:
+    """
+    Per-node execution engine behind reliable_node.
+
+    Everything that does not depend on the call arguments (components,
+    signature inspection, pricing) is resolved once when the decorator is
+    applied. The Medic is built lazily on the first failure and then reused,
+    so provider discovery never runs on the happy path.
+
+    Features that are switched off cost nothing per call: without a fuse
+    no state is hashed and no history is read, without tracing
+    (storage=False) no run_id is resolved and nothing is logged, and tokens
+    are only estimated when a trace or a GlobalBudget needs the cost. When
+    none of the per-call features are on, reliable_node uses lean_call,
+    which only calls the node and validates its output.
     """
 
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            # Extract state and config
-            state = args[0] if args else kwargs.get("state")
+    def __init__(
+        self,
+        func: Callable,
+        sentinel_schema: Optional[Type[BaseModel]],
+        medic_repair: Optional[Callable[[Exception, Any], Any]],
+        llm_callable: Optional[Callable[[str], str]],
+        fuse_limit: Optional[int],
+        node_name: Optional[str],
+        storage: Union[BaseStorage, None, bool],
+        max_cost_usd: Optional[float],
+        max_seconds: Optional[float],
+        budget: Optional[GlobalBudget],
+        cost_per_token: Optional[float],
+        model: Optional[str],
+        fuse_incremental: bool = False,
+        fingerprint: Optional[FingerprintSpec] = None,
+        cycle_detector: Optional[CycleDetector] = None,
+        similarity_fuse: Optional[SimilarityFuse] = None,
+        fuse_history: Optional[SketchHistory] = None,
+        circuit_breaker: Union[CircuitBreaker, bool, None] = None,
+        fallback: Optional[FallbackCache] = None,
+        cache: Union[BaseCache, str, None] = None,
+        cache_version: str = "",
+        timeout_isolation: str = "thread",
+        budget_tree: Optional[BudgetTree] = None,
+        rate_limits: Union[RateLimiter, Sequence[RateLimiter], None] = None,
+        spend_velocity: Optional[SpendVelocityFuse] = None,
+    ):
+        self.func = func
+        self.node_name = node_name or func.__name__
+        self.sentinel_schema = sentinel_schema
+        self.medic_repair = medic_repair
+        self.llm_callable = llm_callable
+        self.budget = budget
+        self.budget_tree = budget_tree
+        if isinstance(rate_limits, RateLimiter):
+            rate_limits = [rate_limits]
+        self.rate_limits: List[RateLimiter] = list(rate_limits or ())
+        self.cycle_detector = cycle_detector
+        self.similarity_fuse = similarity_fuse
+        # True means the process-wide breaker shared by nodes of this name
+        self.breaker = (
+            get_breaker(self.node_name) if circuit_breaker is True
+            else circuit_breaker or None
+        )
+        if self.breaker is not None and self.breaker.name is None:
+            self.breaker.name = self.node_name
+        if fallback is not None and self.breaker is None:
+            raise ValueError("fallback is served while the circuit is open; pass a circuit_breaker")
+        self.fallback = fallback
+        self.cache = create_cache(cache) if isinstance(cache, str) else cache
+        self.cache_version = cache_version
+
+        # storage=False turns tracing off; None means the default storage
+        self.tracing = storage is not False
+        self.storage = storage if self.tracing else None
+        if not self.tracing and ((fuse_limit and fuse_history is None) or max_cost_usd):
+            raise ValueError(
+                "storage=False disables tracing, which fuse_limit and max_cost_usd "
+                "depend on; pass fuse_limit=None (or a fuse_history) and no "
+                "max_cost_usd, or a storage"
+            )
+
+        self.fuse = Fuse(
+            limit=fuse_limit, incremental=fuse_incremental, fingerprint=fingerprint,
+            history=fuse_history,
+        ) if fuse_limit else None
+        self.sentinel = Sentinel(schema=sentinel_schema)
+        self.budget_fuse = BudgetFuse(max_cost_usd) if max_cost_usd else None
+        self.spend_velocity = spend_velocity
+        # Recent average tokens and cost of a call, the up-front estimates
+        self._token_average: Optional[float] = None
+        self._cost_average: Optional[float] = None
+        self.timeout_fuse = TimeoutFuse(max_seconds, isolation=timeout_isolation) if max_seconds else None
+
+        # The run_id is needed to trace and for run-scoped loop detectors
+        self.needs_run_id = (
+            self.tracing or self.fuse is not None
+            or cycle_detector is not None or similarity_fuse is not None
+            or budget_tree is not None or spend_velocity is not None
+        )
+        # Token estimation is only needed for trace costs and budgets
+        self.needs_cost = (
+            self.tracing or budget is not None or budget_tree is not None or bool(self.rate_limits)
+            or spend_velocity is not None
+        )
+        # No pre-checks and nothing to record: only call, validate and recover
+        self.lean = not (
+            self.needs_run_id or self.fuse or budget is not None
+            or self.budget_fuse or self.timeout_fuse or self.breaker is not None
+            or spend_velocity is not None
+            or self.cache is not None or budget_tree is not None or self.rate_limits
+        )
+        # Usage is estimated up front for reservations and rate limits
+        self.tracks_usage = bool(
+            budget is not None or self.budget_fuse or budget_tree is not None or self.rate_limits
+        )
+
+        # Filter kwargs for the wrapped function
+        self.accepts_config = "config" in inspect.signature(func).parameters
+
+        # Medic is created on first use (provider discovery may hit the network)
+        self._medic: Optional[Medic] = None
+        self._medic_lock = threading.Lock()
+
+        # Cost calculator — priority: user override > model lookup > storage setting > default
+        self._cost_per_token = cost_per_token
+        self._model_name = model or _discover_model_name(llm_callable)
+        self._calculator: Optional[CostCalculator] = None
+        if self._model_name or cost_per_token is not None:
+            self._calculator = CostCalculator(
+                model=self._model_name, cost_per_token=cost_per_token
+            )
+        # storage -> (calculator, monotonic time it expires)
+        self._storage_calculators: "weakref.WeakKeyDictionary[BaseStorage, Tuple[CostCalculator, float]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def medic(self) -> Medic:
+        """Get the Medic, creating it on first use."""
+        if self._medic is None:
+            with self._medic_lock:
+                if self._medic is None:
+                    self._medic = Medic(llm_callable=self.llm_callable)
+        return self._medic
+
+    def calculator_for(self, storage: Optional[BaseStorage]) -> CostCalculator:
+        """Get the cost calculator, falling back to the storage's cost_per_token setting."""
+        if self._calculator is not None:
+            return self._calculator
+
+        # A provider chain only knows its model after its first call
+        if hasattr(self.llm_callable, '_last_provider'):
+            model_name = _discover_model_name(self.llm_callable)
+            if model_name:
+                self._model_name = model_name
+                self._calculator = CostCalculator(model=model_name)
+                return self._calculator
+
+        if storage is None:
+            # Tracing is off, so there is no storage setting to consult
+            return CostCalculator()
+
+        # Re-read now and then, so a set_setting (in any process) takes effect
+        now = time.monotonic()
+        cached = self._storage_calculators.get(storage)
+        if cached is not None and now < cached[1]:
+            return cached[0]
+        _cost_per_token = None
+        cpt_str = storage.get_setting("cost_per_token")
+        if cpt_str:
+            _cost_per_token = float(cpt_str)
+        if cached is not None and cached[0].cost_per_token == _cost_per_token:
+            calculator = cached[0]
+        else:
+            calculator = CostCalculator(cost_per_token=_cost_per_token)
+        self._storage_calculators[storage] = (calculator, now + _SETTING_TTL)
+        return calculator
+
+    def prepare(self, args: tuple, kwargs: dict) -> "_NodeCall":
+        """
+        Resolve the call context and run the pre-execution checks.
+
+        Raises BudgetExceededError, TimeoutExceededError, LoopError or
+        CircuitOpenError before the node is allowed to run.
+        """
+        # Extract state and config
+        state = args[0] if args else kwargs.get("state")
+        run_id = None
+        _storage = None
+
+        if self.needs_run_id:
             config = None
 
             # Try to find config in args or kwargs
@@ -65,195 +250,654 @@ def reliable_node(
                 or config.get("run_id")
                 or "local_dev_run"
             )
-
-            actual_node_name = node_name or func.__name__
-
-            # Initialize Components - use in-memory storage by default
-            _storage = storage or get_default_storage()
-            fuse = Fuse(limit=fuse_limit)
-            medic = Medic(llm_callable=llm_callable)
-            sentinel = Sentinel(schema=sentinel_schema)
-
-            # Initialize cost/time circuit breakers
-            _budget_fuse = BudgetFuse(max_cost_usd) if max_cost_usd else None
-            _timeout_fuse = TimeoutFuse(max_seconds) if max_seconds else None
-
-            # Cost calculator — priority: user override > model lookup > storage setting > default
-            _model_name = model
-            if not _model_name and hasattr(llm_callable, 'config'):
-                _model_name = getattr(llm_callable.config, 'model_id', None)
-            if not _model_name and hasattr(llm_callable, '_last_provider'):
-                lp = getattr(llm_callable, '_last_provider', None)
-                if lp and hasattr(lp, 'config'):
-                    _model_name = getattr(lp.config, 'model_id', None)
-
-            _cost_per_token = cost_per_token
-            if _cost_per_token is None and not _model_name:
-                cpt_str = _storage.get_setting("cost_per_token")
-                if cpt_str:
-                    _cost_per_token = float(cpt_str)
-
-            _calculator = CostCalculator(model=_model_name, cost_per_token=_cost_per_token)
-
-            # 0. Pre-execution budget checks
-            # Check global budget before even starting
-            if budget:
-                budget.check_cost()
-                budget.check_time()
-
-            # Check per-node budget against cumulative run cost
-            if _budget_fuse:
-                current_run_cost = _storage.get_run_cost(run_id)
-                _budget_fuse.check(current_run_cost)
-
-            # 1. Fuse Check
-            history_rows = _storage.get_run_history(run_id)
-            node_history = [
-                h["input_state"]
-                for h in history_rows
-                if h["node_id"] == actual_node_name
-            ]
-
-            try:
-                fuse.check(history=[fuse._hash_state(s) for s in node_history], current_state=state)
-            except LoopError as e:
+            if self.budget_tree is not None:
+                tenant = config.get("configurable", {}).get("tenant_id") or "default"
+                tree_path = (tenant, run_id, self.node_name)
+
+        if self.tracing:
+            # Use in-memory storage by default
+            _storage = self.storage or get_default_storage()
+
+        call = _NodeCall(
+            state=state,
+            run_id=run_id,
+            storage=_storage,
+            calculator=self.calculator_for(_storage) if self.needs_cost else None,
+        )
+
+        # 0. Pre-execution budget checks
+        # Check global budget before even starting
+        if self.budget:
+            self.budget.check_cost()
+            self.budget.check_time()
+
+        # Check per-node budget against cumulative run cost
+        if self.budget_fuse:
+            current_run_cost = _storage.get_run_cost(run_id)
+            self.budget_fuse.check(current_run_cost)
+
+        # Stop a run whose cost or latency per step has spiked at this node
+        if self.spend_velocity is not None:
+            self.spend_velocity.check(run_id, self.node_name, _storage)
+
+        # 1. Fuse Check (this node) and cycle check (across the run's nodes)
+        try:
+            if self.fuse:
+                call.state_hash = self.fuse._hash_state(state)
+                self.fuse.check_run(_storage, run_id, self.node_name, call.state_hash)
+            if self.cycle_detector is not None:
+                self.cycle_detector.observe(run_id, self.node_name, state, state_hash=call.state_hash)
+            if self.similarity_fuse is not None:
+                self.similarity_fuse.check(run_id, self.node_name, state)
+        except LoopError as e:
+            if _storage is not None:
                 _storage.log_trace(
                     run_id=run_id,
-                    node_id=actual_node_name,
+                    node_id=self.node_name,
                     input_state=state,
                     output_state=None,
                     status="failed_loop",
-                    recovery_attempts=0
+                    recovery_attempts=0,
+                    state_hash=call.state_hash
                 )
-                raise e
-
-            # Filter kwargs for the wrapped function
-            sig = inspect.signature(func)
-            if "config" not in sig.parameters:
-                kwargs.pop("config", None)
-
-            # 2. Execution & Medic
-            result = None
-            status = "success"
-            recovery_count = 0
-            current_error = None
-            saved_cost = 0.0
-            diagnosis = None
-            start_time = time.time()
-
-            # Initial Execution
+            raise e
+
+        # 2. Memoized result; a hit needs neither the node nor the breaker
+        if self.cache is not None:
+            call.cache_key = self.cache.key(self.node_name, self.cache_version, state)
+            found, result = self.cache.get(call.cache_key)
+            if found:
+                call.result = result
+                call.status = "cached"
+                call.served = True
+                call.start_time = time.time()
+                return call
+
+        # Hold the estimated cost so concurrent calls cannot overshoot together
+        if self.budget or self.budget_fuse or self.budget_tree is not None:
+            call.tree_path = tree_path if self.budget_tree is not None else None
+            self._reserve(call, current_run_cost if self.budget_fuse else 0.0)
+
+        # Wait for (or be refused) provider throughput before running
+        if self.rate_limits:
             try:
-                result = func(*args, **kwargs)
-            except Exception as e:
-                current_error = e
-                diagnosis = str(e)
-                if medic_repair and not llm_callable:
-                    try:
-                        result = medic_repair(e, state)
-                        status = "repaired"
-                        recovery_count = 1
-                        current_error = None
-                    except Exception as legacy_e:
-                        current_error = legacy_e
-                        diagnosis = str(legacy_e)
-
-            # Validate result if no error
-            if not current_error:
-                try:
-                    result = sentinel.validate(result)
-                except SentinelError as se:
-                    current_error = se
-                    diagnosis = str(se)
-
-            # Recovery Loop (up to 2 attempts)
-            while current_error and recovery_count < 2:
-                recovery_count += 1
+                self._acquire_rate_limits(call)
+            except RateLimitExceededError:
+                self._settle(call)
+                raise
+
+        # 3. Circuit breaker, last so an admitted probe always reaches handle_result
+        if self.breaker is not None:
+            try:
+                call.probe = self.breaker.before_call()
+            except CircuitOpenError:
+                self._settle(call)
+                self._refund_rate_limits(call)
+                if not self._serve_fallback(call):
+                    raise
+                call.start_time = time.time()
+                return call
+
+        if not self.accepts_config:
+            kwargs.pop("config", None)
+
+        call.start_time = time.time()
+        return call
+
+    def _estimate_usage(self, call: "_NodeCall") -> Tuple[float, float]:
+        """
+        Estimated (tokens, cost) of the call before it runs.
+
+        This node's recent averages, or on its first call a response as
+        large as the prompt.
+        """
+        if call.estimate is None:
+            tokens, cost = self._token_average, self._cost_average
+            if tokens is None or cost is None:
+                prompt = _estimate_tokens(call.state)
+                tokens, cost = 2 * prompt, call.calculator.calculate(prompt, prompt)
+            call.estimate = (tokens, cost)
+        return call.estimate
+
+    def _reserve(self, call: "_NodeCall", run_cost: float) -> None:
+        """Reserve the call's estimated cost on the budgets before it runs."""
+        estimate = self._estimate_usage(call)[1]
+        try:
+            if self.budget_fuse:
+                self.budget_fuse.reserve(call.run_id, run_cost, estimate)
+                call.fuse_reserved = estimate
+            if self.budget_tree is not None:
+                self.budget_tree.reserve(call.tree_path, estimate)
+                call.tree_reserved = estimate
+            if self.budget:
+                self.budget.reserve(estimate)
+                call.reserved = estimate
+        except BudgetExceededError:
+            self._settle(call)
+            raise
+
+    def _settle(self, call: "_NodeCall", actual_cost: float = 0.0) -> None:
+        """Reconcile the call's reservations to its actual cost; a no-op once settled."""
+        if call.probe:
+            # The node never reported an outcome (cancelled or interrupted)
+            self.breaker.release_probe()
+            call.probe = False
+        if call.fuse_reserved is not None:
+            # The actual cost is in the storage by now
+            self.budget_fuse.commit(call.run_id, call.fuse_reserved)
+            call.fuse_reserved = None
+        if call.tree_reserved is not None:
+            self.budget_tree.commit(call.tree_path, call.tree_reserved, actual_cost)
+            call.tree_reserved = None
+        if self.budget is not None:
+            if call.reserved is not None:
+                self.budget.commit(call.reserved, actual_cost)
+                call.reserved = None
+            elif actual_cost:
+                self.budget.record_cost(actual_cost)
+
+    def _acquire_rate_limits(self, call: "_NodeCall") -> None:
+        """Take the call's estimated requests, tokens or dollars from each rate limit."""
+        tokens, cost = self._estimate_usage(call)
+        amounts = {"requests": 1.0, "tokens": tokens, "usd": cost}
+        call.rate_held = []
+        try:
+            for limiter in self.rate_limits:
+                amount = amounts[limiter.unit]
+                limiter.acquire(amount)
+                call.rate_held.append((limiter, amount))
+        except RateLimitExceededError:
+            self._refund_rate_limits(call)
+            raise
+
+    def _refund_rate_limits(self, call: "_NodeCall") -> None:
+        """Give back rate-limit capacity taken for a call that did not run."""
+        for limiter, amount in call.rate_held or ():
+            limiter.record(-amount)
+        call.rate_held = None
+
+    def _serve_fallback(self, call: "_NodeCall") -> bool:
+        """Load the last good output for this input into call, if there is one."""
+        if self.fallback is None:
+            return False
+        found, result = self.fallback.lookup(call.state)
+        if not found:
+            return False
+        try:
+            call.result = self.sentinel.validate(result)
+        except SentinelError:
+            return False
+        call.status = "fallback"
+        call.served = True
+        return True
+
+    def handle_result(self, call: "_NodeCall", result: Any, error: Optional[Exception]) -> None:
+        """Apply the legacy repair callback and Sentinel validation to the first attempt."""
+        call.result = result
+        if error is not None:
+            call.current_error = error
+            call.diagnosis = str(error)
+            if self.medic_repair and not self.llm_callable and not isinstance(error, TimeoutExceededError):
                 try:
-                    raw_output = result if isinstance(current_error, SentinelError) else "N/A (Execution Failed)"
-
-                    fixed_data = medic.attempt_recovery(
-                        error=current_error,
-                        input_state=state,
-                        raw_output=raw_output,
-                        node_id=actual_node_name,
-                        recovery_attempts=recovery_count,
-                        schema=sentinel_schema
-                    )
-
-                    result = sentinel.validate(fixed_data)
-                    current_error = None
-                    status = "repaired"
-
-                    cost_to_reach_here = _storage.get_run_cost(run_id)
-                    medic_input = _estimate_tokens(state) + _estimate_tokens(current_error) + 100
-                    medic_output = _estimate_tokens(fixed_data)
-                    medic_cost = _calculator.calculate(medic_input, medic_output)
-                    raw_savings = cost_to_reach_here - medic_cost
-                    saved_cost = max(0.0, raw_savings)
-
-                except Exception as retry_e:
-                    current_error = retry_e
-                    diagnosis = str(retry_e)
-
-            if current_error:
-                duration_ms = (time.time() - start_time) * 1000
-                _storage.log_trace(
-                    run_id=run_id,
-                    node_id=actual_node_name,
-                    input_state=state,
-                    output_state=str(current_error),
-                    status="failed",
-                    recovery_attempts=recovery_count,
-                    saved_cost=0.0,
-                    diagnosis=diagnosis,
-                    duration_ms=duration_ms
-                )
-                raise current_error
+                    call.result = self.medic_repair(error, call.state)
+                    call.status = "repaired"
+                    call.recovery_count = 1
+                    call.current_error = None
+                except Exception as legacy_e:
+                    call.current_error = legacy_e
+                    call.diagnosis = str(legacy_e)
+
+        # Validate result if no error
+        if not call.current_error:
+            try:
+                call.result = self.sentinel.validate(call.result)
+            except SentinelError as se:
+                call.current_error = se
+                call.diagnosis = str(se)
+
+        # The breaker tracks the node itself, so Medic repairs don't hide an outage
+        if self.breaker is not None:
+            if error is None and call.current_error is None:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            call.probe = False
+
+    def needs_recovery(self, call: "_NodeCall") -> bool:
+        """Whether another Medic attempt should be made (up to 2 attempts)."""
+        return (
+            call.current_error is not None and call.recovery_count < 2
+            # Repairing a node that ran out of time only overruns further
+            and not isinstance(call.current_error, TimeoutExceededError)
+        )
+
+    def recover_once(self, call: "_NodeCall") -> None:
+        """Run one Medic recovery attempt. May block on an LLM call."""
+        call.recovery_count += 1
+        try:
+            raw_output = call.result if isinstance(call.current_error, SentinelError) else "N/A (Execution Failed)"
+
+            fixed_data = self.medic.attempt_recovery(
+                error=call.current_error,
+                input_state=call.state,
+                raw_output=raw_output,
+                node_id=self.node_name,
+                recovery_attempts=call.recovery_count,
+                schema=self.sentinel_schema
+            )
 
-            # Log Success — use CostCalculator for accurate pricing
-            token_usage, estimated_cost = _calculator.estimate_from_objects(state, result)
+            call.result = self.sentinel.validate(fixed_data)
+            call.current_error = None
+            call.status = "repaired"
+
+            if call.storage is None:
+                return
+            cost_to_reach_here = call.storage.get_run_cost(call.run_id)
+            medic_input = _estimate_tokens(call.state) + _estimate_tokens(call.current_error) + 100
+            medic_output = _estimate_tokens(fixed_data)
+            medic_cost = call.calculator.calculate(medic_input, medic_output)
+            raw_savings = cost_to_reach_here - medic_cost
+            call.saved_cost = max(0.0, raw_savings)
+
+        except Exception as retry_e:
+            call.current_error = retry_e
+            call.diagnosis = str(retry_e)
+
+    def finish(self, call: "_NodeCall") -> Any:
+        """Log the trace, run post-execution checks and return (or raise) the outcome."""
+        _storage = call.storage
+        budget = self.budget
+
+        if call.current_error:
+            if _storage is None:
+                raise call.current_error
+            duration_ms = (time.time() - call.start_time) * 1000
+            _storage.log_trace(
+                run_id=call.run_id,
+                node_id=self.node_name,
+                input_state=call.state,
+                output_state=str(call.current_error),
+                status="failed",
+                recovery_attempts=call.recovery_count,
+                saved_cost=0.0,
+                diagnosis=call.diagnosis,
+                duration_ms=duration_ms,
+                state_hash=call.state_hash
+            )
+            raise call.current_error
+
+        # Log Success — use CostCalculator for accurate pricing
+        token_usage, estimated_cost = 0, 0.0
+        if call.served:
+            # Nothing ran, so nothing was spent
+            call.calculator = None
+        elif call.status == "success":
+            if self.fallback is not None:
+                self.fallback.store(call.state, call.result)
+            if self.cache is not None:
+                self.cache.set(call.cache_key, call.result)
+
+        if call.calculator is not None:
+            token_usage, estimated_cost = call.calculator.estimate_from_objects(call.state, call.result)
+            if self.tracks_usage and not call.served:
+                self._observe_usage(call, token_usage, estimated_cost)
+            if self.spend_velocity is not None and not call.served:
+                self.spend_velocity.observe(
+                    call.run_id, self.node_name, estimated_cost, time.time() - call.start_time, _storage
+                )
 
+        if _storage is not None:
             final_diagnosis = None
-            if status == "repaired" and diagnosis:
-                final_diagnosis = diagnosis
-            elif status == "failed" and current_error:
-                final_diagnosis = str(current_error)
+            if call.status == "repaired" and call.diagnosis:
+                final_diagnosis = call.diagnosis
 
-            duration_ms = (time.time() - start_time) * 1000
+            duration_ms = (time.time() - call.start_time) * 1000
 
             _storage.log_trace(
-                run_id=run_id,
-                node_id=actual_node_name,
-                input_state=state,
-                output_state=result,
-                status=status,
-                recovery_attempts=recovery_count,
-                saved_cost=saved_cost,
+                run_id=call.run_id,
+                node_id=self.node_name,
+                input_state=call.state,
+                output_state=call.result,
+                status=call.status,
+                recovery_attempts=call.recovery_count,
+                saved_cost=call.saved_cost,
                 token_usage=token_usage,
                 estimated_cost=estimated_cost,
                 diagnosis=final_diagnosis,
-                duration_ms=duration_ms
+                duration_ms=duration_ms,
+                state_hash=call.state_hash
             )
 
-            # Post-execution budget recording and checks
-            if budget:
-                budget.record_cost(estimated_cost)
+        # Post-execution budget recording (settles the reservations) and checks
+        self._settle(call, estimated_cost)
+
+        # Post-execution per-node budget check (after cost is logged)
+        if self.budget_fuse:
+            updated_run_cost = _storage.get_run_cost(call.run_id)
+            self.budget_fuse.check(updated_run_cost)
+
+        # Post-execution timeout check
+        if self.timeout_fuse:
+            self.timeout_fuse.check(call.start_time)
+
+        # Post-execution global budget checks
+        if budget:
+            budget.check_cost()
+            budget.check_time()
+
+        return call.result
+
+    def _observe_usage(self, call: "_NodeCall", tokens: int, cost: float) -> None:
+        """Update the running averages and settle rate limits to the actual usage."""
+        if self._cost_average is None or self._token_average is None:
+            self._token_average, self._cost_average = float(tokens), cost
+        else:
+            self._token_average += 0.2 * (tokens - self._token_average)
+            self._cost_average += 0.2 * (cost - self._cost_average)
+        actual = {"tokens": float(tokens), "usd": cost}
+        for limiter, held in call.rate_held or ():
+            if limiter.unit in actual:
+                limiter.record(actual[limiter.unit] - held)
+        call.rate_held = None
+
+    def _time_limit(self, call: "_NodeCall"):
+        """
+        Deadline scope for the node and its recovery: the earlier of the
+        node's max_seconds and the GlobalBudget's. Medic, its strategies and
+        providers read it to size timeouts and skip work that cannot finish.
+        """
+        seconds = None
+        if self.timeout_fuse is not None:
+            seconds = self.timeout_fuse.max_seconds - (time.time() - call.start_time)
+        if self.budget is not None and self.budget.max_seconds is not None:
+            left = self.budget.remaining_seconds
+            seconds = left if seconds is None else min(seconds, left)
+        if seconds is None:
+            return contextlib.nullcontext()
+        return deadline(seconds)
+
+    def __call__(self, *args, **kwargs):
+        call = self.prepare(args, kwargs)
+        if call.served:
+            return self.finish(call)
+        try:
+            return self._run(call, args, kwargs)
+        finally:
+            self._settle(call)
+
+    def _run(self, call: "_NodeCall", args: tuple, kwargs: dict) -> Any:
+        """Run the node and its recovery for a prepared call."""
+        # 2. Execution & Medic, cut off at max_seconds
+        with self._time_limit(call):
+            result, error = None, None
+            try:
+                if self.timeout_fuse is None:
+                    result = self.func(*args, **kwargs)
+                else:
+                    result = self.timeout_fuse.run(self.func, args, kwargs, call.start_time)
+            except Exception as e:
+                error = e
+            self.handle_result(call, result, error)
+
+            while self.needs_recovery(call):
+                self.recover_once(call)
+
+        return self.finish(call)
+
+    def _lean_failure(self, args: tuple, kwargs: dict, result: Any, error: Optional[Exception]) -> "_NodeCall":
+        """Build the call record for a lean_call that needs repair."""
+        state = args[0] if args else kwargs.get("state")
+        call = _NodeCall(state=state, run_id=None, storage=None, calculator=None)
+        if isinstance(error, SentinelError):
+            call.result = result
+            call.current_error = error
+            call.diagnosis = str(error)
+        else:
+            self.handle_result(call, result, error)
+        return call
+
+    def lean_call(self, *args, **kwargs):
+        """
+        Fast path used when only validation and recovery are enabled.
+
+        Calls the node and validates the output; the general machinery is
+        only entered when something needs repair.
+        """
+        if not self.accepts_config:
+            kwargs.pop("config", None)
+        try:
+            result = self.func(*args, **kwargs)
+        except Exception as e:
+            call = self._lean_failure(args, kwargs, None, e)
+        else:
+            try:
+                return self.sentinel.validate(result)
+            except SentinelError as se:
+                call = self._lean_failure(args, kwargs, result, se)
+
+        while self.needs_recovery(call):
+            self.recover_once(call)
+        return self.finish(call)
+
+    async def alean_call(self, *args, **kwargs):
+        """Async counterpart of lean_call."""
+        if not self.accepts_config:
+            kwargs.pop("config", None)
+        try:
+            result = await self.func(*args, **kwargs)
+        except Exception as e:
+            call = self._lean_failure(args, kwargs, None, e)
+        else:
+            try:
+                return self.sentinel.validate(result)
+            except SentinelError as se:
+                call = self._lean_failure(args, kwargs, result, se)
+
+        while self.needs_recovery(call):
+            await asyncio.to_thread(self.recover_once, call)
+        return self.finish(call)
+
+    async def acall(self, *args, **kwargs):
+        """
+        Async counterpart of __call__ for coroutine nodes.
+
+        The node is awaited on the event loop. Medic recovery (which may make
+        blocking LLM calls) always runs in the default executor, and so does
+        storage I/O unless the backend is non-blocking (in-memory).
+        """
+        offload = (
+            (self.tracing and getattr(self.storage or get_default_storage(), "blocking_io", True))
+            or (self.cache is not None and self.cache.blocking_io)
+            or bool(self.rate_limits)  # prepare may wait for capacity
+        )
+
+        if offload:
+            call = await asyncio.to_thread(self.prepare, args, kwargs)
+        else:
+            call = self.prepare(args, kwargs)
+
+        if call.served:
+            if offload:
+                return await asyncio.to_thread(self.finish, call)
+            return self.finish(call)
+        try:
+            return await self._arun(call, args, kwargs, offload)
+        finally:
+            self._settle(call)
+
+    async def _arun(self, call: "_NodeCall", args: tuple, kwargs: dict, offload: bool) -> Any:
+        """Run the node and its recovery for a prepared call."""
+        # 2. Execution & Medic, cancelled at max_seconds
+        with self._time_limit(call):
+            result, error = None, None
+            try:
+                if self.timeout_fuse is None:
+                    result = await self.func(*args, **kwargs)
+                else:
+                    result = await self.timeout_fuse.arun(self.func(*args, **kwargs), call.start_time)
+            except Exception as e:
+                error = e
+            self.handle_result(call, result, error)
+
+            while self.needs_recovery(call):
+                await asyncio.to_thread(self.recover_once, call)
+
+        if offload:
+            return await asyncio.to_thread(self.finish, call)
+        return self.finish(call)
+
+
+@dataclass
+class _NodeCall:
+    """Mutable state for a single invocation of a reliable node."""
+    state: Any
+    run_id: Optional[str]
+    storage: Optional[BaseStorage]
+    calculator: Optional[CostCalculator]
+    state_hash: Optional[str] = None
+    cache_key: Optional[str] = None
+    reserved: Optional[float] = None  # Held on the GlobalBudget until settled
+    fuse_reserved: Optional[float] = None  # Held on the BudgetFuse until settled
+    tree_path: Optional[tuple] = None  # (tenant, run_id, node) on the BudgetTree
+    tree_reserved: Optional[float] = None  # Held on the BudgetTree until settled
+    estimate: Optional[Tuple[float, float]] = None  # Up-front (tokens, cost)
+    rate_held: Optional[list] = None  # (limiter, amount) taken from rate limits
+    probe: bool = False  # Holds a half-open breaker probe slot until handle_result
+    served: bool = False  # Output came from the cache or fallback, the node did not run
+    start_time: float = 0.0
+    result: Any = None
+    status: str = "success"
+    recovery_count: int = 0
+    current_error: Optional[Exception] = None
+    saved_cost: float = 0.0
+    diagnosis: Optional[str] = None
 
-            # Post-execution per-node budget check (after cost is logged)
-            if _budget_fuse:
-                updated_run_cost = _storage.get_run_cost(run_id)
-                _budget_fuse.check(updated_run_cost)
 
-            # Post-execution timeout check
-            if _timeout_fuse:
-                _timeout_fuse.check(start_time)
+def reliable_node(
+    sentinel_schema: Optional[Type[BaseModel]] = None,
+    medic_repair: Optional[Callable[[Exception, Any], Any]] = None,
+    llm_callable: Optional[Callable[[str], str]] = None,
+    fuse_limit: Optional[int] = 3,
+    node_name: Optional[str] = None,
+    storage: Union[BaseStorage, None, bool] = None,
+    max_cost_usd: Optional[float] = None,
+    max_seconds: Optional[float] = None,
+    budget: Optional[GlobalBudget] = None,
+    cost_per_token: Optional[float] = None,
+    model: Optional[str] = None,
+    fuse_incremental: bool = False,
+    fingerprint: Optional[FingerprintSpec] = None,
+    cycle_detector: Optional[CycleDetector] = None,
+    similarity_fuse: Optional[SimilarityFuse] = None,
+    fuse_history: Optional[SketchHistory] = None,
+    circuit_breaker: Union[CircuitBreaker, bool, None] = None,
+    fallback: Optional[FallbackCache] = None,
+    cache: Union[BaseCache, str, None] = None,
+    cache_version: str = "",
+    timeout_isolation: str = "thread",
+    budget_tree: Optional[BudgetTree] = None,
+    rate_limits: Union[RateLimiter, Sequence[RateLimiter], None] = None,
+    spend_velocity: Optional[SpendVelocityFuse] = None,
+):
+    """
+    Decorator to make any AI agent node reliable.
+    Integrates Fuse (loop detection), Medic (recovery), and Sentinel (validation).
+
+    Works on both regular functions and ``async def`` nodes. For coroutine
+    functions the wrapper is itself a coroutine function; Medic recovery and
+    blocking storage I/O run in the default executor so the event loop is
+    never blocked.
+
+    Args:
+        sentinel_schema: Pydantic model to validate outputs against
+        medic_repair: Legacy callback for custom repair logic
+        llm_callable: LLM callable for intelligent error repair
+        fuse_limit: Max identical states before tripping loop detection (default 3).
+            None or 0 disables loop detection and its history reads.
+        node_name: Override the node name (defaults to function name)
+        storage: Custom storage backend (defaults to in-memory). False disables
+            tracing entirely; requires no max_cost_usd, and fuse_limit=None
+            unless a fuse_history is given.
+        max_cost_usd: Maximum dollar cost for this node's run before tripping
+        max_seconds: Maximum execution time in seconds. The node is cut off at
+            the limit (sync nodes run under a watchdog, async nodes are
+            cancelled) and provider calls inside it get at most the time left.
+        budget: Shared GlobalBudget instance for cross-node cost/time limits
+        cost_per_token: Override cost per token (USD). Overrides model pricing lookup.
+        model: Model name for pricing table lookup (e.g. "gpt-4o", "claude-3-5-sonnet")
+        fuse_incremental: Hash list fields (e.g. message histories) incrementally,
+            so loop detection cost tracks what changed rather than state size
+        fingerprint: FingerprintSpec selecting and normalizing the state fields
+            the Fuse compares (e.g. excluding timestamps)
+        cycle_detector: Shared CycleDetector catching loops that span several
+            nodes (A -> B -> A -> B); pass the same instance to every node
+        similarity_fuse: SimilarityFuse tripping on near-duplicate (reworded)
+            states, which exact-hash loop detection misses
+        fuse_history: SketchHistory the Fuse counts repeats in instead of the
+            storage, for fixed memory and time-decayed repeats on long runs
+        circuit_breaker: CircuitBreaker that opens after repeated failures and
+            then rejects calls with CircuitOpenError without running the node
+            or Medic. True uses the process-wide breaker for this node name.
+        fallback: FallbackCache of validated outputs served (traced as
+            "fallback") instead of rejecting while the breaker is open
+        cache: Result cache (LRUCache, SQLiteCache, ShelveCache, or "memory" /
+            "sqlite" / "shelve") memoizing outputs of deterministic nodes by
+            input fingerprint; hits skip execution and are traced as "cached"
+        cache_version: Part of the cache key; change it when the node's logic
+            changes to stop serving old outputs
+        timeout_isolation: How max_seconds cuts off sync nodes: "thread" (the
+            node is abandoned and keeps running in the background) or
+            "process" (the node runs in a forked process that is terminated)
+        budget_tree: Shared BudgetTree rolling each call's cost up to its node,
+            run, tenant (config["configurable"]["tenant_id"]) and global limits
+        rate_limits: RateLimiter(s) on requests, tokens or dollars; the node
+            waits for capacity (or gets RateLimitExceededError) before running
+        spend_velocity: SpendVelocityFuse; trips a run whose cost or latency
+            per step jumps k standard deviations above this node's baseline
+    """
 
-            # Post-execution global budget checks
-            if budget:
-                budget.check_cost()
-                budget.check_time()
+    def decorator(func):
+        runner = _NodeRunner(
+            func,
+            sentinel_schema=sentinel_schema,
+            medic_repair=medic_repair,
+            llm_callable=llm_callable,
+            fuse_limit=fuse_limit,
+            node_name=node_name,
+            storage=storage,
+            max_cost_usd=max_cost_usd,
+            max_seconds=max_seconds,
+            budget=budget,
+            cost_per_token=cost_per_token,
+            model=model,
+            fuse_incremental=fuse_incremental,
+            fingerprint=fingerprint,
+            cycle_detector=cycle_detector,
+            similarity_fuse=similarity_fuse,
+            fuse_history=fuse_history,
+            circuit_breaker=circuit_breaker,
+            fallback=fallback,
+            cache=cache,
+            cache_version=cache_version,
+            timeout_isolation=timeout_isolation,
+            budget_tree=budget_tree,
+            rate_limits=rate_limits,
+            spend_velocity=spend_velocity,
+        )
+
+        if inspect.iscoroutinefunction(func):
+            async_entry = runner.alean_call if runner.lean else runner.acall
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await async_entry(*args, **kwargs)
+            return async_wrapper
+
+        entry = runner.lean_call if runner.lean else runner.__call__
 
-            return result
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return entry(*args, **kwargs)
         return wrapper
     return decorator
 
@@ -354,3 +354,19 @@ class TimeoutExceededError(AgentCircuitError):
         super().__init__(message)
         self.elapsed = elapsed
         self.limit = limit
+
+
+class CircuitOpenError(AgentCircuitError):
+    """Raised when a node's circuit breaker rejects a call."""
+    def __init__(self, message: str, node_id: Optional[str] = None, retry_after: float = 0.0):
+        super().__init__(message)
+        self.node_id = node_id
+        self.retry_after = retry_after
+
+
+class RateLimitExceededError(AgentCircuitError):
+    """Raised when a rate limit cannot grant capacity in time."""
+    def __init__(self, message: str, retry_after: float = 0.0, limit: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.limit = limit
@@ -1,19 +1,460 @@
 import json
 import hashlib
-from typing import Any, List, Dict
+import math
+import operator
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Dict, Optional, Set, Tuple
+
+
+def hash_state(state: Any) -> str:
+    """Stable hash of a state, used as the loop-detection key."""
+    try:
+        # Sort keys for consistent JSON
+        serialized = json.dumps(state, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode()).hexdigest()
+    except Exception:
+        # Fallback for non-serializable
+        return str(hash(str(state)))
+
+
+def _digest(value: Any) -> bytes:
+    serialized = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode()).digest()
+
+
+_EMPTY_CHAIN = hashlib.sha256(b"").digest()
+
+
+class _ListChain:
+    """Cached hash chain of one list: the elements seen and a digest per prefix."""
+
+    __slots__ = ("items", "digests")
+
+    def __init__(self):
+        # Strong references keep the elements' ids from being reused
+        self.items: List[Any] = []
+        self.digests: List[bytes] = []
+
+
+class _IncrementalHasher:
+    """
+    Merkle-style state hasher for append-only list fields.
+
+    A dict state is hashed as the digest of its per-key digests. Each list
+    value is hashed as a chain, digest[i] = sha256(digest[i-1] + sha256(item)),
+    so when a list grows (a LangGraph message history) only the new items
+    are serialized. The cached prefix is reused as long as its items are the
+    same objects as before; items are assumed not to be mutated in place
+    once appended. Any other change falls back to rehashing from the first
+    differing item, so the result never depends on the cache.
+    """
+
+    def __init__(self, max_chains: int = 256):
+        self.max_chains = max_chains
+        # (key, id of first item) -> chain, least recently used first
+        self._chains: "OrderedDict[Tuple[str, int], _ListChain]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hash(self, state: Any) -> str:
+        if not isinstance(state, dict):
+            return hash_state(state)
+        try:
+            parts = []
+            for key in sorted(state, key=str):
+                value = state[key]
+                if isinstance(value, list):
+                    parts.append((str(key), "l", self._list_digest(str(key), value).hex()))
+                else:
+                    parts.append((str(key), "v", _digest(value).hex()))
+            return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+        except Exception:
+            return hash_state(state)
+
+    def _list_digest(self, key: str, items: List[Any]) -> bytes:
+        if not items:
+            return _EMPTY_CHAIN
+        cache_key = (key, id(items[0]))
+        with self._lock:
+            chain = self._chains.get(cache_key)
+            if chain is not None:
+                self._chains.move_to_end(cache_key)
+
+        if chain is None:
+            chain = _ListChain()
+            keep = 0
+        else:
+            cached = chain.items
+            n = min(len(cached), len(items))
+            # Pointer comparisons only; map stops at the shorter list
+            if all(map(operator.is_, items, cached)):
+                keep = n
+            else:
+                keep = 0
+                while items[keep] is cached[keep]:
+                    keep += 1
+
+        digests = chain.digests[:keep]
+        prev = digests[-1] if digests else _EMPTY_CHAIN
+        for item in items[keep:]:
+            prev = hashlib.sha256(prev + _digest(item)).digest()
+            digests.append(prev)
+
+        if keep < len(items) or keep < len(chain.items):
+            updated = _ListChain()
+            updated.items = list(items)
+            updated.digests = digests
+            with self._lock:
+                self._chains[cache_key] = updated
+                self._chains.move_to_end(cache_key)
+                while len(self._chains) > self.max_chains:
+                    self._chains.popitem(last=False)
+        return prev
+
+
+# A compiled set of dotted paths: {key: subtree}, where an empty subtree
+# means the whole value at that key
+_PathTree = Dict[str, Any]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _path_tree(paths: List[str]) -> _PathTree:
+    tree: _PathTree = {}
+    for path in paths:
+        node = tree
+        parts = path.split(".")
+        for i, part in enumerate(parts):
+            if part in node and not node[part]:
+                break  # an ancestor is already selected whole
+            if i == len(parts) - 1:
+                node[part] = {}
+            else:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def _project(value: Any, tree: _PathTree) -> Any:
+    """Keep only the paths in tree."""
+    if not isinstance(value, dict):
+        return value
+    out = {}
+    for key, sub in tree.items():
+        if key in value:
+            out[key] = _project(value[key], sub) if sub else value[key]
+    return out
+
+
+def _drop(value: Any, tree: _PathTree) -> Any:
+    """Remove the paths in tree, copying only the dicts along them."""
+    if not isinstance(value, dict):
+        return value
+    out = dict(value)
+    for key, sub in tree.items():
+        if key not in out:
+            continue
+        if sub:
+            out[key] = _drop(out[key], sub)
+        else:
+            del out[key]
+    return out
+
+
+def _tail(value: Any, tree: _PathTree, k: int) -> Any:
+    """Trim the lists at the paths in tree to their last k items."""
+    if not isinstance(value, dict):
+        return value
+    out = dict(value)
+    for key, sub in tree.items():
+        if key not in out:
+            continue
+        if sub:
+            out[key] = _tail(out[key], sub, k)
+        elif isinstance(out[key], (list, tuple)):
+            out[key] = list(out[key][-k:]) if k else []
+    return out
+
+
+def _normalizer(float_digits: Optional[int], whitespace: bool) -> Callable[[Any], Any]:
+    def normalize(value: Any) -> Any:
+        if isinstance(value, str):
+            return _WHITESPACE.sub(" ", value).strip() if whitespace else value
+        if isinstance(value, float):
+            return round(value, float_digits) if float_digits is not None else value
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        return value
+    return normalize
+
+
+@dataclass
+class FingerprintSpec:
+    """
+    Which parts of a state the Fuse treats as its identity.
+
+    Paths are dotted keys into nested dicts, e.g. "meta.request_id".
+    Volatile fields (timestamps, request IDs, counters) should be excluded
+    so repeats are still recognized, and large payloads left out so hashing
+    stays cheap.
+
+    Attributes:
+        include: Only these paths count (default: the whole state)
+        exclude: Paths to ignore, applied after include
+        float_digits: Round floats to this many digits
+        normalize_whitespace: Collapse runs of whitespace in strings
+        last_k: Only keep the last k items of the last_k_fields lists
+        last_k_fields: List paths that last_k applies to
+    """
+    include: Optional[List[str]] = None
+    exclude: List[str] = field(default_factory=list)
+    float_digits: Optional[int] = None
+    normalize_whitespace: bool = False
+    last_k: Optional[int] = None
+    last_k_fields: List[str] = field(default_factory=lambda: ["messages"])
+
+    def compile(self) -> Callable[[Any], Any]:
+        """
+        Build the extractor that maps a state to its fingerprint.
+
+        Only the enabled steps are chained, so the cost is that of the
+        options in use. Input states are never modified.
+        """
+        steps: List[Callable[[Any], Any]] = []
+        if self.include is not None:
+            include = _path_tree(self.include)
+            steps.append(lambda state: _project(state, include))
+        if self.exclude:
+            exclude = _path_tree(self.exclude)
+            steps.append(lambda state: _drop(state, exclude))
+        if self.last_k is not None:
+            tails, k = _path_tree(self.last_k_fields), self.last_k
+            steps.append(lambda state: _tail(state, tails, k))
+        if self.float_digits is not None or self.normalize_whitespace:
+            steps.append(_normalizer(self.float_digits, self.normalize_whitespace))
+
+        if not steps:
+            return lambda state: state
+        if len(steps) == 1:
+            return steps[0]
+
+        def extract(state: Any) -> Any:
+            for step in steps:
+                state = step(state)
+            return state
+        return extract
+
+
+class _Sketch:
+    """
+    Counters of one (run, node): time slices, newest last.
+
+    Slices are exact {state_hash: count} tables until the run has seen
+    more distinct states than SketchHistory.exact_entries, then count-min
+    arrays.
+    """
+
+    __slots__ = ("slices", "slice_start", "exact")
+
+    def __init__(self, now: float):
+        self.slices: deque = deque([{}])
+        self.slice_start = now
+        self.exact = True
+
+
+class SketchHistory:
+    """
+    Fixed-memory Fuse history: count-min sketches with time decay.
+
+    By default the Fuse counts prior occurrences of a state through the
+    storage's per-run index, which grows with every step of a run. A
+    SketchHistory counts state_hash occurrences per (run_id, node_id) in
+    fixed memory. Each (run, node) starts with a small exact table; once it
+    has seen more than exact_entries distinct states (a long run), the
+    table becomes a count-min sketch whose size only depends on the error
+    bounds: a count is never underestimated, and with probability
+    1 - delta it is overestimated by at most epsilon * (steps of that run
+    at that node in the window). Updates are conservative (only the
+    smallest counters are raised), which keeps the overestimate well below
+    that bound in practice; size epsilon for the longest run expected at
+    one node.
+
+    At most max_runs (run, node) entries are kept; the least recently
+    used are dropped, and a dropped run starts counting afresh.
+    memory_bytes is the resulting upper bound.
+
+    With decay_seconds, counts are split into `slices` time slices that
+    expire in turn, so repeats older than decay_seconds stop counting
+    toward the fuse limit (repeats in the oldest slice may expire up to one
+    slice early).
+    """
+
+    _MAX_COUNT = 0xFFFF  # Counters saturate instead of wrapping
+    # Approximate bytes per exact table entry (key string, count, dict slot)
+    _EXACT_ENTRY_BYTES = 200
+
+    def __init__(
+        self,
+        epsilon: float = 0.001,
+        delta: float = 0.01,
+        decay_seconds: Optional[float] = None,
+        slices: int = 4,
+        max_runs: int = 256,
+        exact_entries: int = 64,
+    ):
+        if not 0.0 < epsilon < 1.0 or not 0.0 < delta < 1.0:
+            raise ValueError("epsilon and delta must be in (0, 1)")
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1.0 / delta))
+        self.decay_seconds = decay_seconds
+        self.max_slices = max(1, slices) if decay_seconds else 1
+        self.max_runs = max_runs
+        self.exact_entries = exact_entries
+        self._slice_seconds = decay_seconds / self.max_slices if decay_seconds else None
+        # (run_id, node_id) -> counters, least recently used first
+        self._sketches: "OrderedDict[Tuple[str, str], _Sketch]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def sketch_bytes(self) -> int:
+        """Memory of one (run, node) once it has become a count-min sketch."""
+        return self.max_slices * self.depth * self.width * array("H").itemsize
+
+    @property
+    def memory_bytes(self) -> int:
+        """Upper bound on the memory held by the counters, fixed by the settings."""
+        exact_bytes = (self.exact_entries + 1) * self._EXACT_ENTRY_BYTES
+        return self.max_runs * max(self.sketch_bytes, exact_bytes)
+
+    def _new_slice(self, sketch: _Sketch) -> Any:
+        if sketch.exact:
+            return {}
+        return array("H", bytes(self.depth * self.width * array("H").itemsize))
+
+    def _cells(self, state_hash: str) -> List[int]:
+        digest = hashlib.blake2b(state_hash.encode(), digest_size=16).digest()
+        # Double hashing: row i uses h1 + i * h2
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def _sketch(self, run_id: str, node_id: str, create: bool) -> Optional[_Sketch]:
+        key = (run_id, node_id)
+        sketch = self._sketches.get(key)
+        if sketch is not None:
+            self._sketches.move_to_end(key)
+            self._rotate(sketch)
+        elif create:
+            sketch = self._sketches[key] = _Sketch(time.monotonic())
+            while len(self._sketches) > self.max_runs:
+                self._sketches.popitem(last=False)
+        return sketch
+
+    def _rotate(self, sketch: _Sketch) -> None:
+        if self._slice_seconds is None:
+            return
+        elapsed = time.monotonic() - sketch.slice_start
+        if elapsed < self._slice_seconds:
+            return
+        if elapsed >= self.decay_seconds:
+            # Idle for a whole window: everything has expired
+            sketch.exact = True
+            sketch.slices = deque([{}])
+            sketch.slice_start = time.monotonic()
+            return
+        while elapsed >= self._slice_seconds:
+            sketch.slices.append(self._new_slice(sketch))
+            if len(sketch.slices) > self.max_slices:
+                sketch.slices.popleft()
+            sketch.slice_start += self._slice_seconds
+            elapsed -= self._slice_seconds
+
+    def _promote(self, sketch: _Sketch) -> None:
+        """Turn a run's exact tables into count-min arrays."""
+        sketch.exact = False
+        promoted: deque = deque()
+        for table in sketch.slices:
+            counters = self._new_slice(sketch)
+            for state_hash, count in table.items():
+                for cell in self._cells(state_hash):
+                    counters[cell] = min(self._MAX_COUNT, counters[cell] + count)
+            promoted.append(counters)
+        sketch.slices = promoted
+
+    @staticmethod
+    def _estimate(sketch: _Sketch, cells: List[int]) -> int:
+        return min(sum(counters[cell] for counters in sketch.slices) for cell in cells)
+
+    def count(self, run_id: str, node_id: str, state_hash: str) -> int:
+        """Estimated occurrences of a state at a node within the window."""
+        with self._lock:
+            sketch = self._sketch(run_id, node_id, create=False)
+            if sketch is None:
+                return 0
+            if sketch.exact:
+                return sum(table.get(state_hash, 0) for table in sketch.slices)
+            return self._estimate(sketch, self._cells(state_hash))
+
+    def add(self, run_id: str, node_id: str, state_hash: str) -> int:
+        """Record an occurrence and return the estimated count before it."""
+        with self._lock:
+            sketch = self._sketch(run_id, node_id, create=True)
+            if sketch.exact:
+                prior = sum(table.get(state_hash, 0) for table in sketch.slices)
+                current = sketch.slices[-1]
+                current[state_hash] = current.get(state_hash, 0) + 1
+                if sum(len(table) for table in sketch.slices) > self.exact_entries:
+                    self._promote(sketch)
+                return prior
+            cells = self._cells(state_hash)
+            prior = self._estimate(sketch, cells)
+            current = sketch.slices[-1]
+            # Conservative update: raise each counter only as far as the new estimate needs
+            for cell in cells:
+                total = sum(counters[cell] for counters in sketch.slices)
+                if total <= prior and current[cell] < self._MAX_COUNT:
+                    current[cell] += 1
+            return prior
+
+    def forget(self, run_id: str) -> None:
+        """Drop a finished run's counters."""
+        with self._lock:
+            for key in [key for key in self._sketches if key[0] == run_id]:
+                del self._sketches[key]
+
 
 class Fuse:
     """
     The Fuse: Detects execution loops by tracking state hashes.
     Trips if identical state is seen 'limit' times (default 3).
+
+    With incremental=True, list fields of dict states are hashed as Merkle
+    chains and cached, so hashing a growing message history costs time in
+    the number of new messages rather than the total state size. Hashes
+    from the two modes differ and should not be mixed for the same node.
+
+    A FingerprintSpec restricts and normalizes what is hashed; it is
+    compiled once here. With a SketchHistory, check_run counts repeats in
+    the sketch (fixed memory, optional time decay) instead of storage.
     """
-    def __init__(self, limit: int = 3):
+    def __init__(
+        self,
+        limit: int = 3,
+        incremental: bool = False,
+        fingerprint: Optional[FingerprintSpec] = None,
+        history: Optional[SketchHistory] = None,
+    ):
         self.limit = limit
-        # In a real persistence scenario, this might need to be loaded from DB
-        # For now, we assume this is instantiated per graph run or we pass history in.
-        # Check if we can store it in the state? 
-        # Or we rely on the storage layer to query past states.
-        pass
+        self.history = history
+        self._hasher = _IncrementalHasher() if incremental else None
+        self.fingerprint = fingerprint
+        self._extract = fingerprint.compile() if fingerprint is not None else None
 
     def check(self, history: List[str], current_state: Any) -> None:
         """
@@ -22,18 +463,332 @@ class Fuse:
         """
         current_hash = self._hash_state(current_state)
         count = history.count(current_hash)
+        self._trip_if_over(count)
+
+    def check_run(self, storage: Any, run_id: str, node_id: str, state_hash: str) -> None:
+        """
+        Checks a state hash against the storage's per-run state index.
+
+        This is a single count lookup instead of rehashing the run history.
+        With a SketchHistory the count comes from (and the state is recorded
+        in) the sketch, and storage is not used.
+        Raises LoopError if tripped.
+        """
+        if self.history is not None:
+            count = self.history.add(run_id, node_id, state_hash)
+        else:
+            count = storage.count_state(run_id, node_id, state_hash)
+        self._trip_if_over(count)
+
+    def _trip_if_over(self, count: int) -> None:
         if count >= self.limit:
             raise LoopError(f"Fuse Tripped: Loop detected. State repeated {count} times.")
 
     def _hash_state(self, state: Any) -> str:
         """Stable hash of the state."""
-        try:
-            # Sort keys for consistent JSON
-            serialized = json.dumps(state, sort_keys=True, default=str)
-            return hashlib.sha256(serialized.encode()).hexdigest()
-        except Exception:
-            # Fallback for non-serializable
-            return str(hash(str(state)))
+        if self._extract is not None:
+            state = self._extract(state)
+        if self._hasher is not None:
+            return self._hasher.hash(state)
+        return hash_state(state)
+
+class _RunWindow:
+    """Recent transitions of one run and the current repeat streak per period."""
+
+    __slots__ = ("transitions", "streaks")
+
+    def __init__(self, max_period: int):
+        self.transitions: "deque[Tuple[str, str]]" = deque(maxlen=max_period)
+        # streaks[p]: consecutive recent steps equal to the step p before them
+        self.streaks = [0] * (max_period + 1)
+
+
+class CycleDetector:
+    """
+    Run-level loop detection across nodes.
+
+    The Fuse only sees repeats of one state at one node, so ping-pong loops
+    (A -> B -> A -> B with slightly different states) and agent-to-agent
+    loops slip past it. A CycleDetector is shared by all nodes of a graph
+    (like a GlobalBudget) and sees every (node_id, fingerprint) transition
+    of a run. It trips when the same sequence of up to max_period
+    transitions repeats `repeats` times in a row.
+
+    For each period p it keeps how many consecutive steps matched the step
+    p before them; a cycle of period p repeated r times is a streak of
+    p * (r - 1). Each step costs O(max_period) and each run holds at most
+    max_period transitions; the least recently active runs are dropped
+    past max_runs.
+
+    Pass a FingerprintSpec to ignore the state fields that change on every
+    iteration, or the loop will look like progress.
+    """
+
+    def __init__(
+        self,
+        max_period: int = 8,
+        repeats: int = 3,
+        fingerprint: Optional[FingerprintSpec] = None,
+        max_runs: int = 10000,
+    ):
+        if max_period < 1:
+            raise ValueError("max_period must be at least 1")
+        if repeats < 2:
+            raise ValueError("repeats must be at least 2")
+        self.max_period = max_period
+        self.repeats = repeats
+        self.max_runs = max_runs
+        self.fingerprint = fingerprint
+        self._extract = fingerprint.compile() if fingerprint is not None else None
+        self._runs: "OrderedDict[str, _RunWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fingerprint_hash(self, state: Any) -> str:
+        """Hash of a state's fingerprint."""
+        if self._extract is not None:
+            state = self._extract(state)
+        return hash_state(state)
+
+    def observe(
+        self,
+        run_id: str,
+        node_id: str,
+        state: Any = None,
+        state_hash: Optional[str] = None,
+    ) -> None:
+        """
+        Record that node_id is about to run on state within run_id.
+
+        state_hash may be passed to reuse a hash the caller already has
+        (e.g. the Fuse's); it is only used when this detector has no
+        fingerprint of its own. Raises CycleError if a cycle is detected.
+        """
+        if state_hash is None or self._extract is not None:
+            state_hash = self.fingerprint_hash(state)
+        transition = (node_id, state_hash)
+
+        with self._lock:
+            window = self._runs.get(run_id)
+            if window is None:
+                window = self._runs[run_id] = _RunWindow(self.max_period)
+                while len(self._runs) > self.max_runs:
+                    self._runs.popitem(last=False)
+            else:
+                self._runs.move_to_end(run_id)
+
+            transitions = window.transitions
+            streaks = window.streaks
+            seen = len(transitions)
+            period = 0
+            for p in range(1, self.max_period + 1):
+                if p <= seen and transitions[-p] == transition:
+                    streaks[p] += 1
+                    if not period and streaks[p] >= p * (self.repeats - 1):
+                        period = p
+                else:
+                    streaks[p] = 0
+            transitions.append(transition)
+
+            if period:
+                cycle = [node for node, _ in list(transitions)[-period:]]
+
+        if period:
+            raise CycleError(
+                f"Fuse Tripped: Cycle detected. Sequence {' -> '.join(cycle)} "
+                f"repeated {self.repeats} times."
+            )
+
+    def reset(self, run_id: Optional[str] = None) -> None:
+        """Forget one run's transitions, or every run's."""
+        with self._lock:
+            if run_id is None:
+                self._runs.clear()
+            else:
+                self._runs.pop(run_id, None)
+
+
+_WORD = re.compile(r"\w+")
+
+
+def _state_text(state: Any, out: List[str]) -> None:
+    """Collect a state's leaf values (not its keys) as text."""
+    if isinstance(state, dict):
+        for value in state.values():
+            _state_text(value, out)
+    elif isinstance(state, (list, tuple)):
+        for value in state:
+            _state_text(value, out)
+    elif state is not None:
+        out.append(str(state))
+
+
+def simhash(text: str, shingle: int = 1) -> int:
+    """
+    64-bit SimHash of a text's word shingles.
+
+    Texts that share most of their shingles get sketches that differ in
+    few bits, so the Hamming distance approximates how reworded they are.
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) >= shingle:
+        features = {" ".join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)}
+    else:
+        features = set(words) or {text}
+    bits = [
+        format(int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "big"), "064b")
+        for f in features
+    ]
+    # Majority vote per bit position, one column of all features at a time
+    value = 0
+    for column in zip(*bits):
+        value = (value << 1) | (column.count("1") * 2 > len(bits))
+    return value
+
+
+class _SketchWindow:
+    """Recent sketches of one node in one run, with their LSH band index."""
+
+    __slots__ = ("order", "sketches", "buckets", "next_id")
+
+    def __init__(self):
+        self.order: "deque[int]" = deque()
+        self.sketches: Dict[int, int] = {}
+        # (band, band value) -> ids of sketches with that band
+        self.buckets: Dict[Tuple[int, int], Set[int]] = {}
+        self.next_id = 0
+
+
+class SimilarityFuse:
+    """
+    Near-duplicate loop detection.
+
+    A looping LLM rarely repeats itself byte for byte, so the Fuse's exact
+    hashes never match. The SimilarityFuse keeps a 64-bit SimHash sketch of
+    each of the last `window` states per node per run, and trips when the
+    current state is within `threshold` similarity (1 - Hamming distance /
+    64) of `limit` earlier ones.
+
+    Sketches are indexed by `bands` LSH bands: only sketches sharing a band
+    exactly are compared, so a check costs the number of near candidates
+    rather than the window length. With bands greater than the allowed
+    Hamming distance no near-duplicate can be missed (pigeonhole); the
+    defaults allow 7 differing bits over 8 bands.
+
+    Sketches live in memory; the least recently active (run, node) pairs
+    are dropped past max_runs.
+    """
+
+    def __init__(
+        self,
+        limit: int = 3,
+        threshold: float = 0.88,
+        window: int = 50,
+        bands: int = 8,
+        shingle: int = 1,
+        fingerprint: Optional[FingerprintSpec] = None,
+        max_runs: int = 10000,
+    ):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        if not 1 <= bands <= 64:
+            raise ValueError("bands must be between 1 and 64")
+        self.limit = limit
+        self.threshold = threshold
+        self.window = window
+        self.shingle = shingle
+        self.max_runs = max_runs
+        self.max_distance = int((1.0 - threshold) * 64 + 1e-9)
+        self.fingerprint = fingerprint
+        self._extract = fingerprint.compile() if fingerprint is not None else None
+
+        # Split the 64 bits into `bands` nearly equal (shift, mask) slices
+        self._bands: List[Tuple[int, int]] = []
+        shift = 0
+        for i in range(bands):
+            width = 64 // bands + (1 if i < 64 % bands else 0)
+            self._bands.append((shift, (1 << width) - 1))
+            shift += width
+
+        self._windows: "OrderedDict[Tuple[str, str], _SketchWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sketch(self, state: Any) -> int:
+        """SimHash sketch of a state's fingerprint."""
+        if self._extract is not None:
+            state = self._extract(state)
+        parts: List[str] = []
+        _state_text(state, parts)
+        return simhash(" ".join(parts), self.shingle)
+
+    def check(self, run_id: str, node_id: str, state: Any) -> None:
+        """
+        Record a state and trip if it nearly repeats `limit` recent ones.
+
+        Raises LoopError if tripped.
+        """
+        sketch = self.sketch(state)
+        keys = [(i, (sketch >> shift) & mask) for i, (shift, mask) in enumerate(self._bands)]
+
+        with self._lock:
+            window = self._windows.get((run_id, node_id))
+            if window is None:
+                window = self._windows[(run_id, node_id)] = _SketchWindow()
+                while len(self._windows) > self.max_runs:
+                    self._windows.popitem(last=False)
+            else:
+                self._windows.move_to_end((run_id, node_id))
+
+            candidates: Set[int] = set()
+            for key in keys:
+                bucket = window.buckets.get(key)
+                if bucket:
+                    candidates |= bucket
+            sketches = window.sketches
+            count = sum(
+                1 for c in candidates
+                if (sketches[c] ^ sketch).bit_count() <= self.max_distance
+            )
+
+            self._add(window, sketch, keys)
+
+        if count >= self.limit:
+            raise LoopError(
+                f"Fuse Tripped: Near-duplicate loop detected. State within "
+                f"{self.threshold:.0%} similarity of {count} recent states."
+            )
+
+    def _add(self, window: _SketchWindow, sketch: int, keys: List[Tuple[int, int]]) -> None:
+        sketch_id = window.next_id
+        window.next_id += 1
+        window.order.append(sketch_id)
+        window.sketches[sketch_id] = sketch
+        for key in keys:
+            window.buckets.setdefault(key, set()).add(sketch_id)
+
+        if len(window.order) > self.window:
+            old_id = window.order.popleft()
+            old = window.sketches.pop(old_id)
+            for i, (shift, mask) in enumerate(self._bands):
+                key = (i, (old >> shift) & mask)
+                bucket = window.buckets[key]
+                bucket.discard(old_id)
+                if not bucket:
+                    del window.buckets[key]
+
+    def reset(self, run_id: Optional[str] = None) -> None:
+        """Forget one run's sketches, or every run's."""
+        with self._lock:
+            if run_id is None:
+                self._windows.clear()
+            else:
+                for key in [k for k in self._windows if k[0] == run_id]:
+                    del self._windows[key]
+
 
 class LoopError(Exception):
     pass
+
+
+class CycleError(LoopError):
+    """A multi-node cycle detected by CycleDetector."""
+    pass
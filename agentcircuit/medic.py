@@ -21,6 +21,7 @@ try:
 except ImportError:
     pass
 
+from .budget import time_remaining
 from .errors import (
     ErrorClassifier,
     ClassifiedError,
@@ -235,6 +236,12 @@ class Medic:
         if not self.llm_callable:
             raise error
 
+        remaining = time_remaining()
+        if remaining is not None and remaining <= 0:
+            raise MedicError(
+                f"Medic: Deadline exceeded, repair not started. Original error: {error}"
+            )
+
         print(f"Medic: Initiating Repair Sequence (Attempt {recovery_attempts})...")
 
         # Classify the error
@@ -298,6 +305,12 @@ class Medic:
         start_time: float
     ) -> Dict[str, Any]:
         """Direct LLM-based repair as fallback."""
+        remaining = time_remaining()
+        if remaining is not None and remaining <= 0:
+            raise MedicError(
+                f"Medic: Deadline exceeded, direct repair not started. Error: {classified.message}"
+            )
+
         # Build schema text
         schema_text = ""
         if schema:
@@ -12,7 +12,8 @@ import os
 import json
 import time
 
-from .errors import ProviderError
+from .budget import time_remaining
+from .errors import ProviderError, RateLimitExceededError
 
 
 class ProviderType(Enum):
@@ -35,6 +36,7 @@ class ModelConfig:
     max_tokens: int = 4096
     timeout: float = 30.0
     extra_params: Dict[str, Any] = field(default_factory=dict)
+    rate_limits: List[Any] = field(default_factory=list)  # RateLimiters for this model
 
 
 @dataclass
@@ -85,6 +87,24 @@ class LLMProvider(ABC):
         """Allow provider to be used as a callable."""
         return self.complete(prompt)
 
+    def _request_timeout(self) -> float:
+        """
+        Timeout for the next request: config.timeout, capped by the time left
+        before the current deadline (see reliable_node's max_seconds).
+
+        Raises:
+            ProviderError: If the deadline has already passed
+        """
+        remaining = time_remaining()
+        if remaining is None:
+            return self.config.timeout
+        if remaining <= 0:
+            raise ProviderError(
+                "Deadline exceeded before the request was sent",
+                provider=self.config.provider.value
+            )
+        return min(self.config.timeout, remaining)
+
 
 class OpenAIProvider(LLMProvider):
     """OpenAI/OpenAI-compatible provider."""
@@ -119,12 +139,14 @@ class OpenAIProvider(LLMProvider):
         return self._client
 
     def complete(self, prompt: str) -> str:
+        timeout = self._request_timeout()
         try:
             response = self.client.chat.completions.create(
                 model=self.config.model_id,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=self.config.temperature,
                 max_tokens=self.config.max_tokens,
+                timeout=timeout,
                 **self.config.extra_params
             )
 
@@ -175,11 +197,13 @@ class AnthropicProvider(LLMProvider):
         return self._client
 
     def complete(self, prompt: str) -> str:
+        timeout = self._request_timeout()
         try:
             response = self.client.messages.create(
                 model=self.config.model_id,
                 max_tokens=self.config.max_tokens,
                 messages=[{"role": "user", "content": prompt}],
+                timeout=timeout,
                 **self.config.extra_params
             )
 
@@ -230,12 +254,14 @@ class GroqProvider(LLMProvider):
         return self._client
 
     def complete(self, prompt: str) -> str:
+        timeout = self._request_timeout()
         try:
             response = self.client.chat.completions.create(
                 model=self.config.model_id,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=self.config.temperature,
                 max_tokens=self.config.max_tokens,
+                timeout=timeout,
                 **self.config.extra_params
             )
 
@@ -273,8 +299,9 @@ class OllamaProvider(LLMProvider):
                 provider="ollama"
             )
 
+        timeout = self._request_timeout()
         try:
-            with httpx.Client(timeout=self.config.timeout) as client:
+            with httpx.Client(timeout=timeout) as client:
                 response = client.post(
                     f"{self.base_url}/api/generate",
                     json={
@@ -318,6 +345,8 @@ class CustomProvider(LLMProvider):
         self.callable_fn = callable_fn
 
     def complete(self, prompt: str) -> str:
+        # The callable takes no timeout, but a passed deadline still applies
+        self._request_timeout()
         try:
             return self.callable_fn(prompt)
         except Exception as e:
@@ -332,7 +361,10 @@ class ProviderChain:
     """
     Chain of providers with automatic fallback.
 
-    Tries providers in order until one succeeds.
+    Tries providers in order until one succeeds. A provider whose
+    ``config.rate_limits`` have no capacity left is skipped rather than
+    waited on; only when every provider is rate limited does the chain
+    wait for the soonest one to free up.
     """
 
     def __init__(self, providers: Optional[List[LLMProvider]] = None):
@@ -362,30 +394,102 @@ class ProviderChain:
 
         Raises:
             ProviderError if all providers fail
+            RateLimitExceededError if all providers are rate limited for
+            longer than their max_wait or the remaining deadline
         """
-        errors = []
-
-        for provider in self.providers:
-            try:
-                result = provider.complete(prompt)
-                self._last_provider = provider
+        while True:
+            errors = []
+            soonest: Optional[tuple] = None  # (wait, limiter) of the least-limited provider
+            limited = 0
+
+            for provider in self.providers:
+                remaining = time_remaining()
+                if remaining is not None and remaining <= 0:
+                    errors.append("deadline exceeded, remaining providers skipped")
+                    break
+
+                held, wait, limiter = self._take_rate_limits(provider, prompt)
+                if held is None:
+                    limited += 1
+                    errors.append(f"{provider.config.provider.value}: rate limited for {wait:.2f}s")
+                    if soonest is None or wait < soonest[0]:
+                        soonest = (wait, limiter)
+                    continue
+
+                try:
+                    result = provider.complete(prompt)
+                    self._last_provider = provider
+
+                    # Track cumulative usage
+                    if provider.last_usage:
+                        self._total_usage.prompt_tokens += provider.last_usage.prompt_tokens
+                        self._total_usage.completion_tokens += provider.last_usage.completion_tokens
+                        self._total_usage.total_tokens += provider.last_usage.total_tokens
+                        self._settle_rate_limits(held, provider.last_usage)
+
+                    return result
+
+                except ProviderError as e:
+                    errors.append(f"{e.provider}: {str(e)}")
+                    continue
+
+            if not self.providers or limited < len(self.providers):
+                raise ProviderError(
+                    f"All providers failed: {'; '.join(errors)}",
+                    provider="chain"
+                )
 
-                # Track cumulative usage
-                if provider.last_usage:
-                    self._total_usage.prompt_tokens += provider.last_usage.prompt_tokens
-                    self._total_usage.completion_tokens += provider.last_usage.completion_tokens
-                    self._total_usage.total_tokens += provider.last_usage.total_tokens
+            # Every provider is rate limited: wait for the soonest, if allowed
+            wait, limiter = soonest
+            remaining = time_remaining()
+            allowed = limiter.max_wait if limiter.max_wait is not None else float("inf")
+            if remaining is not None:
+                allowed = min(allowed, remaining)
+            if wait > allowed or wait == float("inf"):
+                raise RateLimitExceededError(
+                    f"All providers rate limited: {'; '.join(errors)}",
+                    retry_after=wait,
+                    limit=limiter.capacity,
+                )
+            time.sleep(wait)
 
-                return result
+    @staticmethod
+    def _estimate_usage(prompt: str) -> TokenUsage:
+        """Rough usage of a call before it runs: a reply as long as the prompt."""
+        tokens = max(1, len(prompt) // 4)
+        return TokenUsage(prompt_tokens=tokens, completion_tokens=tokens, total_tokens=2 * tokens)
 
-            except ProviderError as e:
-                errors.append(f"{e.provider}: {str(e)}")
-                continue
+    def _take_rate_limits(self, provider: LLMProvider, prompt: str) -> tuple:
+        """
+        Take a call's estimated usage from a provider's rate limits.
 
-        raise ProviderError(
-            f"All providers failed: {'; '.join(errors)}",
-            provider="chain"
-        )
+        Returns (held, 0.0, None) on success, where held lists the
+        (limiter, amount) taken, or (None, wait, limiter) for the first
+        limiter without capacity, after giving back what was already taken.
+        """
+        limits = getattr(provider.config, "rate_limits", None) or ()
+        if not limits:
+            return [], 0.0, None
+        usage = self._estimate_usage(prompt)
+        amounts = {"requests": 1.0, "tokens": float(usage.total_tokens), "usd": usage.cost_estimate}
+        held = []
+        for limiter in limits:
+            amount = amounts[limiter.unit]
+            wait = limiter.try_acquire(amount)
+            if wait > 0:
+                for taken, taken_amount in held:
+                    taken.record(-taken_amount)
+                return None, wait, limiter
+            held.append((limiter, amount))
+        return held, 0.0, None
+
+    @staticmethod
+    def _settle_rate_limits(held: list, usage: TokenUsage) -> None:
+        """Correct the held estimates to the provider's reported usage."""
+        actual = {"tokens": float(usage.total_tokens), "usd": usage.cost_estimate}
+        for limiter, amount in held:
+            if limiter.unit in actual:
+                limiter.record(actual[limiter.unit] - amount)
 
     def __call__(self, prompt: str) -> str:
         """Allow chain to be used as a callable."""
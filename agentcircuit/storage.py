@@ -10,15 +10,25 @@ Provides:
 - Query optimization
 """
 import sqlite3
+import hashlib
 import json
 import os
+import queue
+import threading
+import time
+import atexit
+import weakref
+import zlib
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
+from collections import OrderedDict
 from contextlib import contextmanager
 from dataclasses import dataclass, field
 from enum import Enum
 
+from .fuse import hash_state
+
 DB_PATH = ".agentcircuit/traces.db"
 
 
@@ -45,6 +55,23 @@ class StorageConfig:
     enable_wal: bool = True
     batch_size: int = 100
 
+    # Write-behind logging: queue traces and commit them from a background
+    # thread in batches of batch_size, or every flush_interval seconds
+    write_behind: bool = False
+    flush_interval: float = 1.0
+
+    # SQLite pragma profile, applied once to each per-thread connection
+    synchronous: str = "NORMAL"        # NORMAL is durable across app crashes in WAL mode
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size: int = -16000           # negative = KiB, so ~16MB page cache
+    temp_store: str = "MEMORY"
+    busy_timeout_ms: int = 5000
+
+    # Content-addressed state storage: split states into pieces stored once
+    # each (zlib-compressed) in state_blobs, with traces holding references
+    dedup_states: bool = False
+    compression_level: int = 6
+
     # PostgreSQL settings
     pool_size: int = 5
 
@@ -52,6 +79,10 @@ class StorageConfig:
 class BaseStorage(ABC):
     """Abstract base class for storage backends."""
 
+    # Whether calls may block on disk or network I/O. Async nodes move
+    # storage work for blocking backends off the event loop.
+    blocking_io: bool = True
+
     @abstractmethod
     def log_trace(
         self,
@@ -68,9 +99,15 @@ class BaseStorage(ABC):
         diagnosis: Optional[str] = None,
         duration_ms: float = 0.0,
         error_category: Optional[str] = None,
-        strategy_used: Optional[str] = None
+        strategy_used: Optional[str] = None,
+        state_hash: Optional[str] = None
     ) -> int:
-        """Log a trace and return its ID."""
+        """
+        Log a trace and return its ID.
+
+        state_hash is the Fuse's hash of input_state; traces logged without
+        one (no Fuse) are not added to the count_state index.
+        """
         pass
 
     @abstractmethod
@@ -83,6 +120,23 @@ class BaseStorage(ABC):
         """Get total cost for a run."""
         pass
 
+    def get_node_history(self, run_id: str, node_id: str) -> List[Dict[str, Any]]:
+        """Get the traces of one node within a run, in log order."""
+        return [h for h in self.get_run_history(run_id) if h["node_id"] == node_id]
+
+    def count_state(self, run_id: str, node_id: str, state_hash: str) -> int:
+        """
+        Count how many times a node has seen a state hash in a run.
+
+        Built-in backends answer this from an index maintained by log_trace.
+        This default falls back to rehashing the run history so custom
+        backends keep working with the Fuse.
+        """
+        return sum(
+            1 for h in self.get_run_history(run_id)
+            if h["node_id"] == node_id and hash_state(h["input_state"]) == state_hash
+        )
+
     @abstractmethod
     def get_setting(self, key: str) -> Optional[str]:
         """Get a setting value."""
@@ -99,6 +153,43 @@ class BaseStorage(ABC):
         pass
 
 
+class _RunBucket:
+    """All traces of one run plus the indexes InMemoryStorage serves from."""
+
+    __slots__ = ("traces", "by_node", "state_counts", "cost", "nbytes", "last_write")
+
+    def __init__(self):
+        self.traces: List[Dict[str, Any]] = []
+        # node_id -> traces of that node, in log order
+        self.by_node: Dict[str, List[Dict[str, Any]]] = {}
+        # (node_id, state_hash) -> count, for O(1) Fuse checks
+        self.state_counts: Dict[Tuple[str, str], int] = {}
+        # running total of estimated_cost
+        self.cost = 0.0
+        # approximate memory held by the run's states (only tracked when bounded)
+        self.nbytes = 0
+        self.last_write = 0.0
+
+    def add(self, trace: Dict[str, Any], nbytes: int = 0) -> None:
+        self.traces.append(trace)
+        self.by_node.setdefault(trace["node_id"], []).append(trace)
+        if trace["state_hash"] is not None:
+            key = (trace["node_id"], trace["state_hash"])
+            self.state_counts[key] = self.state_counts.get(key, 0) + 1
+        self.cost += trace["estimated_cost"]
+        self.nbytes += nbytes
+        self.last_write = time.time()
+
+
+def _approx_size(obj: Any) -> int:
+    """Cheap approximation of the memory a state holds."""
+    if obj is None:
+        return 0
+    if isinstance(obj, str):
+        return len(obj)
+    return len(repr(obj))
+
+
 class InMemoryStorage(BaseStorage):
     """
     In-memory storage backend. Zero dependencies, zero setup.
@@ -106,15 +197,67 @@ class InMemoryStorage(BaseStorage):
     This is the default storage backend for the SDK. Traces are stored
     in memory and lost when the process exits. Use SQLite or PostgreSQL
     for persistent storage.
+
+    Traces are bucketed per run_id, with per-node and state-hash indexes
+    inside each bucket, so reads cost O(run size) no matter how many runs
+    the process has seen. Buckets are spread over lock-striped shards so
+    concurrent runs rarely contend.
+
+    By default the store is unbounded. Pass max_traces, max_bytes or
+    retention_days (or a StorageConfig with enable_pruning) to bound it:
+    once a limit is exceeded, whole runs are evicted least-recently-written
+    first. Runs written within the last active_seconds are never evicted for
+    capacity, since their cost and state counts back max_cost_usd and the
+    Fuse; while every run is active the limits are exceeded rather than
+    reset a live run's budget. Each shard keeps its runs in write order, and
+    eviction walks the shards round-robin, so the order is approximately
+    global LRU and each log_trace does amortized O(1) eviction work. See
+    eviction_stats for counters.
     """
 
-    def __init__(self):
-        self._traces: List[Dict[str, Any]] = []
+    blocking_io = False
+
+    def __init__(
+        self,
+        shards: int = 16,
+        max_traces: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        retention_days: Optional[float] = None,
+        config: Optional[StorageConfig] = None,
+        active_seconds: float = 300.0,
+    ):
+        if config is not None and config.enable_pruning:
+            max_traces = max_traces if max_traces is not None else config.max_traces
+            retention_days = retention_days if retention_days is not None else config.retention_days
+        self.max_traces = max_traces
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.active_seconds = active_seconds
+        self._bounded = any(v is not None for v in (max_traces, max_bytes, retention_days))
+
         self._settings: Dict[str, str] = {
             "cost_per_token": "0.000005",
             "retention_days": "30",
         }
+        # Each shard keeps its runs in least-recently-written order
+        self._shards: List["OrderedDict[str, _RunBucket]"] = [OrderedDict() for _ in range(shards)]
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(shards)]
         self._next_id = 1
+        self._id_lock = threading.Lock()
+
+        # Capacity accounting and eviction counters
+        self._size_lock = threading.Lock()
+        self._total_traces = 0
+        self._total_bytes = 0
+        self._evicted_runs = 0
+        self._evicted_traces = 0
+        self._evict_cursor = 0
+
+    def _shard(self, run_id: str) -> int:
+        return hash(run_id) % len(self._shards)
+
+    def _bucket(self, run_id: str) -> Optional[_RunBucket]:
+        return self._shards[self._shard(run_id)].get(run_id)
 
     def log_trace(
         self,
@@ -131,12 +274,11 @@ class InMemoryStorage(BaseStorage):
         diagnosis: Optional[str] = None,
         duration_ms: float = 0.0,
         error_category: Optional[str] = None,
-        strategy_used: Optional[str] = None
+        strategy_used: Optional[str] = None,
+        state_hash: Optional[str] = None
     ) -> int:
-        trace_id = self._next_id
-        self._next_id += 1
-        self._traces.append({
-            "id": trace_id,
+        trace = {
+            "id": 0,
             "run_id": run_id,
             "node_id": node_id,
             "input_state": input_state,
@@ -151,15 +293,134 @@ class InMemoryStorage(BaseStorage):
             "duration_ms": duration_ms,
             "error_category": error_category,
             "strategy_used": strategy_used,
+            "state_hash": state_hash,
             "timestamp": datetime.now().isoformat(),
-        })
+        }
+        nbytes = 0
+        if self.max_bytes is not None:
+            nbytes = _approx_size(input_state) + _approx_size(output_state)
+
+        shard = self._shard(run_id)
+        runs = self._shards[shard]
+        with self._locks[shard]:
+            # IDs are taken under the shard lock so a run's traces stay in ID order
+            with self._id_lock:
+                trace_id = self._next_id
+                self._next_id += 1
+            trace["id"] = trace_id
+            bucket = runs.get(run_id)
+            if bucket is None:
+                bucket = runs[run_id] = _RunBucket()
+            else:
+                runs.move_to_end(run_id)
+            bucket.add(trace, nbytes)
+
+        if self._bounded:
+            with self._size_lock:
+                self._total_traces += 1
+                self._total_bytes += nbytes
+            self._enforce_limits(run_id)
         return trace_id
 
+    def _over_capacity(self) -> bool:
+        return (
+            (self.max_traces is not None and self._total_traces > self.max_traces)
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        )
+
+    def _enforce_limits(self, active_run: str) -> None:
+        """Evict expired runs and, while over capacity, the oldest runs."""
+        n = len(self._shards)
+        expire_before = None
+        if self.retention_days is not None:
+            expire_before = time.time() - self.retention_days * 86400
+
+        # Expiry: check the head of one shard per call, round-robin
+        if expire_before is not None:
+            self._evict_from(self._next_cursor(), active_run, expire_before)
+
+        # Capacity: evict oldest idle runs until back under the limits
+        idle_before = time.time() - self.active_seconds
+        misses = 0
+        while self._over_capacity() and misses < n:
+            if self._evict_from(self._next_cursor(), active_run, idle_before):
+                misses = 0
+            else:
+                misses += 1
+
+    def _next_cursor(self) -> int:
+        with self._size_lock:
+            shard = self._evict_cursor
+            self._evict_cursor = (shard + 1) % len(self._shards)
+        return shard
+
+    def _evict_from(self, shard: int, active_run: str, written_before: float) -> bool:
+        """
+        Evict the least recently written run in a shard if it was last
+        written before written_before. Returns True if a run was evicted.
+        """
+        runs = self._shards[shard]
+        with self._locks[shard]:
+            victim = None
+            for run_id in runs:
+                if run_id != active_run:
+                    victim = run_id
+                break
+            else:
+                return False
+            if victim is None:
+                # The active run is oldest here; fall back to the next one
+                it = iter(runs)
+                next(it)
+                victim = next(it, None)
+                if victim is None:
+                    return False
+            bucket = runs[victim]
+            if bucket.last_write >= written_before:
+                return False
+            del runs[victim]
+
+        with self._size_lock:
+            self._total_traces -= len(bucket.traces)
+            self._total_bytes -= bucket.nbytes
+            self._evicted_runs += 1
+            self._evicted_traces += len(bucket.traces)
+        return True
+
+    @property
+    def eviction_stats(self) -> Dict[str, int]:
+        """Capacity usage and eviction counters (zeros when unbounded)."""
+        with self._size_lock:
+            return {
+                "traces": self._total_traces,
+                "approx_bytes": self._total_bytes,
+                "evicted_runs": self._evicted_runs,
+                "evicted_traces": self._evicted_traces,
+            }
+
     def get_run_history(self, run_id: str) -> List[Dict[str, Any]]:
-        return [t for t in self._traces if t["run_id"] == run_id]
+        bucket = self._bucket(run_id)
+        if bucket is None:
+            return []
+        with self._locks[self._shard(run_id)]:
+            return list(bucket.traces)
+
+    def get_node_history(self, run_id: str, node_id: str) -> List[Dict[str, Any]]:
+        bucket = self._bucket(run_id)
+        if bucket is None:
+            return []
+        with self._locks[self._shard(run_id)]:
+            return list(bucket.by_node.get(node_id, ()))
 
     def get_run_cost(self, run_id: str) -> float:
-        return sum(t["estimated_cost"] for t in self._traces if t["run_id"] == run_id)
+        bucket = self._bucket(run_id)
+        return bucket.cost if bucket is not None else 0.0
+
+    def count_state(self, run_id: str, node_id: str, state_hash: str) -> int:
+        bucket = self._bucket(run_id)
+        if bucket is None:
+            return 0
+        return bucket.state_counts.get((node_id, state_hash), 0)
 
     def get_setting(self, key: str) -> Optional[str]:
         return self._settings.get(key)
@@ -169,12 +430,138 @@ class InMemoryStorage(BaseStorage):
 
     def prune_old_traces(self, days: int = 30) -> int:
         cutoff = datetime.now() - timedelta(days=days)
-        before = len(self._traces)
-        self._traces = [
-            t for t in self._traces
-            if datetime.fromisoformat(t["timestamp"]) >= cutoff
-        ]
-        return before - len(self._traces)
+        deleted = 0
+        for shard, runs in enumerate(self._shards):
+            with self._locks[shard]:
+                for run_id, bucket in list(runs.items()):
+                    kept = [
+                        t for t in bucket.traces
+                        if datetime.fromisoformat(t["timestamp"]) >= cutoff
+                    ]
+                    if len(kept) == len(bucket.traces):
+                        continue
+                    removed = len(bucket.traces) - len(kept)
+                    deleted += removed
+                    if not kept:
+                        del runs[run_id]
+                        freed = bucket.nbytes
+                    else:
+                        # Rebuild the run's indexes from what is left
+                        rebuilt = _RunBucket()
+                        for t in kept:
+                            nbytes = 0
+                            if self.max_bytes is not None:
+                                nbytes = _approx_size(t["input_state"]) + _approx_size(t["output_state"])
+                            rebuilt.add(t, nbytes)
+                        rebuilt.last_write = bucket.last_write
+                        runs[run_id] = rebuilt
+                        freed = bucket.nbytes - rebuilt.nbytes
+                    if self._bounded:
+                        with self._size_lock:
+                            self._total_traces -= removed
+                            self._total_bytes -= freed
+        return deleted
+
+
+# Marker key of a deduplicated state manifest
+_BLOB_MARKER = "$blobs"
+_BLOB_PREFIX = '{"$blobs"'
+# Pieces that serialize shorter than this stay inline in the manifest
+_BLOB_MIN_SIZE = 64
+
+
+# Reused encoder; json.dumps would build a new one for every piece
+_PIECE_ENCODER = json.JSONEncoder(default=str)
+
+
+def _piece_ref(value: Any, blobs: Dict[str, str], memo: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    # The same object often appears in both input and output state of a
+    # trace (e.g. shared messages); encode it once per log_trace
+    ref = memo.get(id(value))
+    if ref is not None:
+        return ref
+    data = _PIECE_ENCODER.encode(value)
+    if len(data) < _BLOB_MIN_SIZE:
+        ref = {"v": value}
+    else:
+        digest = hashlib.sha256(data.encode()).hexdigest()[:32]
+        blobs[digest] = data
+        ref = {"h": digest}
+    memo[id(value)] = ref
+    return ref
+
+
+def _value_ref(value: Any, blobs: Dict[str, str], memo: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    # Lists (e.g. message histories) are split per element, so a history
+    # that grows by one message only adds one new blob
+    if isinstance(value, (list, tuple)):
+        return {"l": [_piece_ref(item, blobs, memo) for item in value]}
+    return _piece_ref(value, blobs, memo)
+
+
+def _split_state(
+    state: Any, blobs: Dict[str, str], memo: Dict[int, Dict[str, Any]]
+) -> str:
+    """
+    Split a state into a manifest and the pieces it references.
+
+    Dict states are split per top-level key and list values per element.
+    Adds the {hash: piece JSON} pieces to blobs and returns the manifest
+    JSON. memo maps id() of already-encoded objects to their reference and
+    must only be shared while the states are alive and unmodified.
+    """
+    if isinstance(state, dict):
+        ref = {"d": {key: _value_ref(value, blobs, memo) for key, value in state.items()}}
+    else:
+        ref = _value_ref(state, blobs, memo)
+    return json.dumps({_BLOB_MARKER: ref}, default=str)
+
+
+def _ref_hashes(ref: Dict[str, Any], out: set) -> None:
+    if "d" in ref:
+        for sub in ref["d"].values():
+            _ref_hashes(sub, out)
+    elif "l" in ref:
+        for sub in ref["l"]:
+            _ref_hashes(sub, out)
+    elif "h" in ref:
+        out.add(ref["h"])
+
+
+def _join_state(ref: Dict[str, Any], pieces: Dict[str, str]) -> Any:
+    """Rebuild a state from its manifest and the pieces' JSON."""
+    if "d" in ref:
+        return {key: _join_state(sub, pieces) for key, sub in ref["d"].items()}
+    if "l" in ref:
+        return [_join_state(sub, pieces) for sub in ref["l"]]
+    if "h" in ref:
+        piece = pieces.get(ref["h"])
+        if piece is None:
+            # Blob lost (e.g. pruned by a racing writer): keep the rest readable
+            return None
+        # Parse per use so traces sharing a piece don't share objects
+        return json.loads(piece)
+    return ref["v"]
+
+
+class _ThreadConnection:
+    """A thread's connection, held in its thread-local storage."""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+def _close_thread_connection(conn: sqlite3.Connection, connections: List[sqlite3.Connection]) -> None:
+    """Close a connection whose thread has exited (its thread-local holder was freed)."""
+    # No lock: this can run from garbage collection while the lock is held
+    # on the same thread, and list.remove is atomic
+    try:
+        connections.remove(conn)
+    except ValueError:
+        pass
+    conn.close()
 
 
 class Storage(BaseStorage):
@@ -186,8 +573,24 @@ class Storage(BaseStorage):
     - Indexed queries for performance
     - WAL mode for concurrency
     - Automatic pruning of old data
+    - Optional write-behind logging (StorageConfig.write_behind)
+
+    In write-behind mode log_trace only serializes the trace and enqueues
+    it; a background thread commits queued traces with executemany in one
+    transaction per batch. Run cost and Fuse state counts include traces
+    that are still queued, so budget and loop checks stay accurate. Other
+    reads flush the queue first.
+
+    With StorageConfig.dedup_states, states are stored content-addressed:
+    each top-level value (and each element of a list value) is stored once
+    in the state_blobs table, zlib-compressed and keyed by hash, and the
+    trace keeps a small manifest of references. Consecutive LangGraph
+    steps share most of their state, so repeated message histories cost
+    one reference per message instead of a full copy. Reads rebuild the
+    full states transparently.
     """
 
+
     def __init__(
         self,
         db_path: str = DB_PATH,
@@ -195,12 +598,46 @@ class Storage(BaseStorage):
     ):
         self.db_path = db_path
         self.config = config or StorageConfig(db_path=db_path)
+        # One connection per thread, opened lazily and reused
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
         self._init_db()
 
+        self._writer: Optional[threading.Thread] = None
+        if self.config.write_behind:
+            self._queue: "queue.Queue" = queue.Queue()
+            self._pending_lock = threading.Lock()
+            self._pending_costs: Dict[str, float] = {}
+            self._pending_states: Dict[Tuple[str, str, str], int] = {}
+            self._writer = threading.Thread(
+                target=self._writer_loop, name="agentcircuit-trace-writer", daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection and apply the configured pragma profile."""
+        config = self.config
+        # check_same_thread is off only so close() can close every thread's
+        # connection; each connection is still used by a single thread
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=config.busy_timeout_ms / 1000,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={int(config.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA synchronous={config.synchronous}")
+        conn.execute(f"PRAGMA mmap_size={int(config.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size={int(config.cache_size)}")
+        conn.execute(f"PRAGMA temp_store={config.temp_store}")
+        return conn
+
     def _init_db(self):
         """Initialize the database and tables if they don't exist."""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
 
         # Enable WAL mode for better concurrency
@@ -225,10 +662,14 @@ class Storage(BaseStorage):
                 duration_ms REAL DEFAULT 0.0,
                 error_category TEXT,
                 strategy_used TEXT,
+                state_hash TEXT,
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         """)
 
+        # Run migrations for existing databases
+        self._run_migrations(cursor)
+
         # Create indexes for common queries
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_traces_run_id
@@ -250,9 +691,31 @@ class Storage(BaseStorage):
             CREATE INDEX IF NOT EXISTS idx_traces_run_node
             ON traces(run_id, node_id)
         """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_traces_state
+            ON traces(run_id, node_id, state_hash)
+        """)
 
-        # Run migrations for existing databases
-        self._run_migrations(cursor)
+        # Per-run cost ledger, maintained by log_trace
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='run_totals'")
+        has_run_totals = cursor.fetchone() is not None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS run_totals (
+                run_id TEXT PRIMARY KEY,
+                total_cost REAL DEFAULT 0.0,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        if not has_run_totals:
+            self._rebuild_run_totals(cursor)
+
+        # Content-addressed state pieces (StorageConfig.dedup_states)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS state_blobs (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL
+            ) WITHOUT ROWID
+        """)
 
         # Global Settings
         cursor.execute("""
@@ -289,6 +752,7 @@ class Storage(BaseStorage):
             ("duration_ms", "ALTER TABLE traces ADD COLUMN duration_ms REAL DEFAULT 0.0"),
             ("error_category", "ALTER TABLE traces ADD COLUMN error_category TEXT"),
             ("strategy_used", "ALTER TABLE traces ADD COLUMN strategy_used TEXT"),
+            ("state_hash", "ALTER TABLE traces ADD COLUMN state_hash TEXT"),
         ]
 
         for column_name, migration_sql in migrations:
@@ -298,15 +762,71 @@ class Storage(BaseStorage):
                 except sqlite3.OperationalError:
                     pass  # Column might already exist
 
+        if "state_hash" not in columns:
+            self._backfill_state_hashes(cursor)
+
+    def _rebuild_run_totals(self, cursor: sqlite3.Cursor):
+        """Recompute the run_totals ledger from the traces table."""
+        cursor.execute("DELETE FROM run_totals")
+        cursor.execute("""
+            INSERT INTO run_totals (run_id, total_cost)
+            SELECT run_id, COALESCE(SUM(estimated_cost), 0.0) FROM traces GROUP BY run_id
+        """)
+
+    def _backfill_state_hashes(self, cursor: sqlite3.Cursor):
+        """Populate state_hash for traces written before the column existed."""
+        cursor.execute("SELECT id, input_state FROM traces WHERE state_hash IS NULL")
+        rows = cursor.fetchall()
+        cursor.executemany(
+            "UPDATE traces SET state_hash = ? WHERE id = ?",
+            [
+                (hash_state(json.loads(input_state) if input_state else {}), trace_id)
+                for trace_id, input_state in rows
+            ]
+        )
+
     @contextmanager
     def _get_connection(self):
-        """Get a database connection with proper cleanup."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """
+        Get this thread's database connection, opening it on first use.
+
+        The connection is closed when its thread exits, so short-lived
+        threads (e.g. max_seconds calls) do not accumulate connections.
+        """
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = _ThreadConnection(self._connect())
+            self._local.holder = holder
+            with self._connections_lock:
+                self._connections.append(holder.conn)
+            weakref.finalize(holder, _close_thread_connection, holder.conn, self._connections)
+        conn = holder.conn
         try:
             yield conn
         finally:
-            conn.close()
+            # Never hand the next caller a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+
+    _INSERT_TRACE_SQL = """
+        INSERT INTO traces (
+            run_id, node_id, input_state, output_state, status,
+            cost_tokens, recovery_attempts, saved_cost, token_usage,
+            estimated_cost, diagnosis, duration_ms, error_category, strategy_used,
+            state_hash
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    _INSERT_BLOB_SQL = "INSERT OR IGNORE INTO state_blobs (hash, data) VALUES (?, ?)"
+
+    _UPSERT_RUN_TOTAL_SQL = """
+        INSERT INTO run_totals (run_id, total_cost, updated_at)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(run_id) DO UPDATE SET
+            total_cost = total_cost + excluded.total_cost,
+            updated_at = CURRENT_TIMESTAMP
+    """
 
     def log_trace(
         self,
@@ -323,43 +843,235 @@ class Storage(BaseStorage):
         diagnosis: Optional[str] = None,
         duration_ms: float = 0.0,
         error_category: Optional[str] = None,
-        strategy_used: Optional[str] = None
+        strategy_used: Optional[str] = None,
+        state_hash: Optional[str] = None
     ) -> int:
-        """Log a node execution trace."""
+        """
+        Log a node execution trace.
+
+        Returns the trace ID, or -1 on error. In write-behind mode the row ID
+        is only assigned when the batch is committed, so -1 is returned.
+        """
+        try:
+            # Serialize now: callers may mutate their state after we return
+            input_json, output_json, blobs = self._serialize_states(input_state, output_state)
+            row = (
+                run_id, node_id, input_json, output_json, status,
+                cost_tokens, recovery_attempts, saved_cost, token_usage,
+                estimated_cost, diagnosis, duration_ms, error_category, strategy_used,
+                state_hash
+            )
+        except Exception as e:
+            print(f"Error logging trace: {e}")
+            return -1
+
+        if self._writer is not None:
+            with self._pending_lock:
+                self._pending_costs[run_id] = self._pending_costs.get(run_id, 0.0) + estimated_cost
+                if state_hash is not None:
+                    key = (run_id, node_id, state_hash)
+                    self._pending_states[key] = self._pending_states.get(key, 0) + 1
+            self._queue.put((row, blobs))
+            return -1
+
         with self._get_connection() as conn:
             cursor = conn.cursor()
             try:
-                input_json = json.dumps(input_state, default=str)
-                output_json = json.dumps(output_state, default=str)
-
-                cursor.execute("""
-                    INSERT INTO traces (
-                        run_id, node_id, input_state, output_state, status,
-                        cost_tokens, recovery_attempts, saved_cost, token_usage,
-                        estimated_cost, diagnosis, duration_ms, error_category, strategy_used
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    run_id, node_id, input_json, output_json, status,
-                    cost_tokens, recovery_attempts, saved_cost, token_usage,
-                    estimated_cost, diagnosis, duration_ms, error_category, strategy_used
-                ))
+                if blobs:
+                    cursor.executemany(self._INSERT_BLOB_SQL, blobs)
+                cursor.execute(self._INSERT_TRACE_SQL, row)
+                trace_id = cursor.lastrowid
+                cursor.execute(self._UPSERT_RUN_TOTAL_SQL, (run_id, estimated_cost))
                 conn.commit()
-                return cursor.lastrowid
             except Exception as e:
                 print(f"Error logging trace: {e}")
                 return -1
+        return trace_id
+
+    def _serialize_states(
+        self, input_state: Any, output_state: Any
+    ) -> Tuple[str, str, List[Tuple[str, bytes]]]:
+        """
+        Serialize a trace's states for storage.
+
+        Returns the input and output column values and the (hash, compressed
+        data) blobs to insert, which is always empty unless dedup_states.
+        """
+        if not self.config.dedup_states:
+            return json.dumps(input_state, default=str), json.dumps(output_state, default=str), []
+
+        pieces: Dict[str, str] = {}
+        memo: Dict[int, Dict[str, Any]] = {}
+        input_json = _split_state(input_state, pieces, memo)
+        output_json = _split_state(output_state, pieces, memo)
+        level = self.config.compression_level
+        # Always written (INSERT OR IGNORE): another instance or process may
+        # have pruned a blob this one wrote before
+        blobs = [(digest, zlib.compress(data.encode(), level)) for digest, data in pieces.items()]
+        return input_json, output_json, blobs
+
+    def _load_states(self, cursor: sqlite3.Cursor, values: List[Optional[str]]) -> List[Any]:
+        """Decode stored state columns, fetching referenced blobs in bulk."""
+        manifests: Dict[int, Dict[str, Any]] = {}
+        hashes: set = set()
+        states: List[Any] = []
+        for i, value in enumerate(values):
+            if not value:
+                states.append({})
+            elif value.startswith(_BLOB_PREFIX):
+                ref = json.loads(value)[_BLOB_MARKER]
+                manifests[i] = ref
+                _ref_hashes(ref, hashes)
+                states.append(None)
+            else:
+                states.append(json.loads(value))
+
+        if manifests:
+            pieces: Dict[str, str] = {}
+            wanted = list(hashes)
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(wanted), 500):
+                chunk = wanted[start:start + 500]
+                cursor.execute(
+                    f"SELECT hash, data FROM state_blobs WHERE hash IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                for digest, data in cursor.fetchall():
+                    pieces[digest] = zlib.decompress(data).decode()
+            for i, ref in manifests.items():
+                states[i] = _join_state(ref, pieces)
+        return states
+
+    # Queue marker asking the writer to commit what it has immediately
+    _FLUSH = object()
+    # Queue marker asking the writer to commit and exit
+    _STOP = object()
+
+    def _writer_loop(self):
+        """Drain the trace queue in batched transactions (write-behind mode)."""
+        conn = self._connect()
+        batch_size = max(1, self.config.batch_size)
+        interval = self.config.flush_interval
+        try:
+            while True:
+                item = self._queue.get()
+                batch = []
+                markers = 1
+                stop = item is self._STOP
+                if item is not self._FLUSH and not stop:
+                    batch.append(item)
+                    markers = 0
+                    deadline = time.monotonic() + interval
+                    # Keep collecting until the batch is full, the interval
+                    # elapses, or someone asks for a flush
+                    while len(batch) < batch_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        try:
+                            item = self._queue.get(timeout=remaining)
+                        except queue.Empty:
+                            break
+                        if item is self._FLUSH or item is self._STOP:
+                            markers += 1
+                            stop = item is self._STOP
+                            break
+                        batch.append(item)
+
+                if batch:
+                    self._write_batch(conn, batch)
+                for _ in range(len(batch) + markers):
+                    self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[tuple]):
+        """Commit a batch of trace rows and their run totals in one transaction."""
+        rows = [row for row, _ in batch]
+        blobs = [blob for _, row_blobs in batch for blob in row_blobs]
+        run_costs: Dict[str, float] = {}
+        for row in rows:
+            run_costs[row[0]] = run_costs.get(row[0], 0.0) + row[9]
+        try:
+            if blobs:
+                conn.executemany(self._INSERT_BLOB_SQL, blobs)
+            conn.executemany(self._INSERT_TRACE_SQL, rows)
+            conn.executemany(self._UPSERT_RUN_TOTAL_SQL, list(run_costs.items()))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Error logging {len(batch)} traces: {e}")
+        finally:
+            # Committed rows are now visible in the database (and failed
+            # ones are dropped), so stop counting them as pending
+            with self._pending_lock:
+                for run_id, cost in run_costs.items():
+                    left = self._pending_costs.get(run_id, 0.0) - cost
+                    if abs(left) < 1e-12:
+                        self._pending_costs.pop(run_id, None)
+                    else:
+                        self._pending_costs[run_id] = left
+                for row in rows:
+                    if row[14] is None:
+                        continue
+                    key = (row[0], row[1], row[14])
+                    left = self._pending_states.get(key, 0) - 1
+                    if left <= 0:
+                        self._pending_states.pop(key, None)
+                    else:
+                        self._pending_states[key] = left
+
+    def flush(self) -> None:
+        """Block until every queued trace is committed. No-op unless write-behind."""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(self._FLUSH)
+            self._queue.join()
+
+    def close(self) -> None:
+        """Flush queued traces, stop the background writer and close connections."""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(self._STOP)
+            self._writer.join()
+        with self._connections_lock:
+            connections = list(self._connections)
+            self._connections.clear()
+        # Outside the lock: dropping the thread-locals runs their finalizers
+        self._local = threading.local()
+        for conn in connections:
+            conn.close()
 
     def get_run_cost(self, run_id: str) -> float:
-        """Calculate total estimated cost for a run so far."""
+        """Get the total estimated cost for a run so far from the run_totals ledger."""
+        # Read queued costs before the table: a batch committing in between
+        # is then counted twice rather than missed
+        pending = 0.0
+        if self._writer is not None:
+            with self._pending_lock:
+                pending = self._pending_costs.get(run_id, 0.0)
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT SUM(estimated_cost) FROM traces WHERE run_id = ?",
+                "SELECT total_cost FROM run_totals WHERE run_id = ?",
                 (run_id,)
             )
-            result = cursor.fetchone()[0]
-            return result or 0.0
+            row = cursor.fetchone()
+            return ((row[0] or 0.0) if row else 0.0) + pending
+
+    def count_state(self, run_id: str, node_id: str, state_hash: str) -> int:
+        """Count prior traces of a state at a node (served by idx_traces_state)."""
+        pending = 0
+        if self._writer is not None:
+            with self._pending_lock:
+                pending = self._pending_states.get((run_id, node_id, state_hash), 0)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT COUNT(*) FROM traces WHERE run_id = ? AND node_id = ? AND state_hash = ?",
+                (run_id, node_id, state_hash)
+            )
+            return cursor.fetchone()[0] + pending
 
     def get_setting(self, key: str) -> Optional[str]:
         """Get a setting value."""
@@ -385,6 +1097,7 @@ class Storage(BaseStorage):
 
     def get_run_history(self, run_id: str) -> List[Dict[str, Any]]:
         """Get all traces for a specific run_id, sorted by time."""
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
@@ -392,14 +1105,18 @@ class Storage(BaseStorage):
             """, (run_id,))
 
             rows = cursor.fetchall()
+            states = self._load_states(
+                cursor,
+                [value for row in rows for value in (row["input_state"], row["output_state"])]
+            )
             history = []
 
-            for row in rows:
+            for i, row in enumerate(rows):
                 history.append({
                     "id": row["id"],
                     "node_id": row["node_id"],
-                    "input_state": json.loads(row["input_state"]) if row["input_state"] else {},
-                    "output_state": json.loads(row["output_state"]) if row["output_state"] else {},
+                    "input_state": states[2 * i],
+                    "output_state": states[2 * i + 1],
                     "status": row["status"],
                     "timestamp": row["timestamp"],
                     "diagnosis": row["diagnosis"],
@@ -413,6 +1130,7 @@ class Storage(BaseStorage):
 
     def prune_old_traces(self, days: int = 30) -> int:
         """Delete traces older than N days."""
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cutoff = datetime.now() - timedelta(days=days)
@@ -421,9 +1139,31 @@ class Storage(BaseStorage):
                 (cutoff.isoformat(),)
             )
             deleted = cursor.rowcount
+            if deleted:
+                self._rebuild_run_totals(cursor)
+                self._collect_blobs(cursor)
             conn.commit()
             return deleted
 
+    def _collect_blobs(self, cursor: sqlite3.Cursor):
+        """Delete state blobs no longer referenced by any trace."""
+        cursor.execute("SELECT COUNT(*) FROM state_blobs")
+        if not cursor.fetchone()[0]:
+            return
+        referenced: set = set()
+        cursor.execute(
+            "SELECT input_state, output_state FROM traces "
+            "WHERE substr(input_state, 1, 9) = ? OR substr(output_state, 1, 9) = ?",
+            (_BLOB_PREFIX, _BLOB_PREFIX)
+        )
+        for row in cursor.fetchall():
+            for value in row:
+                if value and value.startswith(_BLOB_PREFIX):
+                    _ref_hashes(json.loads(value)[_BLOB_MARKER], referenced)
+        cursor.execute("SELECT hash FROM state_blobs")
+        orphans = [(digest,) for (digest,) in cursor.fetchall() if digest not in referenced]
+        cursor.executemany("DELETE FROM state_blobs WHERE hash = ?", orphans)
+
     def get_traces(
         self,
         limit: int = 100,
@@ -447,6 +1187,7 @@ class Storage(BaseStorage):
         Returns:
             List of trace dictionaries
         """
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
@@ -473,12 +1214,20 @@ class Storage(BaseStorage):
             params.extend([limit, offset])
 
             cursor.execute(query, params)
-            rows = cursor.fetchall()
+            traces = [dict(row) for row in cursor.fetchall()]
+
+            # Hand back full state JSON for deduplicated traces, not manifests
+            for trace in traces:
+                for column in ("input_state", "output_state"):
+                    value = trace[column]
+                    if value and value.startswith(_BLOB_PREFIX):
+                        trace[column] = json.dumps(self._load_states(cursor, [value])[0])
 
-            return [dict(row) for row in rows]
+            return traces
 
     def get_stats(self) -> Dict[str, Any]:
         """Get aggregate statistics."""
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
@@ -529,6 +1278,7 @@ class Storage(BaseStorage):
 
     def get_node_stats(self, node_id: str) -> Dict[str, Any]:
         """Get statistics for a specific node."""
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
@@ -558,6 +1308,7 @@ class Storage(BaseStorage):
 
     def vacuum(self) -> None:
         """Optimize the database."""
+        self.flush()
         with self._get_connection() as conn:
             conn.execute("VACUUM")
 
@@ -634,9 +1385,13 @@ class PostgresStorage(BaseStorage):
                     duration_ms REAL DEFAULT 0.0,
                     error_category TEXT,
                     strategy_used TEXT,
+                    state_hash TEXT,
                     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            cursor.execute("""
+                ALTER TABLE traces ADD COLUMN IF NOT EXISTS state_hash TEXT
+            """)
 
             # Create indexes
             cursor.execute("""
@@ -651,6 +1406,22 @@ class PostgresStorage(BaseStorage):
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_traces_node_id ON traces(node_id)
             """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_traces_state ON traces(run_id, node_id, state_hash)
+            """)
+
+            # Per-run cost ledger, maintained by log_trace
+            cursor.execute("SELECT to_regclass('run_totals')")
+            has_run_totals = cursor.fetchone()[0] is not None
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS run_totals (
+                    run_id TEXT PRIMARY KEY,
+                    total_cost DOUBLE PRECISION DEFAULT 0.0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            if not has_run_totals:
+                self._rebuild_run_totals(cursor)
 
             # Settings table
             cursor.execute("""
@@ -670,6 +1441,14 @@ class PostgresStorage(BaseStorage):
 
             conn.commit()
 
+    def _rebuild_run_totals(self, cursor):
+        """Recompute the run_totals ledger from the traces table."""
+        cursor.execute("DELETE FROM run_totals")
+        cursor.execute("""
+            INSERT INTO run_totals (run_id, total_cost)
+            SELECT run_id, COALESCE(SUM(estimated_cost), 0.0) FROM traces GROUP BY run_id
+        """)
+
     def log_trace(
         self,
         run_id: str,
@@ -685,7 +1464,8 @@ class PostgresStorage(BaseStorage):
         diagnosis: Optional[str] = None,
         duration_ms: float = 0.0,
         error_category: Optional[str] = None,
-        strategy_used: Optional[str] = None
+        strategy_used: Optional[str] = None,
+        state_hash: Optional[str] = None
     ) -> int:
         """Log a trace to PostgreSQL."""
         with self._get_connection() as conn:
@@ -694,9 +1474,10 @@ class PostgresStorage(BaseStorage):
                 INSERT INTO traces (
                     run_id, node_id, input_state, output_state, status,
                     cost_tokens, recovery_attempts, saved_cost, token_usage,
-                    estimated_cost, diagnosis, duration_ms, error_category, strategy_used
+                    estimated_cost, diagnosis, duration_ms, error_category, strategy_used,
+                    state_hash
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 RETURNING id
             """, (
                 run_id, node_id,
@@ -704,9 +1485,16 @@ class PostgresStorage(BaseStorage):
                 json.dumps(output_state, default=str),
                 status, cost_tokens, recovery_attempts, saved_cost,
                 token_usage, estimated_cost, diagnosis, duration_ms,
-                error_category, strategy_used
+                error_category, strategy_used, state_hash
             ))
             trace_id = cursor.fetchone()[0]
+            cursor.execute("""
+                INSERT INTO run_totals (run_id, total_cost, updated_at)
+                VALUES (%s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (run_id) DO UPDATE SET
+                    total_cost = run_totals.total_cost + EXCLUDED.total_cost,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (run_id, estimated_cost))
             conn.commit()
             return trace_id
 
@@ -742,15 +1530,25 @@ class PostgresStorage(BaseStorage):
             return history
 
     def get_run_cost(self, run_id: str) -> float:
-        """Get total cost for a run."""
+        """Get total cost for a run from the run_totals ledger."""
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT SUM(estimated_cost) FROM traces WHERE run_id = %s",
+                "SELECT total_cost FROM run_totals WHERE run_id = %s",
                 (run_id,)
             )
-            result = cursor.fetchone()[0]
-            return result or 0.0
+            row = cursor.fetchone()
+            return (row[0] or 0.0) if row else 0.0
+
+    def count_state(self, run_id: str, node_id: str, state_hash: str) -> int:
+        """Count prior traces of a state at a node (served by idx_traces_state)."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT COUNT(*) FROM traces WHERE run_id = %s AND node_id = %s AND state_hash = %s",
+                (run_id, node_id, state_hash)
+            )
+            return cursor.fetchone()[0]
 
     def get_setting(self, key: str) -> Optional[str]:
         """Get a setting value."""
@@ -783,6 +1581,8 @@ class PostgresStorage(BaseStorage):
                 (days,)
             )
             deleted = cursor.rowcount
+            if deleted:
+                self._rebuild_run_totals(cursor)
             conn.commit()
             return deleted
 
@@ -805,7 +1605,7 @@ def create_storage(
         backend = StorageBackend(backend.lower())
 
     if backend == StorageBackend.MEMORY:
-        return InMemoryStorage()
+        return InMemoryStorage(config=kwargs.get("config"))
     elif backend == StorageBackend.SQLITE:
         return Storage(
             db_path=kwargs.get("db_path", DB_PATH),
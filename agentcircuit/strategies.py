@@ -15,6 +15,7 @@ import re
 
 from pydantic import BaseModel
 
+from .budget import time_remaining
 from .errors import ClassifiedError, ErrorCategory, ErrorClassifier
 
 
@@ -352,6 +353,10 @@ class RetryWithBackoffStrategy(RepairStrategy):
             raise RuntimeError(f"Max retry attempts ({self.config.max_attempts}) exceeded")
 
         delay = self.config.get_delay(self._attempt)
+        remaining = time_remaining()
+        if remaining is not None and delay >= remaining:
+            # The retry could not start before the deadline; don't wait for it
+            raise error.original_error
         if delay > 0:
             time.sleep(delay)
 
@@ -523,6 +528,9 @@ class StrategyChain:
         """
         Execute strategies in order until one succeeds.
 
+        No further strategy is started once the current deadline (see
+        budget.deadline) has passed.
+
         Args:
             error: The classified error
             input_state: Original input
@@ -541,6 +549,9 @@ class StrategyChain:
         for strategy in self.strategies:
             if not strategy.can_handle(error):
                 continue
+            remaining = time_remaining()
+            if remaining is not None and remaining <= 0:
+                break
 
             try:
                 return strategy.repair(
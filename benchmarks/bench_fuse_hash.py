@@ -0,0 +1,42 @@
+"""
+Fuse state hashing on growing chat histories.
+
+Usage:
+    python benchmarks/bench_fuse_hash.py [--messages N]
+
+Simulates a LangGraph chat run: each step's state holds the full message
+history plus one new message. Compares the plain Fuse hash (which
+serializes the whole state every step) with Fuse(incremental=True).
+"""
+import argparse
+import time
+
+from agentcircuit.fuse import Fuse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=200,
+                        help="steps timed at the end of the history")
+    args = parser.parse_args()
+
+    messages = [
+        {"role": "user" if i % 2 else "assistant", "content": f"message {i}: " + "lorem ipsum " * 20}
+        for i in range(args.messages)
+    ]
+    start_at = args.messages - args.steps
+
+    for name, fuse in (("plain", Fuse()), ("incremental", Fuse(incremental=True))):
+        # Warm up over the first part of the run, then time the last steps
+        for n in range(1, start_at + 1):
+            fuse._hash_state({"messages": messages[:n], "step": n})
+        start = time.perf_counter()
+        for n in range(start_at + 1, args.messages + 1):
+            fuse._hash_state({"messages": messages[:n], "step": n})
+        per_step = (time.perf_counter() - start) / args.steps * 1e6
+        print(f"{name:<12}: {per_step:10.1f} us/step at ~{args.messages} messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Per-call overhead of @reliable on a no-op node.
+
+Usage:
+    python benchmarks/bench_node_overhead.py [--calls N]
+
+Each call uses a distinct state and run_id so the Fuse never trips and the
+history stays small; what remains is the fixed cost of the wrapper itself.
+Prints a matrix of feature combinations against a plain function call.
+"""
+import argparse
+import gc
+import time
+
+from pydantic import BaseModel
+
+from agentcircuit import reliable
+from agentcircuit.budget import GlobalBudget
+from agentcircuit.storage import InMemoryStorage
+
+
+class Echo(BaseModel):
+    i: int
+
+
+def noop(state):
+    return state
+
+
+def bench(fn, calls: int) -> float:
+    """Return mean microseconds per call."""
+    # Like timeit, keep the collector (and earlier cases' traces) out of the timing
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for i in range(calls):
+            fn({"i": i}, config={"configurable": {"thread_id": f"bench-{i}"}})
+        return (time.perf_counter() - start) / calls * 1e6
+    finally:
+        gc.enable()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    plain = lambda state, config=None: noop(state)  # noqa: E731
+    lean = dict(storage=False, fuse_limit=None)
+    cases = [
+        ("lean (storage=False, fuse off)", lean),
+        ("lean + sentinel", dict(lean, sentinel_schema=Echo)),
+        ("lean + GlobalBudget", dict(lean, budget=GlobalBudget(max_cost_usd=1e9))),
+        ("trace only (fuse off)", dict(fuse_limit=None)),
+        ("@reliable() defaults", {}),
+        ("defaults + sentinel", dict(sentinel_schema=Echo)),
+        ("defaults + max_cost_usd", dict(max_cost_usd=1e9)),
+        ("defaults + max_seconds", dict(max_seconds=1e9)),
+        ("everything", dict(
+            sentinel_schema=Echo, max_cost_usd=1e9, max_seconds=1e9,
+            budget=GlobalBudget(max_cost_usd=1e9),
+        )),
+    ]
+
+    baseline = bench(plain, args.calls)
+    print(f"{'plain function':<32}: {baseline:8.2f} us/call")
+    for name, options in cases:
+        if options.get("storage") is not False:
+            options = dict(options, storage=InMemoryStorage())
+        wrapped = reliable(**options)(noop)
+        per_call = bench(wrapped, args.calls)
+        print(f"{name:<32}: {per_call:8.2f} us/call  (+{per_call - baseline:.2f})")
+
+
+if __name__ == "__main__":
+    main()
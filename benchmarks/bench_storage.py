@@ -0,0 +1,86 @@
+"""
+SQLite storage microbenchmark.
+
+Usage:
+    python benchmarks/bench_storage.py [--ops N]
+
+Reports operations per second for the calls reliable_node makes on every
+node invocation, against a fresh database in a temp directory. Then
+compares plain and deduplicated (StorageConfig.dedup_states) logging of a
+LangGraph-style state whose message history grows every step.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from agentcircuit.fuse import hash_state
+from agentcircuit.storage import Storage, StorageConfig
+
+
+def ops_per_sec(fn, ops: int) -> float:
+    start = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    return ops / (time.perf_counter() - start)
+
+
+def bench_history(temp_dir: str, ops: int, max_messages: int):
+    messages = [
+        {"role": "user" if i % 2 else "assistant", "content": f"message {i}: " + "lorem ipsum " * 20}
+        for i in range(max_messages + 1)
+    ]
+
+    def state(i):
+        n = i % max_messages + 1
+        return {"messages": messages[:n], "step": n}
+
+    for dedup in (False, True):
+        db_path = os.path.join(temp_dir, f"history-{dedup}", "traces.db")
+        storage = Storage(db_path=db_path, config=StorageConfig(db_path=db_path, dedup_states=dedup))
+        rate = ops_per_sec(lambda i: storage.log_trace(
+            run_id=f"run-{i // max_messages}", node_id="node", input_state=state(i),
+            output_state=state(i + 1), status="success",
+        ), ops)
+        storage.close()
+        size = sum(
+            os.path.getsize(os.path.join(os.path.dirname(db_path), name))
+            for name in os.listdir(os.path.dirname(db_path))
+        )
+        label = "dedup" if dedup else "plain"
+        print(f"history {label:<6}: {rate:>10,.0f} ops/s  {size / 1e6:>8.1f} MB on disk")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=200,
+                        help="history length at which a run restarts")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        storage = Storage(db_path=os.path.join(temp_dir, ".agentcircuit", "traces.db"))
+        state_hash = hash_state({"i": 0})
+
+        cases = [
+            ("log_trace", lambda i: storage.log_trace(
+                run_id=f"run-{i % 50}", node_id="node", input_state={"i": i},
+                output_state={"ok": True}, status="success", estimated_cost=0.001,
+            )),
+            ("get_run_cost", lambda i: storage.get_run_cost(f"run-{i % 50}")),
+            ("count_state", lambda i: storage.count_state(f"run-{i % 50}", "node", state_hash)),
+            ("get_setting", lambda i: storage.get_setting("cost_per_token")),
+        ]
+        for name, fn in cases:
+            print(f"{name:<14}: {ops_per_sec(fn, args.ops):>10,.0f} ops/s")
+
+        print()
+        bench_history(temp_dir, args.ops, args.messages)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -184,6 +184,95 @@ class TestReliableNodeFuse:
             )
             assert result == {"result": i}
 
+    def test_incremental_fuse_detects_loop(self, unique_run_id):
+        """Test fuse_incremental trips on a repeated message history."""
+        messages = [{"role": "user", "content": f"m{i}"} for i in range(20)]
+
+        @reliable_node(fuse_limit=2, fuse_incremental=True, storage=InMemoryStorage())
+        def chat_node(state):
+            return {"messages": state["messages"]}
+
+        config = {"configurable": {"thread_id": unique_run_id}}
+        for n in range(1, 20):
+            chat_node({"messages": messages[:n]}, config=config)
+        chat_node({"messages": messages[:19]}, config=config)
+
+        with pytest.raises(LoopError):
+            chat_node({"messages": messages[:19]}, config=config)
+
+    def test_fingerprint_ignores_volatile_fields(self, unique_run_id):
+        """Test a loop is caught even though a timestamp changes every step."""
+        from agentcircuit import FingerprintSpec
+
+        @reliable_node(fuse_limit=2, fingerprint=FingerprintSpec(exclude=["ts"]), storage=InMemoryStorage())
+        def stuck_node(state):
+            return {"echo": state}
+
+        config = {"configurable": {"thread_id": unique_run_id}}
+        stuck_node({"q": "same", "ts": 1}, config=config)
+        stuck_node({"q": "same", "ts": 2}, config=config)
+
+        with pytest.raises(LoopError):
+            stuck_node({"q": "same", "ts": 3}, config=config)
+
+    def test_cycle_detector_across_nodes(self, unique_run_id):
+        """Test a shared CycleDetector catches an A -> B ping-pong loop."""
+        from agentcircuit import CycleDetector
+
+        test_storage = InMemoryStorage()
+        detector = CycleDetector(repeats=3)
+
+        @reliable_node(storage=test_storage, cycle_detector=detector)
+        def node_a(state):
+            return state
+
+        @reliable_node(storage=test_storage, cycle_detector=detector)
+        def node_b(state):
+            return state
+
+        config = {"configurable": {"thread_id": unique_run_id}}
+        with pytest.raises(LoopError, match="node_a -> node_b"):
+            for _ in range(3):
+                node_a({"turn": "a"}, config=config)
+                node_b({"turn": "b"}, config=config)
+
+        assert test_storage.get_run_history(unique_run_id)[-1]["status"] == "failed_loop"
+
+    def test_similarity_fuse_catches_reworded_loop(self, unique_run_id):
+        """Test a SimilarityFuse trips where exact hashing cannot."""
+        from agentcircuit import SimilarityFuse
+
+        @reliable_node(similarity_fuse=SimilarityFuse(limit=2), storage=InMemoryStorage())
+        def thinking_node(state):
+            return state
+
+        text = (
+            "Let me look up the {} stock price for ACME Corporation and summarize the "
+            "trend over the last quarter, then compare it with the sector index and "
+            "report the result back to the user with a short recommendation"
+        )
+        config = {"configurable": {"thread_id": unique_run_id}}
+        thinking_node({"thought": text.format("latest")}, config=config)
+        thinking_node({"thought": text.format("current")}, config=config)
+
+        with pytest.raises(LoopError):
+            thinking_node({"thought": text.format("newest")}, config=config)
+
+    def test_fuse_history_without_storage(self, unique_run_id):
+        """Test a SketchHistory lets the Fuse run without tracing."""
+        from agentcircuit import SketchHistory
+
+        @reliable_node(storage=False, fuse_limit=2, fuse_history=SketchHistory())
+        def looping_node(state):
+            return state
+
+        config = {"configurable": {"thread_id": unique_run_id}}
+        looping_node({"same": "state"}, config=config)
+        looping_node({"same": "state"}, config=config)
+
+        with pytest.raises(LoopError):
+            looping_node({"same": "state"}, config=config)
+
     def test_loop_detected_same_state(self):
         """Test loop detection with repeated same state."""
         # Use unique run_id each time to avoid cross-test pollution
@@ -525,6 +614,222 @@ class TestReliableNodeBudget:
         )
         assert result == {"result": "fast"}
 
+    def test_max_seconds_cuts_off_slow_node(self):
+        """Test a hung sync node is cut off at max_seconds without Medic."""
+        import threading
+        import time
+        release = threading.Event()
+        medic_calls = []
+
+        @reliable_node(max_seconds=0.1, fuse_limit=None, storage=False,
+                       medic_repair=lambda e, s: medic_calls.append(e))
+        def hung_node(state):
+            release.wait(5.0)
+            return state
+
+        start = time.time()
+        with pytest.raises(TimeoutExceededError):
+            hung_node({"x": 1})
+        assert time.time() - start < 1.0
+        assert medic_calls == []
+        release.set()
+
+    def test_max_seconds_cancels_async_node(self):
+        """Test a slow async node is cancelled at max_seconds."""
+        import asyncio
+
+        @reliable_node(max_seconds=0.1, fuse_limit=None, storage=False)
+        async def slow_node(state):
+            await asyncio.sleep(5.0)
+            return state
+
+        with pytest.raises(TimeoutExceededError):
+            asyncio.run(slow_node({"x": 1}))
+
+    def test_max_seconds_caps_provider_timeout(self):
+        """Test providers called inside a timed node get the remaining time."""
+        from agentcircuit.providers import CustomProvider, ModelConfig, ProviderType
+        provider = CustomProvider(ModelConfig(provider=ProviderType.CUSTOM, model_id="m", timeout=30.0), str)
+        seen = []
+
+        @reliable_node(max_seconds=2.0, fuse_limit=None, storage=False)
+        def llm_node(state):
+            seen.append(provider._request_timeout())
+            return state
+
+        llm_node({"x": 1})
+        assert 0 < seen[0] <= 2.0
+        assert provider._request_timeout() == 30.0
+
+    def test_global_budget_deadline_propagates(self):
+        """Test the GlobalBudget's remaining time is the node's deadline."""
+        from agentcircuit import time_remaining
+        budget = GlobalBudget(max_cost_usd=100.0, max_seconds=5.0)
+        seen = []
+
+        @reliable_node(max_seconds=60.0, fuse_limit=None, storage=False, budget=budget)
+        def timed_node(state):
+            seen.append(time_remaining())
+            return state
+
+        timed_node({"x": 1})
+        assert 0 < seen[0] <= 5.0
+        assert time_remaining() is None
+
+    def test_concurrent_nodes_do_not_overshoot_budget(self):
+        """Test reservations stop concurrent calls from jointly overspending."""
+        import threading
+        import time
+        budget = GlobalBudget(max_cost_usd=0.2)
+        barrier = threading.Barrier(20)
+        ran, refused = [], []
+
+        @reliable_node(fuse_limit=None, storage=False, budget=budget, cost_per_token=0.001)
+        def priced_node(state):
+            ran.append(state)
+            time.sleep(0.02)  # Keep the calls in flight together
+            return {"text": "x" * 40}
+
+        priced_node({"prompt": "y" * 40})  # Calibrates the estimate
+
+        def worker(i):
+            barrier.wait()
+            try:
+                priced_node({"prompt": "y" * 40, "i": i})
+            except BudgetExceededError:
+                refused.append(i)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert refused and len(ran) > 2
+        assert budget.reserved == pytest.approx(0.0)
+        assert budget.total_spent <= 0.2 * 1.25
+
+    def test_failed_call_releases_reservation(self):
+        """Test a failing node leaves no hold on the budget."""
+        budget = GlobalBudget(max_cost_usd=100.0)
+
+        @reliable_node(fuse_limit=None, storage=False, budget=budget, cost_per_token=0.01)
+        def failing_node(state):
+            raise RuntimeError("boom")
+
+        with pytest.raises(Exception):
+            failing_node({"x": 1})
+        assert budget.reserved == pytest.approx(0.0)
+        assert budget.total_spent == pytest.approx(0.0)
+
+    def test_budget_tree_per_tenant(self):
+        """Test budget_tree charges the tenant from config and trips at its limit."""
+        from agentcircuit import BudgetTree
+        tree = BudgetTree(tenant_limit=0.05)
+
+        @reliable_node(fuse_limit=None, storage=False, budget_tree=tree, cost_per_token=0.001)
+        def priced_node(state):
+            return {"text": "x" * 40}
+
+        acme = {"configurable": {"tenant_id": "acme", "thread_id": "run-1"}}
+        globex = {"configurable": {"tenant_id": "globex", "thread_id": "run-2"}}
+        priced_node({"prompt": "y" * 40}, config=acme)
+        spent = tree.spent(("acme",))
+        assert spent > 0
+        assert tree.spent(("acme", "run-1", "priced_node")) == spent
+
+        with pytest.raises(BudgetExceededError, match="tenant acme"):
+            for _ in range(5):
+                priced_node({"prompt": "y" * 40}, config=acme)
+        priced_node({"prompt": "y" * 40}, config=globex)
+        assert tree.spent() == pytest.approx(tree.spent(("acme",)) + tree.spent(("globex",)))
+
+    def test_rate_limit_delays_node(self):
+        """Test a node waits for request capacity before running."""
+        import time
+        from agentcircuit import TokenBucketLimiter
+        limiter = TokenBucketLimiter(20, per=1.0, capacity=1)
+
+        @reliable_node(fuse_limit=None, storage=False, rate_limits=limiter)
+        def limited_node(state):
+            return {"result": "ok"}
+
+        start = time.monotonic()
+        limited_node({"n": 1})
+        limited_node({"n": 2})
+        assert time.monotonic() - start >= 0.03
+        assert limiter.delays == 1
+
+    def test_rate_limit_rejects_before_running(self):
+        """Test RateLimitExceededError is raised without calling the node or holding budget."""
+        from agentcircuit import SlidingWindowLimiter, RateLimitExceededError
+        budget = GlobalBudget(max_cost_usd=100.0)
+        calls = []
+
+        @reliable_node(
+            fuse_limit=None, storage=False, budget=budget,
+            rate_limits=[SlidingWindowLimiter(1, window_seconds=60, max_wait=0.1)],
+        )
+        def limited_node(state):
+            calls.append(state)
+            return {"result": "ok"}
+
+        limited_node({"n": 1})
+        with pytest.raises(RateLimitExceededError):
+            limited_node({"n": 2})
+        assert len(calls) == 1
+        assert budget.reserved == pytest.approx(0.0)
+
+    def test_token_rate_limit_reconciled_to_usage(self):
+        """Test the token estimate taken up front is corrected to the measured usage."""
+        from agentcircuit import SlidingWindowLimiter
+        limiter = SlidingWindowLimiter(100_000, window_seconds=60, unit="tokens")
+
+        @reliable_node(fuse_limit=None, storage=False, rate_limits=limiter)
+        def wordy_node(state):
+            return {"text": "x" * 4000}
+
+        wordy_node({"prompt": "short"})
+        # Roughly 1000 output tokens, far above the prompt-based estimate
+        assert limiter.used > 900
+
+    def test_rate_limit_async_node(self):
+        """Test async nodes wait for capacity off the event loop."""
+        import asyncio
+        from agentcircuit import TokenBucketLimiter
+        limiter = TokenBucketLimiter(20, per=1.0, capacity=1)
+
+        @reliable_node(fuse_limit=None, storage=False, rate_limits=limiter)
+        async def limited_node(state):
+            return {"result": "ok"}
+
+        async def both():
+            await asyncio.gather(limited_node({"n": 1}), limited_node({"n": 2}))
+
+        asyncio.run(both())
+        assert limiter.delays == 1
+
+    def test_spend_velocity_trips_runaway_run(self):
+        """Test a run whose cost per step jumps is stopped before its next step."""
+        from agentcircuit import SpendVelocityFuse
+        fuse = SpendVelocityFuse(k=4.0, min_samples=20, metrics=("cost",))
+        test_storage = InMemoryStorage()
+
+        @reliable_node(fuse_limit=None, storage=test_storage, spend_velocity=fuse, cost_per_token=0.001)
+        def agent_step(state):
+            return {"text": "x" * state["size"]}
+
+        for r in range(5):
+            for step in range(5):
+                agent_step({"size": 40 + step}, config={"configurable": {"thread_id": f"normal-{r}"}})
+
+        runaway = {"configurable": {"thread_id": "runaway"}}
+        agent_step({"size": 40}, config=runaway)
+        agent_step({"size": 4000}, config=runaway)
+        with pytest.raises(BudgetExceededError, match="Spend velocity anomaly"):
+            agent_step({"size": 40}, config=runaway)
+        agent_step({"size": 40}, config={"configurable": {"thread_id": "normal-5"}})
+
     def test_global_budget_under_limit(self, unique_run_id):
         """Test GlobalBudget passes when under limit."""
         budget = GlobalBudget(max_cost_usd=100.0)
@@ -624,3 +929,548 @@ class TestReliableNodeBudget:
         )
         assert budget.total_spent > 0
         assert budget.remaining > 0
+
+
+# ============================================================================
+# Decoration-time Setup Tests
+# ============================================================================
+
+class TestReliableNodeSetup:
+    """Test that per-node components are built once, not per call."""
+
+    def test_medic_not_built_on_happy_path(self, monkeypatch):
+        """Test no Medic (and no provider discovery) for successful calls."""
+        import agentcircuit.core as core
+
+        built = []
+        monkeypatch.setattr(core, "Medic", lambda **kw: built.append(kw))
+
+        @reliable_node(storage=InMemoryStorage())
+        def ok_node(state):
+            return {"ok": True}
+
+        for i in range(3):
+            ok_node({"i": i})
+
+        assert built == []
+
+    def test_medic_built_once_across_failures(self, monkeypatch):
+        """Test the Medic is created on first failure and then reused."""
+        import agentcircuit.core as core
+
+        real_medic = core.Medic
+        built = []
+
+        def counting_medic(**kwargs):
+            built.append(kwargs)
+            return real_medic(**kwargs)
+
+        monkeypatch.setattr(core, "Medic", counting_medic)
+
+        def fix_llm(prompt: str) -> str:
+            return '{"message": "fixed", "status": "ok"}'
+
+        @reliable_node(sentinel_schema=SimpleOutput, llm_callable=fix_llm, storage=InMemoryStorage())
+        def broken_node(state):
+            return {"wrong": "output"}
+
+        for i in range(3):
+            assert broken_node({"i": i}).message == "fixed"
+
+        assert len(built) == 1
+
+    def test_storage_cost_setting_used_when_no_model(self, unique_run_id):
+        """Test cost_per_token falls back to the storage setting."""
+        test_storage = InMemoryStorage()
+        test_storage.set_setting("cost_per_token", "0.001")
+
+        @reliable_node(storage=test_storage)
+        def priced_node(state):
+            return {"ok": True}
+
+        priced_node({"input": "x"}, config={"configurable": {"thread_id": unique_run_id}})
+
+        trace = test_storage.get_run_history(unique_run_id)[-1]
+        assert trace["estimated_cost"] == pytest.approx(trace["token_usage"] * 0.001)
+
+    def test_storage_cost_setting_change_takes_effect(self, unique_run_id, monkeypatch):
+        """Test the cost_per_token setting is cached briefly, then re-read."""
+        import agentcircuit.core as core_module
+        test_storage = InMemoryStorage()
+        test_storage.set_setting("cost_per_token", "0.001")
+        reads = []
+        get_setting = test_storage.get_setting
+        monkeypatch.setattr(test_storage, "get_setting", lambda key: reads.append(key) or get_setting(key))
+
+        @reliable_node(storage=test_storage)
+        def cached_node(state):
+            return {"ok": True}
+
+        config = {"configurable": {"thread_id": unique_run_id}}
+        cached_node({"input": "x"}, config=config)
+        cached_node({"input": "y"}, config=config)
+        assert reads.count("cost_per_token") == 1
+
+        monkeypatch.setattr(core_module, "_SETTING_TTL", 0.0)
+
+        @reliable_node(storage=test_storage)
+        def priced_node(state):
+            return {"ok": True}
+
+        priced_node({"input": "z"}, config=config)
+        test_storage.set_setting("cost_per_token", "0.002")
+        priced_node({"input": "w"}, config=config)
+
+        trace = test_storage.get_run_history(unique_run_id)[-1]
+        assert trace["estimated_cost"] == pytest.approx(trace["token_usage"] * 0.002)
+
+
+# ============================================================================
+# Async Node Tests
+# ============================================================================
+
+class TestReliableNodeAsync:
+    """Test coroutine node support."""
+
+    def test_async_wrapper_is_coroutine_function(self):
+        """Test decorating an async node yields an async wrapper."""
+        import inspect
+
+        @reliable_node()
+        async def async_node(state):
+            return {"ok": True}
+
+        assert inspect.iscoroutinefunction(async_node)
+        assert async_node.__name__ == "async_node"
+
+    def test_async_node_result_is_awaited_and_validated(self, unique_run_id):
+        """Test the node's awaited result (not a coroutine) reaches Sentinel."""
+        import asyncio
+        test_storage = InMemoryStorage()
+
+        @reliable_node(sentinel_schema=SimpleOutput, storage=test_storage)
+        async def async_node(state):
+            await asyncio.sleep(0)
+            return {"message": "hi", "status": "ok"}
+
+        result = asyncio.run(async_node(
+            {"input": "x"},
+            config={"configurable": {"thread_id": unique_run_id}}
+        ))
+
+        assert isinstance(result, SimpleOutput)
+        assert test_storage.get_run_history(unique_run_id)[-1]["status"] == "success"
+
+    def test_async_node_recovery_with_medic(self, unique_run_id):
+        """Test Medic repairs a failing async node."""
+        import asyncio
+
+        def fix_llm(prompt: str) -> str:
+            return '{"message": "Recovered", "status": "ok"}'
+
+        @reliable_node(sentinel_schema=SimpleOutput, llm_callable=fix_llm, storage=InMemoryStorage())
+        async def failing_async_node(state):
+            raise ValueError("async failure")
+
+        result = asyncio.run(failing_async_node(
+            {"input": "x"},
+            config={"configurable": {"thread_id": unique_run_id}}
+        ))
+        assert result.message == "Recovered"
+
+    def test_async_loop_detection_with_sqlite(self, temp_storage):
+        """Test the Fuse trips for async nodes on a blocking backend."""
+        import asyncio
+        run_id = f"async-loop-{uuid.uuid4()}"
+
+        @reliable_node(fuse_limit=1, storage=temp_storage)
+        async def looping_node(state):
+            return {"echo": state}
+
+        async def run():
+            config = {"configurable": {"thread_id": run_id}}
+            await looping_node({"same": "state"}, config=config)
+            await looping_node({"same": "state"}, config=config)
+
+        with pytest.raises(LoopError):
+            asyncio.run(run())
+
+    def test_concurrent_async_runs(self):
+        """Test many async runs can share one event loop."""
+        import asyncio
+        test_storage = InMemoryStorage()
+
+        @reliable_node(storage=test_storage)
+        async def slow_node(state):
+            await asyncio.sleep(0.01)
+            return {"n": state["n"]}
+
+        async def run_all():
+            return await asyncio.gather(*[
+                slow_node({"n": i}, config={"configurable": {"thread_id": f"async-{i}"}})
+                for i in range(200)
+            ])
+
+        results = asyncio.run(run_all())
+        assert [r["n"] for r in results] == list(range(200))
+
+
+# ============================================================================
+# Disabled Feature Tests
+# ============================================================================
+
+class TestReliableNodeDisabledFeatures:
+    """Test that switched-off features do no per-call work."""
+
+    def test_fuse_off_skips_history(self, unique_run_id, monkeypatch):
+        """Test fuse_limit=None never hashes or counts states."""
+        import agentcircuit.fuse as fuse_module
+        import agentcircuit.storage as storage_module
+        hashed = []
+        monkeypatch.setattr(storage_module, "hash_state", lambda s: hashed.append(s) or "h", raising=False)
+        monkeypatch.setattr(fuse_module, "hash_state", lambda s: hashed.append(s) or "h")
+        test_storage = InMemoryStorage()
+        calls = []
+        test_storage.count_state = lambda *a: calls.append(a) or 0
+
+        @reliable_node(fuse_limit=None, storage=test_storage)
+        def repeat_node(state):
+            return {"ok": True}
+
+        config = {"configurable": {"thread_id": unique_run_id}}
+        for _ in range(5):
+            repeat_node({"same": "state"}, config=config)
+
+        assert calls == []
+        history = test_storage.get_run_history(unique_run_id)
+        assert len(history) == 5
+        assert history[0]["state_hash"] is None
+        assert hashed == []
+
+    def test_storage_false_uses_lean_path(self, monkeypatch):
+        """Test storage=False logs nothing and estimates no tokens."""
+        import agentcircuit.core as core
+
+        @reliable_node(storage=False, fuse_limit=None, sentinel_schema=SimpleOutput)
+        def lean_node(state):
+            return {"message": "hi", "status": "ok"}
+
+        monkeypatch.setattr(core, "get_default_storage", lambda: pytest.fail("storage used"))
+        monkeypatch.setattr(core.CostCalculator, "estimate_from_objects",
+                            lambda *a: pytest.fail("tokens estimated"))
+
+        assert lean_node({"x": 1}).message == "hi"
+
+    def test_lean_path_still_recovers(self):
+        """Test the lean path falls back to Medic repair and legacy callbacks."""
+        def fix_llm(prompt: str) -> str:
+            return '{"message": "fixed", "status": "ok"}'
+
+        @reliable_node(storage=False, fuse_limit=None, sentinel_schema=SimpleOutput, llm_callable=fix_llm)
+        def broken_node(state):
+            return {"wrong": "output"}
+
+        @reliable_node(storage=False, fuse_limit=None, medic_repair=lambda e, s: {"fixed": s})
+        def crashing_node(state):
+            raise RuntimeError("boom")
+
+        assert broken_node({"x": 1}).message == "fixed"
+        assert crashing_node({"x": 1}) == {"fixed": {"x": 1}}
+
+    def test_lean_path_drops_config(self):
+        """Test config is not forwarded to nodes that don't accept it."""
+        @reliable_node(storage=False, fuse_limit=None)
+        def plain_node(state):
+            return state
+
+        assert plain_node({"x": 1}, config={"configurable": {}}) == {"x": 1}
+
+    def test_lean_path_async(self):
+        """Test async nodes use the lean path too."""
+        import asyncio
+
+        @reliable_node(storage=False, fuse_limit=None, sentinel_schema=SimpleOutput)
+        async def lean_node(state):
+            return {"message": "hi", "status": "ok"}
+
+        assert asyncio.run(lean_node({"x": 1})).message == "hi"
+
+    def test_storage_false_with_global_budget(self):
+        """Test GlobalBudget still receives costs without tracing."""
+        budget = GlobalBudget(max_cost_usd=100.0)
+
+        @reliable_node(storage=False, fuse_limit=None, budget=budget, cost_per_token=0.01)
+        def priced_node(state):
+            return {"text": "x" * 100}
+
+        priced_node({"input": "y" * 100})
+        assert budget.total_spent > 0
+
+    def test_storage_false_requires_fuse_off(self):
+        """Test the fuse cannot be used without tracing."""
+        with pytest.raises(ValueError):
+            reliable_node(storage=False)(lambda state: state)
+
+
+class TestReliableNodeCircuitBreaker:
+    """Test circuit_breaker fast rejection."""
+
+    def test_open_breaker_skips_node_and_medic(self):
+        """Test calls are rejected without running the node or Medic once open."""
+        from agentcircuit import CircuitBreaker, CircuitOpenError
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+        node_calls, llm_calls = [], []
+
+        def fix_llm(prompt: str) -> str:
+            llm_calls.append(prompt)
+            raise RuntimeError("provider down too")
+
+        @reliable_node(fuse_limit=None, storage=InMemoryStorage(),
+                       llm_callable=fix_llm, circuit_breaker=breaker)
+        def flaky_api(state):
+            node_calls.append(state)
+            raise ConnectionError("API down")
+
+        for _ in range(2):
+            with pytest.raises(Exception):
+                flaky_api({"q": "x"})
+        medic_calls = len(llm_calls)
+
+        with pytest.raises(CircuitOpenError):
+            flaky_api({"q": "x"})
+        assert len(node_calls) == 2
+        assert len(llm_calls) == medic_calls
+        assert breaker.rejections == 1
+
+    def test_repaired_output_still_counts_as_failure(self):
+        """Test Medic repairs don't hide a failing node from the breaker."""
+        from agentcircuit import CircuitBreaker
+        breaker = CircuitBreaker(failure_threshold=5)
+
+        @reliable_node(fuse_limit=None, storage=False, circuit_breaker=breaker,
+                       medic_repair=lambda e, s: {"fallback": True})
+        def failing_node(state):
+            raise RuntimeError("boom")
+
+        assert failing_node({"x": 1}) == {"fallback": True}
+        assert breaker.failures == 1
+        assert breaker.successes == 0
+
+    def test_breaker_true_shares_per_node(self):
+        """Test circuit_breaker=True shares one breaker between nodes of a name."""
+        from agentcircuit import get_breaker
+
+        @reliable_node(node_name="shared_breaker_node", fuse_limit=None,
+                       storage=False, circuit_breaker=True)
+        def first(state):
+            return state
+
+        @reliable_node(node_name="shared_breaker_node", fuse_limit=None,
+                       storage=False, circuit_breaker=True)
+        def second(state):
+            return state
+
+        first({"x": 1})
+        second({"x": 2})
+        assert get_breaker("shared_breaker_node").successes == 2
+
+    def test_async_node_rejected(self):
+        """Test async nodes are rejected when the breaker is open."""
+        import asyncio
+        from agentcircuit import CircuitBreaker, CircuitOpenError
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure()
+
+        @reliable_node(fuse_limit=None, storage=False, circuit_breaker=breaker)
+        async def async_node(state):
+            pytest.fail("node ran while circuit open")
+
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(async_node({"x": 1}))
+
+    def test_cancelled_probe_releases_slot(self):
+        """Test cancelling an async half-open probe does not block later calls."""
+        import asyncio
+        from agentcircuit import BreakerState, CircuitBreaker
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0, half_open_max_calls=1)
+        breaker.record_failure()
+        hang = [True]
+
+        @reliable_node(fuse_limit=None, storage=False, circuit_breaker=breaker)
+        async def probe_node(state):
+            if hang[0]:
+                await asyncio.sleep(60)
+            return state
+
+        async def scenario():
+            task = asyncio.create_task(probe_node({"x": 1}))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            hang[0] = False
+            return await probe_node({"x": 2})
+
+        assert asyncio.run(scenario()) == {"x": 2}
+        assert breaker.state is BreakerState.CLOSED
+
+    def test_interrupted_probe_releases_slot(self):
+        """Test a probe ended by a BaseException hands its slot back."""
+        from agentcircuit import CircuitBreaker
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0, half_open_max_calls=1)
+        breaker.record_failure()
+
+        @reliable_node(fuse_limit=None, storage=False, circuit_breaker=breaker)
+        def probe_node(state):
+            if state.get("interrupt"):
+                raise KeyboardInterrupt
+            return state
+
+        with pytest.raises(KeyboardInterrupt):
+            probe_node({"interrupt": True})
+        assert probe_node({"x": 1}) == {"x": 1}
+
+    def test_unnamed_breaker_takes_node_name(self):
+        """Test an explicit breaker without a name is named after the node."""
+        from agentcircuit import CircuitBreaker
+        breaker = CircuitBreaker()
+
+        @reliable_node(node_name="named_by_node", fuse_limit=None, storage=False,
+                       circuit_breaker=breaker)
+        def api_node(state):
+            return state
+
+        assert breaker.name == "named_by_node"
+
+    def test_fallback_served_while_open(self):
+        """Test the last good output is served and traced while the breaker is open."""
+        from agentcircuit import CircuitBreaker, FallbackCache
+        test_storage = InMemoryStorage()
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60)
+        healthy = [True]
+
+        @reliable_node(fuse_limit=None, storage=test_storage, sentinel_schema=SimpleOutput,
+                       circuit_breaker=breaker, fallback=FallbackCache())
+        def api_node(state):
+            if not healthy[0]:
+                raise ConnectionError("API down")
+            return {"message": f"hello {state['q']}", "status": "ok"}
+
+        config = {"configurable": {"thread_id": "fallback_run"}}
+        assert api_node({"q": "a"}, config=config).message == "hello a"
+
+        healthy[0] = False
+        with pytest.raises(Exception):
+            api_node({"q": "a"}, config=config)
+
+        served = api_node({"q": "a"}, config=config)
+        assert served.message == "hello a"
+        assert test_storage.get_run_history("fallback_run")[-1]["status"] == "fallback"
+
+    def test_fallback_miss_still_rejects(self):
+        """Test inputs without a cached output are rejected."""
+        from agentcircuit import CircuitBreaker, CircuitOpenError, FallbackCache
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure()
+
+        @reliable_node(fuse_limit=None, storage=False, circuit_breaker=breaker,
+                       fallback=FallbackCache())
+        def api_node(state):
+            return state
+
+        with pytest.raises(CircuitOpenError):
+            api_node({"q": "unseen"})
+
+    def test_fallback_requires_breaker(self):
+        """Test fallback without a circuit_breaker is a configuration error."""
+        from agentcircuit import FallbackCache
+        with pytest.raises(ValueError):
+            reliable_node(fuse_limit=None, fallback=FallbackCache())(lambda state: state)
+
+
+class TestReliableNodeCache:
+    """Test cache= result memoization."""
+
+    def test_hit_skips_execution_and_is_traced(self):
+        """Test a repeated input is served from the cache at no cost."""
+        from agentcircuit import LRUCache
+        test_storage = InMemoryStorage()
+        calls = []
+
+        @reliable_node(fuse_limit=None, storage=test_storage, sentinel_schema=SimpleOutput,
+                       cache=LRUCache(), cost_per_token=0.01)
+        def classify(state):
+            calls.append(state)
+            return {"message": state["text"].upper(), "status": "ok"}
+
+        config = {"configurable": {"thread_id": "cache_run"}}
+        first = classify({"text": "hi"}, config=config)
+        second = classify({"text": "hi"}, config=config)
+
+        assert first.message == second.message == "HI"
+        assert len(calls) == 1
+        history = test_storage.get_run_history("cache_run")
+        assert [t["status"] for t in history] == ["success", "cached"]
+        assert history[1]["estimated_cost"] == 0
+
+    def test_caller_mutation_does_not_poison_cache(self):
+        """Test changing the returned output leaves the cached one intact."""
+        from agentcircuit import LRUCache
+
+        @reliable_node(fuse_limit=None, storage=False, cache=LRUCache())
+        def fetch(state):
+            return {"items": [state["q"]]}
+
+        first = fetch({"q": 1})
+        first["items"].append("poison")
+        assert fetch({"q": 1}) == {"items": [1]}
+
+    def test_version_change_misses(self):
+        """Test a new cache_version does not reuse old outputs."""
+        from agentcircuit import LRUCache
+        cache = LRUCache()
+        calls = []
+
+        def node(state):
+            calls.append(state)
+            return {"n": len(calls)}
+
+        v1 = reliable_node(node_name="versioned", fuse_limit=None, storage=False,
+                           cache=cache, cache_version="1")(node)
+        v2 = reliable_node(node_name="versioned", fuse_limit=None, storage=False,
+                           cache=cache, cache_version="2")(node)
+
+        assert v1({"x": 1}) == {"n": 1}
+        assert v1({"x": 1}) == {"n": 1}
+        assert v2({"x": 1}) == {"n": 2}
+
+    def test_failures_not_cached(self):
+        """Test repaired outputs are not memoized."""
+        calls = []
+
+        @reliable_node(fuse_limit=None, storage=False, cache="memory",
+                       medic_repair=lambda e, s: {"repaired": True})
+        def failing(state):
+            calls.append(state)
+            raise RuntimeError("boom")
+
+        failing({"x": 1})
+        failing({"x": 1})
+        assert len(calls) == 2
+
+    def test_async_node_cached(self):
+        """Test async nodes are memoized too."""
+        import asyncio
+        calls = []
+
+        @reliable_node(fuse_limit=None, storage=False, cache="memory")
+        async def async_node(state):
+            calls.append(state)
+            return {"ok": True}
+
+        async def main():
+            await async_node({"x": 1})
+            return await async_node({"x": 1})
+
+        assert asyncio.run(main()) == {"ok": True}
+        assert len(calls) == 1
@@ -0,0 +1,224 @@
+"""
+Unit tests for the circuit breaker module.
+"""
+import threading
+import pytest
+
+from agentcircuit.breaker import BreakerState, CircuitBreaker, FallbackCache, get_breaker
+from agentcircuit.errors import CircuitOpenError
+from agentcircuit.fuse import FingerprintSpec
+
+
+class TestCircuitBreakerStates:
+    """Test the closed/open/half-open transitions."""
+
+    def test_starts_closed(self):
+        """Test a new breaker admits calls."""
+        breaker = CircuitBreaker()
+        breaker.before_call()
+        assert breaker.state is BreakerState.CLOSED
+        assert breaker.calls == 1
+
+    def test_opens_after_threshold(self):
+        """Test failure_threshold failures open the breaker."""
+        breaker = CircuitBreaker(failure_threshold=3)
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.state is BreakerState.CLOSED
+        breaker.record_failure()
+        assert breaker.state is BreakerState.OPEN
+        assert breaker.times_opened == 1
+
+    def test_open_rejects(self):
+        """Test an open breaker rejects with CircuitOpenError."""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60, name="search")
+        breaker.record_failure()
+        with pytest.raises(CircuitOpenError) as exc_info:
+            breaker.before_call()
+        assert exc_info.value.node_id == "search"
+        assert 0 < exc_info.value.retry_after <= 60
+        assert breaker.rejections == 1
+
+    def test_failures_outside_window_expire(self, monkeypatch):
+        """Test only failures within window_seconds count."""
+        import agentcircuit.breaker as breaker_module
+        now = [1000.0]
+        monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+
+        breaker = CircuitBreaker(failure_threshold=2, window_seconds=10)
+        breaker.record_failure()
+        now[0] += 11
+        breaker.record_failure()
+        assert breaker.state is BreakerState.CLOSED
+        breaker.record_failure()
+        assert breaker.state is BreakerState.OPEN
+
+    def test_half_open_probe_closes(self, monkeypatch):
+        """Test a successful probe after recovery_timeout closes the breaker."""
+        import agentcircuit.breaker as breaker_module
+        now = [1000.0]
+        monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=5)
+        breaker.record_failure()
+        now[0] += 5
+        breaker.before_call()
+        assert breaker.state is BreakerState.HALF_OPEN
+        breaker.record_success()
+        assert breaker.state is BreakerState.CLOSED
+
+    def test_half_open_limits_probes(self, monkeypatch):
+        """Test only half_open_max_calls probes run at once."""
+        import agentcircuit.breaker as breaker_module
+        now = [1000.0]
+        monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=5, half_open_max_calls=1)
+        breaker.record_failure()
+        now[0] += 5
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_release_probe_frees_slot(self, monkeypatch):
+        """Test a probe released without an outcome lets the next probe in."""
+        import agentcircuit.breaker as breaker_module
+        now = [1000.0]
+        monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=5, half_open_max_calls=1)
+        breaker.record_failure()
+        now[0] += 5
+        assert breaker.before_call() is True
+        breaker.release_probe()
+        assert breaker.before_call() is True
+        assert breaker.state is BreakerState.HALF_OPEN
+
+    def test_half_open_failure_reopens(self, monkeypatch):
+        """Test a failed probe reopens the breaker and restarts the timeout."""
+        import agentcircuit.breaker as breaker_module
+        now = [1000.0]
+        monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=5)
+        breaker.record_failure()
+        now[0] += 5
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state is BreakerState.OPEN
+        assert breaker.times_opened == 2
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_reset(self):
+        """Test reset closes the breaker."""
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure()
+        breaker.reset()
+        breaker.before_call()
+        assert breaker.state is BreakerState.CLOSED
+
+    def test_invalid_threshold_raises(self):
+        """Test a zero failure_threshold is rejected."""
+        with pytest.raises(ValueError):
+            CircuitBreaker(failure_threshold=0)
+
+
+class TestCircuitBreakerStats:
+    """Test counters and the shared registry."""
+
+    def test_stats_snapshot(self):
+        """Test stats reports state and counters."""
+        breaker = CircuitBreaker(failure_threshold=1, name="n")
+        breaker.before_call()
+        breaker.record_failure()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        assert breaker.stats == {
+            "name": "n",
+            "state": "open",
+            "calls": 1,
+            "successes": 0,
+            "failures": 1,
+            "rejections": 1,
+            "times_opened": 1,
+        }
+
+    def test_concurrent_failures(self):
+        """Test failures from many threads are all counted."""
+        breaker = CircuitBreaker(failure_threshold=800)
+
+        def fail():
+            for _ in range(100):
+                breaker.record_failure()
+
+        threads = [threading.Thread(target=fail) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert breaker.failures == 800
+        assert breaker.state is BreakerState.OPEN
+
+    def test_get_breaker_shared_per_node(self):
+        """Test get_breaker returns one breaker per node name."""
+        first = get_breaker("test_get_breaker_node", failure_threshold=2)
+        assert get_breaker("test_get_breaker_node") is first
+        assert first.failure_threshold == 2
+        assert get_breaker("test_get_breaker_other") is not first
+
+
+class TestFallbackCache:
+    """Test the last-known-good output cache."""
+
+    def test_store_and_lookup(self):
+        """Test a stored output is found for an equal input."""
+        cache = FallbackCache()
+        cache.store({"q": "x"}, {"answer": 1})
+        assert cache.lookup({"q": "x"}) == (True, {"answer": 1})
+        assert cache.lookup({"q": "y"}) == (False, None)
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_lookup_returns_copy(self):
+        """Test callers cannot alter the cached output."""
+        cache = FallbackCache()
+        cache.store({"q": "x"}, {"items": [1]})
+        _, served = cache.lookup({"q": "x"})
+        served["items"].append(2)
+        assert cache.lookup({"q": "x"}) == (True, {"items": [1]})
+
+    def test_store_keeps_copy(self):
+        """Test the caller that stored an output cannot alter the stored one."""
+        cache = FallbackCache()
+        result = {"items": [1]}
+        cache.store({"q": "x"}, result)
+        result["items"].append("poison")
+        assert cache.lookup({"q": "x"}) == (True, {"items": [1]})
+
+    def test_fingerprint_ignores_volatile_fields(self):
+        """Test the FingerprintSpec decides which inputs are equivalent."""
+        cache = FallbackCache(fingerprint=FingerprintSpec(exclude=["ts"]))
+        cache.store({"q": "x", "ts": 1}, "out")
+        assert cache.lookup({"q": "x", "ts": 2}) == (True, "out")
+
+    def test_max_size_evicts_least_recent(self):
+        """Test the cache stays within max_size."""
+        cache = FallbackCache(max_size=2)
+        cache.store({"i": 1}, 1)
+        cache.store({"i": 2}, 2)
+        cache.store({"i": 3}, 3)
+        assert len(cache) == 2
+        assert cache.lookup({"i": 1}) == (False, None)
+
+    def test_ttl_expires(self, monkeypatch):
+        """Test entries older than ttl_seconds are not served."""
+        import agentcircuit.breaker as breaker_module
+        now = [1000.0]
+        monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+
+        cache = FallbackCache(ttl_seconds=10)
+        cache.store({"q": "x"}, "out")
+        now[0] += 11
+        assert cache.lookup({"q": "x"}) == (False, None)
+        assert len(cache) == 0
@@ -1,12 +1,24 @@
 """
 Unit tests for the Budget module - Cost-saving circuit breakers.
 """
+import os
 import time
 import threading
+import uuid
 import pytest
 
-from agentcircuit.budget import BudgetFuse, TimeoutFuse, GlobalBudget
-from agentcircuit.errors import BudgetExceededError, TimeoutExceededError
+from agentcircuit.budget import (
+    BudgetFuse,
+    TimeoutFuse,
+    GlobalBudget,
+    SlidingWindowLimiter,
+    TokenBucketLimiter,
+    GCRALimiter,
+    SpendVelocityFuse,
+    deadline,
+    time_remaining,
+)
+from agentcircuit.errors import BudgetExceededError, RateLimitExceededError, TimeoutExceededError
 
 
 # ============================================================================
@@ -137,6 +149,85 @@ class TestTimeoutFuseCheck:
         assert "Timeout exceeded" in str(exc_info.value)
 
 
+class TestTimeoutFusePreemptive:
+    """Test TimeoutFuse cutting off slow calls."""
+
+    def test_run_returns_result(self):
+        """Test run passes results and exceptions through."""
+        fuse = TimeoutFuse(max_seconds=5.0)
+        assert fuse.run(lambda x, y=0: x + y, (1,), {"y": 2}, time.time()) == 3
+        with pytest.raises(KeyError):
+            fuse.run(lambda: {}["missing"], (), {}, time.time())
+
+    def test_run_cuts_off_slow_call(self):
+        """Test run raises at the limit instead of waiting for the call."""
+        fuse = TimeoutFuse(max_seconds=0.1)
+        release = threading.Event()
+        start = time.time()
+        with pytest.raises(TimeoutExceededError):
+            fuse.run(release.wait, (5.0,), {}, start)
+        assert time.time() - start < 1.0
+        release.set()
+
+    def test_run_sees_deadline(self):
+        """Test the watched call runs within the caller's deadline."""
+        fuse = TimeoutFuse(max_seconds=5.0)
+        with deadline(2.0):
+            remaining = fuse.run(time_remaining, (), {}, time.time())
+        assert 0 < remaining <= 2.0
+
+    def test_process_isolation_terminates(self):
+        """Test isolation='process' kills the slow call."""
+        fuse = TimeoutFuse(max_seconds=0.2, isolation="process")
+        assert fuse.run(lambda x: x * 2, (21,), {}, time.time()) == 42
+        with pytest.raises(ValueError):
+            fuse.run(lambda: int("x"), (), {}, time.time())
+        start = time.time()
+        with pytest.raises(TimeoutExceededError):
+            fuse.run(time.sleep, (5.0,), {}, start)
+        assert time.time() - start < 2.0
+
+    def test_invalid_isolation_raises(self):
+        """Test unknown isolation modes are rejected."""
+        with pytest.raises(ValueError):
+            TimeoutFuse(max_seconds=1.0, isolation="fiber")
+
+    def test_arun_cancels(self):
+        """Test arun cancels a slow coroutine at the limit."""
+        import asyncio
+        fuse = TimeoutFuse(max_seconds=0.1)
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(5.0)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        with pytest.raises(TimeoutExceededError):
+            asyncio.run(fuse.arun(slow(), time.time()))
+        assert cancelled == [True]
+
+
+class TestDeadline:
+    """Test the deadline context."""
+
+    def test_no_deadline(self):
+        """Test time_remaining is None outside a deadline."""
+        assert time_remaining() is None
+
+    def test_nested_deadline_never_extends(self):
+        """Test an inner deadline cannot outlive the outer one."""
+        with deadline(1.0):
+            with deadline(10.0):
+                assert time_remaining() <= 1.0
+            with deadline(0.5):
+                assert time_remaining() <= 0.5
+            assert 0.5 < time_remaining() <= 1.0
+        assert time_remaining() is None
+
+
 # ============================================================================
 # GlobalBudget Tests
 # ============================================================================
@@ -314,6 +405,538 @@ class TestGlobalBudgetThreadSafety:
         assert len(unexpected) == 0
 
 
+class TestBudgetReservations:
+    """Test reserve/commit/release on GlobalBudget and BudgetFuse."""
+
+    def test_reserve_counts_as_spend(self):
+        """Test a hold counts against the budget until settled."""
+        gb = GlobalBudget(max_cost_usd=1.0)
+        gb.reserve(0.4)
+        assert gb.total_spent == pytest.approx(0.4)
+        assert gb.reserved == pytest.approx(0.4)
+
+    def test_reserve_over_limit_refused(self):
+        """Test a reservation that would exceed the limit is refused."""
+        gb = GlobalBudget(max_cost_usd=1.0)
+        gb.reserve(0.7)
+        with pytest.raises(BudgetExceededError, match="reservation refused"):
+            gb.reserve(0.4)
+        assert gb.total_spent == pytest.approx(0.7)
+
+    def test_commit_reconciles_to_actual(self):
+        """Test commit replaces the hold with the actual cost."""
+        gb = GlobalBudget(max_cost_usd=1.0)
+        gb.reserve(0.5)
+        gb.commit(0.5, 0.2)
+        assert gb.total_spent == pytest.approx(0.2)
+        assert gb.reserved == pytest.approx(0.0)
+
+    def test_release_drops_hold(self):
+        """Test release frees the held amount."""
+        gb = GlobalBudget(max_cost_usd=1.0)
+        gb.reserve(0.9)
+        gb.release(0.9)
+        gb.reserve(0.9)  # Should not raise
+
+    def test_concurrent_reservations_never_overshoot(self):
+        """Test concurrent reservations together stay within the limit."""
+        gb = GlobalBudget(max_cost_usd=1.0)
+        granted = []
+        barrier = threading.Barrier(50)
+
+        def worker():
+            barrier.wait()
+            try:
+                gb.reserve(0.1)
+                granted.append(True)
+            except BudgetExceededError:
+                pass
+
+        threads = [threading.Thread(target=worker) for _ in range(50)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(granted) == 10
+
+    def test_budget_fuse_reserve_per_run(self):
+        """Test BudgetFuse holds are tracked per run."""
+        fuse = BudgetFuse(max_cost_usd=1.0)
+        fuse.reserve("run-a", current_cost=0.5, amount=0.4)
+        with pytest.raises(BudgetExceededError):
+            fuse.reserve("run-a", current_cost=0.5, amount=0.2)
+        fuse.reserve("run-b", current_cost=0.0, amount=0.9)
+        fuse.commit("run-a", 0.4)
+        assert fuse.reserved("run-a") == 0.0
+        assert fuse.reserved("run-b") == pytest.approx(0.9)
+        fuse.release("run-b", 0.9)
+
+    def test_budget_fuse_holds_shared_across_nodes(self):
+        """Test parallel branches of one run through different nodes see each other's holds."""
+        run_id = f"shared-{uuid.uuid4()}"
+        extract, summarize = BudgetFuse(max_cost_usd=1.0), BudgetFuse(max_cost_usd=1.0)
+        extract.reserve(run_id, current_cost=0.0, amount=0.6)
+        with pytest.raises(BudgetExceededError):
+            summarize.reserve(run_id, current_cost=0.0, amount=0.6)
+        extract.commit(run_id, 0.6)
+        summarize.reserve(run_id, current_cost=0.0, amount=0.6)
+        summarize.release(run_id, 0.6)
+        assert extract.reserved(run_id) == 0.0
+
+
+class TestBudgetTree:
+    """Test hierarchical tenant/run/node budgets."""
+
+    def test_spend_rolls_up(self):
+        """Test a node's spend is added to its run, tenant and the global total."""
+        from agentcircuit.budget import BudgetTree
+        tree = BudgetTree()
+        tree.record_cost(("acme", "run-1", "extract"), 0.5)
+        tree.record_cost(("acme", "run-2", "extract"), 0.25)
+        tree.record_cost(("globex", "run-3", "extract"), 1.0)
+
+        assert tree.spent(("acme", "run-1", "extract")) == 0.5
+        assert tree.spent(("acme", "run-1")) == 0.5
+        assert tree.spent(("acme",)) == 0.75
+        assert tree.spent() == 1.75
+
+    @pytest.mark.parametrize("kwargs,level", [
+        ({"max_cost_usd": 1.0}, "global"),
+        ({"tenant_limit": 1.0}, "tenant acme"),
+        ({"run_limit": 1.0}, "run acme/run-1"),
+        ({"node_limit": 1.0}, "node acme/run-1/extract"),
+    ])
+    def test_any_level_trips(self, kwargs, level):
+        """Test every level's limit refuses reservations."""
+        from agentcircuit.budget import BudgetTree
+        tree = BudgetTree(**kwargs)
+        path = ("acme", "run-1", "extract")
+        tree.reserve(path, 0.8)
+        with pytest.raises(BudgetExceededError, match=f"at {level}"):
+            tree.reserve(path, 0.3)
+        assert tree.spent(path) == pytest.approx(0.8)
+
+    def test_set_limit_overrides_default(self):
+        """Test a tenant-specific limit replaces the level default."""
+        from agentcircuit.budget import BudgetTree
+        tree = BudgetTree(tenant_limit=1.0)
+        tree.set_limit(("enterprise",), 100.0)
+        tree.reserve(("enterprise", "r", "n"), 50.0)
+        with pytest.raises(BudgetExceededError):
+            tree.reserve(("free", "r", "n"), 2.0)
+        tree.set_limit(("enterprise",), None)
+        assert tree.limit(("enterprise",)) == 1.0
+
+    def test_commit_and_release(self):
+        """Test holds are settled on every level."""
+        from agentcircuit.budget import BudgetTree
+        tree = BudgetTree(max_cost_usd=10.0)
+        path = ("acme", "run-1", "extract")
+        tree.reserve(path, 1.0)
+        tree.commit(path, 1.0, 0.25)
+        tree.reserve(path, 2.0)
+        tree.release(path, 2.0)
+        assert tree.spent(("acme",)) == pytest.approx(0.25)
+        assert tree.spent() == pytest.approx(0.25)
+
+    def test_forget_drops_run_counters(self):
+        """Test forget removes a run's counters but keeps the tenant total."""
+        from agentcircuit.budget import BudgetTree
+        tree = BudgetTree()
+        tree.record_cost(("acme", "run-1", "a"), 1.0)
+        tree.record_cost(("acme", "run-1", "b"), 1.0)
+        tree.forget(("acme", "run-1"))
+        assert tree.spent(("acme", "run-1")) == 0.0
+        assert tree.spent(("acme", "run-1", "a")) == 0.0
+        assert tree.spent(("acme",)) == 2.0
+
+    def test_max_runs_drops_least_recent_runs(self):
+        """Test only max_runs runs keep counters, the tenant total is kept."""
+        from agentcircuit.budget import BudgetTree
+        tree = BudgetTree(max_runs=2)
+        tree.record_cost(("acme", "run-1", "a"), 1.0)
+        tree.record_cost(("acme", "run-2", "a"), 1.0)
+        tree.record_cost(("acme", "run-1", "b"), 1.0)  # run-1 is now the most recent
+        tree.record_cost(("acme", "run-3", "a"), 1.0)
+
+        assert tree.spent(("acme", "run-2")) == 0.0
+        assert tree.spent(("acme", "run-2", "a")) == 0.0
+        assert tree.spent(("acme", "run-1")) == 2.0
+        assert tree.spent(("acme", "run-3", "a")) == 1.0
+        assert tree.spent(("acme",)) == 4.0
+        assert tree.spent() == 4.0
+        assert sum(len(counters) for counters in tree._spent) == 6
+
+    def test_many_runs_stay_bounded(self):
+        """Test a long-lived tree holds counters for at most max_runs runs."""
+        from agentcircuit.budget import BudgetTree
+        tree = BudgetTree(max_runs=50)
+        for run in range(1000):
+            tree.reserve(("acme", f"run-{run}", "node"), 0.01)
+            tree.commit(("acme", f"run-{run}", "node"), 0.01, 0.01)
+        # tenant + 50 runs + their 50 nodes
+        assert sum(len(counters) for counters in tree._spent) == 101
+        assert tree.spent(("acme",)) == pytest.approx(10.0)
+
+    def test_concurrent_runs_exact_totals(self):
+        """Test concurrent updates across many runs lose nothing."""
+        from agentcircuit.budget import BudgetTree
+        tree = BudgetTree(stripes=8)
+
+        def worker(run):
+            for _ in range(200):
+                tree.record_cost(("acme", f"run-{run}", "node"), 0.01)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert tree.spent(("acme",)) == pytest.approx(32.0)
+        assert tree.spent() == pytest.approx(32.0)
+        assert tree.spent(("acme", "run-3")) == pytest.approx(2.0)
+
+    def test_invalid_limits_raise(self):
+        """Test non-positive limits and bad paths are rejected."""
+        from agentcircuit.budget import BudgetTree
+        with pytest.raises(ValueError):
+            BudgetTree(run_limit=0)
+        with pytest.raises(ValueError):
+            BudgetTree().set_limit((), 1.0)
+
+
+class TestGlobalBudgetLedger:
+    """Test GlobalBudget shared across processes through a ledger."""
+
+    @pytest.fixture(params=["sqlite", "shared_memory"])
+    def make_ledger(self, request, tmp_path):
+        """Factory for ledgers of one kind that all share the same budget."""
+        import uuid
+        from agentcircuit.budget import SQLiteLedger, SharedMemoryLedger
+        name = f"ac_test_{uuid.uuid4().hex[:12]}"
+        ledgers = []
+
+        def make():
+            if request.param == "sqlite":
+                ledger = SQLiteLedger(str(tmp_path / "budget.db"), name=name)
+            else:
+                ledger = SharedMemoryLedger(name, lock_dir=str(tmp_path))
+            ledgers.append(ledger)
+            return ledger
+
+        yield make
+        if request.param == "shared_memory":
+            ledgers[0].unlink()
+        for ledger in ledgers:
+            ledger.close()
+
+    def test_spend_is_shared(self, make_ledger):
+        """Test budgets on the same ledger see each other's spend."""
+        first = GlobalBudget(max_cost_usd=1.0, ledger=make_ledger())
+        second = GlobalBudget(max_cost_usd=1.0, ledger=make_ledger(), max_staleness=0.0)
+
+        first.record_cost(0.6)
+        second.record_cost(0.6)
+        assert first.total_spent == pytest.approx(1.2)
+        with pytest.raises(BudgetExceededError):
+            second.check_cost()
+
+    def test_checks_use_cached_spend(self, make_ledger):
+        """Test checks read the ledger at most once per max_staleness."""
+        ledger = make_ledger()
+        budget = GlobalBudget(max_cost_usd=1.0, ledger=ledger, max_staleness=60.0)
+        GlobalBudget(max_cost_usd=1.0, ledger=make_ledger()).record_cost(5.0)
+
+        budget.check_cost()  # Stale copy, within max_staleness
+        budget._synced_at -= 61.0
+        with pytest.raises(BudgetExceededError):
+            budget.check_cost()
+
+    def test_start_time_is_shared(self, make_ledger):
+        """Test the time limit counts from the ledger's start time."""
+        first = GlobalBudget(max_cost_usd=1.0, ledger=make_ledger())
+        time.sleep(0.05)
+        second = GlobalBudget(max_cost_usd=1.0, max_seconds=60.0, ledger=make_ledger())
+        assert second.elapsed_seconds >= 0.05
+        assert first._start_time == second._start_time
+
+    def test_reset_resets_ledger(self, make_ledger):
+        """Test reset zeroes the shared spend."""
+        first = GlobalBudget(max_cost_usd=1.0, ledger=make_ledger())
+        second = GlobalBudget(max_cost_usd=1.0, ledger=make_ledger())
+        first.record_cost(2.0)
+        second.reset()
+        assert first.total_spent == 0.0
+
+    def test_concurrent_processes(self, make_ledger):
+        """Test spend recorded by several processes is all counted."""
+        import multiprocessing
+        ledger = make_ledger()
+        budget = GlobalBudget(max_cost_usd=100.0, ledger=ledger)
+
+        def worker():
+            for _ in range(50):
+                budget.record_cost(0.01)
+
+        ctx = multiprocessing.get_context("fork")
+        processes = [ctx.Process(target=worker) for _ in range(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        assert budget.total_spent == pytest.approx(2.0)
+
+    def test_reservations_shared(self, make_ledger):
+        """Test holds taken in one budget count against the other."""
+        first = GlobalBudget(max_cost_usd=1.0, ledger=make_ledger())
+        second = GlobalBudget(max_cost_usd=1.0, ledger=make_ledger())
+        first.reserve(0.8)
+        with pytest.raises(BudgetExceededError):
+            second.reserve(0.3)
+        first.commit(0.8, 0.5)
+        second.reserve(0.3)
+        assert second.total_spent == pytest.approx(0.8)
+
+    def test_dead_worker_holds_reaped(self, make_ledger):
+        """Test a hold left by a process killed mid-call is reclaimed."""
+        import multiprocessing
+        budget = GlobalBudget(max_cost_usd=1.0, ledger=make_ledger())
+
+        def killed_mid_call():
+            budget.reserve(0.8)
+            os._exit(1)
+
+        child = multiprocessing.get_context("fork").Process(target=killed_mid_call)
+        child.start()
+        child.join()
+        assert budget.total_spent == pytest.approx(0.8)
+
+        # A refused reservation reaps the dead worker's hold and retries
+        budget.reserve(0.5)
+        budget.commit(0.5, 0.1)
+        assert budget.total_spent == pytest.approx(0.1)
+        assert budget.reap_stale_holds() == 0.0
+
+    def test_live_holds_survive_reap(self, make_ledger):
+        """Test reaping leaves the holds of running processes alone."""
+        budget = GlobalBudget(max_cost_usd=1.0, ledger=make_ledger())
+        budget.reserve(0.4)
+        assert budget.reap_stale_holds() == 0.0
+        assert GlobalBudget(max_cost_usd=1.0, ledger=make_ledger()).total_spent == pytest.approx(0.4)
+        budget.release(0.4)
+        assert budget.total_spent == pytest.approx(0.0)
+
+
+# ============================================================================
+# Rate Limiter Tests
+# ============================================================================
+
+class TestRateLimiters:
+    """Test sliding-window, token-bucket and GCRA rate limits."""
+
+    @pytest.fixture(params=["sliding", "bucket", "gcra"])
+    def make_limiter(self, request):
+        """Factory for a limiter allowing `limit` units per `per` seconds."""
+        def make(limit, per=1.0, **kwargs):
+            if request.param == "sliding":
+                return SlidingWindowLimiter(limit, window_seconds=per, **kwargs)
+            if request.param == "bucket":
+                return TokenBucketLimiter(limit, per=per, **kwargs)
+            return GCRALimiter(limit, per=per, **kwargs)
+        return make
+
+    def test_allows_up_to_limit_then_reports_wait(self, make_limiter):
+        """Test the limit can be used at once and the next unit must wait."""
+        limiter = make_limiter(5, per=10.0)
+        assert all(limiter.try_acquire() == 0.0 for _ in range(5))
+        wait = limiter.try_acquire()
+        assert 0 < wait <= 10.0
+
+    def test_amount_above_capacity_never_fits(self, make_limiter):
+        """Test an amount larger than the limit is refused rather than waited on."""
+        limiter = make_limiter(5, unit="tokens")
+        assert limiter.try_acquire(6) == float("inf")
+        with pytest.raises(RateLimitExceededError):
+            limiter.acquire(6)
+        assert limiter.rejections == 1
+
+    def test_acquire_waits_for_capacity(self, make_limiter):
+        """Test acquire sleeps until capacity frees up."""
+        limiter = make_limiter(2, per=0.1)
+        limiter.acquire()
+        limiter.acquire()
+        start = time.monotonic()
+        limiter.acquire()
+        assert time.monotonic() - start >= 0.02
+        assert limiter.delays == 1
+
+    def test_acquire_rejects_past_max_wait(self, make_limiter):
+        """Test acquire raises at once when the wait exceeds max_wait."""
+        limiter = make_limiter(1, per=60.0, max_wait=0.5)
+        limiter.acquire()
+        start = time.monotonic()
+        with pytest.raises(RateLimitExceededError) as exc_info:
+            limiter.acquire()
+        assert time.monotonic() - start < 0.1
+        assert exc_info.value.retry_after > 0.5
+        assert exc_info.value.limit == 1
+
+    def test_acquire_rejects_past_deadline(self, make_limiter):
+        """Test acquire does not sleep past the current deadline."""
+        limiter = make_limiter(1, per=60.0)
+        limiter.acquire()
+        with deadline(0.5):
+            with pytest.raises(RateLimitExceededError):
+                limiter.acquire()
+
+    def test_record_reconciles_estimates(self, make_limiter):
+        """Test record() counts extra usage and negative amounts refund it."""
+        limiter = make_limiter(100, per=60.0, unit="tokens")
+        limiter.acquire(50)
+        limiter.record(40)
+        assert limiter.try_acquire(20) > 0
+        limiter.record(-40)
+        assert limiter.try_acquire(20) == 0.0
+
+    def test_sliding_window_refund_never_exceeds_limit(self):
+        """Test a refund cannot outlive the usage it corrects and over-admit later."""
+        limiter = SlidingWindowLimiter(100, window_seconds=0.2, unit="tokens")
+        limiter.acquire(100)
+        time.sleep(0.05)
+        limiter.record(-90)
+        assert limiter.used == pytest.approx(10)
+        time.sleep(0.18)  # the original usage has left the window
+        assert limiter.used == pytest.approx(0)
+        assert limiter.try_acquire(100) == 0.0
+        assert limiter.try_acquire(90) > 0
+
+    def test_sliding_window_used(self):
+        """Test used reports usage in the window and expires old events."""
+        limiter = SlidingWindowLimiter(10, window_seconds=0.05, unit="usd")
+        limiter.acquire(4)
+        assert limiter.used == pytest.approx(4)
+        time.sleep(0.06)
+        assert limiter.used == pytest.approx(0)
+
+    def test_invalid_settings(self):
+        """Test non-positive limits and unknown units are rejected."""
+        with pytest.raises(ValueError):
+            SlidingWindowLimiter(0)
+        with pytest.raises(ValueError):
+            TokenBucketLimiter(1, unit="bytes")
+
+
+# ============================================================================
+# SpendVelocityFuse Tests
+# ============================================================================
+
+class TestSpendVelocityFuse:
+    """Test the per-step cost/latency anomaly breaker."""
+
+    @staticmethod
+    def _train(fuse, node="node", runs=10, steps=5, storage=None):
+        """Feed normal runs with slightly varying cost and latency."""
+        for r in range(runs):
+            for step in range(steps):
+                fuse.observe(f"train-{r}", node, 0.01 + 0.001 * (step % 3), 1.0 + 0.1 * (step % 2), storage)
+
+    def test_normal_run_passes(self):
+        """Test steps in line with the baseline never trip."""
+        fuse = SpendVelocityFuse(k=4.0, min_samples=20)
+        self._train(fuse)
+        for _ in range(10):
+            fuse.check("run", "node")
+            fuse.observe("run", "node", 0.011, 1.05)
+
+    def test_cost_spike_trips_next_step(self):
+        """Test a sharp rise in cost per step trips before the next step."""
+        fuse = SpendVelocityFuse(k=4.0, min_samples=20)
+        self._train(fuse)
+        fuse.observe("run", "node", 0.011, 1.0)
+        fuse.observe("run", "node", 0.5, 1.0)
+        with pytest.raises(BudgetExceededError, match="cost per step") as exc_info:
+            fuse.check("run", "node")
+        assert exc_info.value.spent > exc_info.value.limit
+        # Other runs and nodes are unaffected
+        fuse.check("other", "node")
+        fuse.check("run", "other-node")
+
+    def test_latency_spike_trips_unless_unwatched(self):
+        """Test latency is watched too, and can be left out via metrics."""
+        for metrics, trips in ((("cost", "latency"), True), (("cost",), False)):
+            fuse = SpendVelocityFuse(min_samples=20, metrics=metrics)
+            self._train(fuse)
+            fuse.observe("run", "node", 0.01, 30.0)
+            if trips:
+                with pytest.raises(BudgetExceededError, match="latency per step"):
+                    fuse.check("run", "node")
+            else:
+                fuse.check("run", "node")
+
+    def test_no_trip_before_min_samples(self):
+        """Test a thin baseline never trips."""
+        fuse = SpendVelocityFuse(min_samples=100)
+        self._train(fuse)
+        fuse.observe("run", "node", 5.0, 1.0)
+        fuse.check("run", "node")
+
+    def test_anomalous_steps_stay_out_of_baseline(self):
+        """Test a runaway run does not drag the baseline up with it."""
+        fuse = SpendVelocityFuse(min_samples=20)
+        self._train(fuse)
+        before = fuse.baseline("node")
+        for _ in range(20):
+            fuse.observe("runaway", "node", 1.0, 1.0)
+        after = fuse.baseline("node")
+        assert after["samples"] == before["samples"]
+        assert after["cost_mean"] == pytest.approx(before["cost_mean"])
+
+    def test_forget_lets_run_resume(self):
+        """Test forget() clears a tripped run."""
+        fuse = SpendVelocityFuse(min_samples=20)
+        self._train(fuse)
+        fuse.observe("run", "node", 1.0, 1.0)
+        with pytest.raises(BudgetExceededError):
+            fuse.check("run", "node")
+        fuse.forget("run")
+        fuse.check("run", "node")
+
+    def test_baseline_matches_plain_statistics_during_warmup(self):
+        """Test the incremental baseline is the plain mean/variance for the first 1/alpha steps."""
+        import statistics
+        fuse = SpendVelocityFuse(baseline_alpha=0.01)
+        costs = [0.01, 0.02, 0.015, 0.03, 0.012]
+        for i, cost in enumerate(costs):
+            fuse.observe(f"run-{i}", "node", cost, 1.0)
+        baseline = fuse.baseline("node")
+        assert baseline["samples"] == 5
+        assert baseline["cost_mean"] == pytest.approx(statistics.mean(costs))
+        assert baseline["cost_std"] == pytest.approx(statistics.pstdev(costs))
+
+    def test_baseline_persists_through_storage(self):
+        """Test a new fuse picks up the saved baseline from storage settings."""
+        from agentcircuit.storage import InMemoryStorage
+        storage = InMemoryStorage()
+        fuse = SpendVelocityFuse(min_samples=20, persist_every=10)
+        self._train(fuse, storage=storage)
+        assert storage.get_setting("spend_velocity:node") is not None
+
+        restarted = SpendVelocityFuse(min_samples=20)
+        assert restarted.baseline("node", storage)["samples"] == 50
+        restarted.observe("run", "node", 1.0, 1.0, storage)
+        with pytest.raises(BudgetExceededError):
+            restarted.check("run", "node", storage)
+
+    def test_invalid_settings(self):
+        """Test bad k, alpha and metrics are rejected."""
+        with pytest.raises(ValueError):
+            SpendVelocityFuse(k=0)
+        with pytest.raises(ValueError):
+            SpendVelocityFuse(alpha=1.5)
+        with pytest.raises(ValueError):
+            SpendVelocityFuse(metrics=("tokens",))
+
+
 # ============================================================================
 # Error Type Tests
 # ============================================================================
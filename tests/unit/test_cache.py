@@ -0,0 +1,131 @@
+"""
+Unit tests for the node result cache tiers.
+"""
+import os
+import tempfile
+import pytest
+
+from agentcircuit.cache import LRUCache, SQLiteCache, ShelveCache, create_cache
+from agentcircuit.fuse import FingerprintSpec
+
+
+@pytest.fixture(params=["memory", "sqlite", "shelve"])
+def cache(request):
+    """Each cache tier, backed by a temporary directory."""
+    with tempfile.TemporaryDirectory() as tmp:
+        if request.param == "memory":
+            instance = create_cache("memory")
+        elif request.param == "sqlite":
+            instance = create_cache("sqlite", db_path=os.path.join(tmp, "cache.db"))
+        else:
+            instance = create_cache("shelve", path=os.path.join(tmp, "cache"))
+        yield instance
+        instance.close()
+
+
+class TestCacheTiers:
+    """Behaviour shared by all tiers."""
+
+    def test_miss_then_hit(self, cache):
+        """Test a stored output is returned for the same key."""
+        key = cache.key("node", "v1", {"q": "x"})
+        assert cache.get(key) == (False, None)
+        cache.set(key, {"answer": 42})
+        assert cache.get(key) == (True, {"answer": 42})
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_clear(self, cache):
+        """Test clear drops all entries."""
+        key = cache.key("node", "", {"q": "x"})
+        cache.set(key, 1)
+        cache.clear()
+        assert cache.get(key) == (False, None)
+
+    def test_ttl_expires(self, cache, monkeypatch):
+        """Test entries older than ttl_seconds are not served."""
+        import agentcircuit.cache as cache_module
+        now = [1000.0]
+        monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+        cache.ttl_seconds = 10
+
+        key = cache.key("node", "", {"q": "x"})
+        cache.set(key, 1)
+        now[0] += 11
+        assert cache.get(key) == (False, None)
+
+
+class TestCacheKeys:
+    """Test what the cache key depends on."""
+
+    def test_key_includes_node_and_version(self):
+        """Test node name and version separate otherwise equal inputs."""
+        cache = LRUCache()
+        state = {"q": "x"}
+        keys = {cache.key("a", "v1", state), cache.key("b", "v1", state), cache.key("a", "v2", state)}
+        assert len(keys) == 3
+
+    def test_fingerprint_ignores_volatile_fields(self):
+        """Test the FingerprintSpec decides which inputs are equal."""
+        cache = LRUCache(fingerprint=FingerprintSpec(exclude=["ts"]))
+        assert cache.key("a", "", {"q": 1, "ts": 1}) == cache.key("a", "", {"q": 1, "ts": 2})
+
+
+class TestLRUCache:
+    """Tests specific to the in-process tier."""
+
+    def test_evicts_least_recent(self):
+        """Test the cache stays within max_size, keeping recently used keys."""
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert len(cache) == 2
+        assert cache.get("b") == (False, None)
+        assert cache.get("a") == (True, 1)
+
+    def test_get_returns_copy(self):
+        """Test callers cannot alter the cached output."""
+        cache = LRUCache()
+        cache.set("a", {"items": [1]})
+        cache.get("a")[1]["items"].append(2)
+        assert cache.get("a") == (True, {"items": [1]})
+
+    def test_set_stores_copy(self):
+        """Test the caller that stored a value cannot alter the cached one."""
+        cache = LRUCache()
+        value = {"items": [1]}
+        cache.set("a", value)
+        value["items"].append("poison")
+        assert cache.get("a") == (True, {"items": [1]})
+
+
+class TestPersistentCaches:
+    """Tests for the on-disk tiers."""
+
+    def test_sqlite_survives_reopen(self):
+        """Test SQLiteCache entries persist across instances."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.db")
+            first = SQLiteCache(db_path=path)
+            first.set("k", {"v": 1})
+            first.close()
+            second = SQLiteCache(db_path=path)
+            assert second.get("k") == (True, {"v": 1})
+            second.close()
+
+    def test_shelve_survives_reopen(self):
+        """Test ShelveCache entries persist across instances."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache")
+            first = ShelveCache(path=path)
+            first.set("k", [1, 2])
+            first.close()
+            second = ShelveCache(path=path)
+            assert second.get("k") == (True, [1, 2])
+            second.close()
+
+    def test_unknown_backend_raises(self):
+        """Test create_cache rejects unknown tiers."""
+        with pytest.raises(ValueError):
+            create_cache("redis")
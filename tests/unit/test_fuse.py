@@ -2,7 +2,10 @@
 Unit tests for the Fuse module - Loop Detection.
 """
 import pytest
-from agentcircuit.fuse import Fuse, LoopError
+from agentcircuit.fuse import (
+    Fuse, CycleDetector, CycleError, FingerprintSpec, LoopError, SimilarityFuse, SketchHistory, hash_state, simhash
+)
+from agentcircuit.storage import InMemoryStorage
 
 
 class TestFuseBasics:
@@ -146,6 +149,49 @@ class TestFuseLoopDetection:
             fuse.check(history=history, current_state=state)
 
 
+class TestFuseRunIndex:
+    """Test loop detection against the storage state index."""
+
+    def _log(self, storage, state, node_id="node"):
+        storage.log_trace(
+            run_id="run",
+            node_id=node_id,
+            input_state=state,
+            output_state={},
+            status="success",
+            state_hash=hash_state(state)
+        )
+
+    def test_check_run_below_limit(self):
+        """Test no trip while the indexed count is below the limit."""
+        fuse = Fuse(limit=2)
+        storage = InMemoryStorage()
+        state = {"input": "repeated"}
+        self._log(storage, state)
+
+        fuse.check_run(storage, "run", "node", fuse._hash_state(state))
+
+    def test_check_run_at_limit(self):
+        """Test trip when the indexed count reaches the limit."""
+        fuse = Fuse(limit=2)
+        storage = InMemoryStorage()
+        state = {"input": "repeated"}
+        self._log(storage, state)
+        self._log(storage, state)
+
+        with pytest.raises(LoopError, match="2 times"):
+            fuse.check_run(storage, "run", "node", fuse._hash_state(state))
+
+    def test_check_run_ignores_other_nodes(self):
+        """Test repeats at a different node do not count."""
+        fuse = Fuse(limit=1)
+        storage = InMemoryStorage()
+        state = {"input": "shared"}
+        self._log(storage, state, node_id="other")
+
+        fuse.check_run(storage, "run", "node", fuse._hash_state(state))
+
+
 class TestLoopError:
     """Test LoopError exception."""
 
@@ -157,3 +203,346 @@ class TestLoopError:
         """Test LoopError preserves message."""
         error = LoopError("Test error message")
         assert str(error) == "Test error message"
+
+
+class TestFuseIncremental:
+    """Test incremental (Merkle-chained) hashing of list fields."""
+
+    def _messages(self, n):
+        return [{"role": "user", "content": f"message {i}"} for i in range(n)]
+
+    def test_same_as_fresh_hash(self):
+        """Test cached and uncached hashes agree for the same content."""
+        messages = self._messages(50)
+        warm = Fuse(incremental=True)
+        for n in range(1, 51):
+            warm_hash = warm._hash_state({"messages": messages[:n], "step": n})
+        cold_hash = Fuse(incremental=True)._hash_state({"messages": self._messages(50), "step": 50})
+
+        assert warm_hash == cold_hash
+
+    def test_detects_changes(self):
+        """Test appends, replacements and shrinking change the hash."""
+        fuse = Fuse(incremental=True)
+        messages = self._messages(10)
+        base = fuse._hash_state({"messages": messages})
+
+        assert fuse._hash_state({"messages": messages + [{"role": "ai", "content": "x"}]}) != base
+        replaced = list(messages)
+        replaced[5] = {"role": "user", "content": "edited"}
+        assert fuse._hash_state({"messages": replaced}) != base
+        assert fuse._hash_state({"messages": messages[:9]}) != base
+        assert fuse._hash_state({"messages": messages}) == base
+
+    def test_only_new_items_serialized(self, monkeypatch):
+        """Test a growing list only hashes the appended items."""
+        import agentcircuit.fuse as fuse_module
+
+        fuse = Fuse(incremental=True)
+        messages = self._messages(100)
+        fuse._hash_state({"messages": messages})
+
+        digested = []
+        real_digest = fuse_module._digest
+        monkeypatch.setattr(fuse_module, "_digest", lambda v: digested.append(v) or real_digest(v))
+        fuse._hash_state({"messages": messages + self._messages(2)})
+
+        assert len(digested) == 2
+
+    def test_loop_detection(self):
+        """Test repeated states still trip the fuse."""
+        fuse = Fuse(limit=2, incremental=True)
+        state = {"messages": self._messages(5)}
+        history = [fuse._hash_state(state), fuse._hash_state(state)]
+
+        with pytest.raises(LoopError):
+            fuse.check(history, state)
+
+    def test_non_dict_state(self):
+        """Test non-dict states fall back to the plain hash."""
+        fuse = Fuse(incremental=True)
+        assert fuse._hash_state([1, 2]) == Fuse()._hash_state([1, 2])
+
+
+class TestFingerprintSpec:
+    """Test field-projected, normalized fingerprints."""
+
+    def test_exclude_volatile_fields(self):
+        """Test excluded paths do not affect the hash."""
+        fuse = Fuse(fingerprint=FingerprintSpec(exclude=["meta.timestamp", "request_id"]))
+        a = {"q": "x", "request_id": 1, "meta": {"timestamp": 1.0, "user": "u"}}
+        b = {"q": "x", "request_id": 2, "meta": {"timestamp": 2.0, "user": "u"}}
+        c = {"q": "x", "request_id": 2, "meta": {"timestamp": 2.0, "user": "v"}}
+
+        assert fuse._hash_state(a) == fuse._hash_state(b)
+        assert fuse._hash_state(a) != fuse._hash_state(c)
+        assert a["meta"]["timestamp"] == 1.0  # input untouched
+
+    def test_include_paths(self):
+        """Test only included paths count."""
+        fuse = Fuse(fingerprint=FingerprintSpec(include=["query", "meta.user"]))
+        a = {"query": "q", "payload": "big" * 100, "meta": {"user": "u", "ts": 1}}
+        b = {"query": "q", "payload": "other", "meta": {"user": "u", "ts": 2}}
+
+        assert fuse._hash_state(a) == fuse._hash_state(b)
+        assert fuse._hash_state(a) != fuse._hash_state({"query": "other", "meta": {"user": "u"}})
+
+    def test_float_rounding_and_whitespace(self):
+        """Test floats are rounded and whitespace collapsed."""
+        fuse = Fuse(fingerprint=FingerprintSpec(float_digits=2, normalize_whitespace=True))
+        a = {"score": 0.12345, "text": "hello   world\n", "items": [{"v": 1.0001}]}
+        b = {"score": 0.12, "text": " hello world", "items": [{"v": 1.0}]}
+
+        assert fuse._hash_state(a) == fuse._hash_state(b)
+
+    def test_last_k_messages(self):
+        """Test only the last k messages are compared."""
+        fuse = Fuse(fingerprint=FingerprintSpec(last_k=2))
+        a = {"messages": ["a", "b", "c", "d"]}
+        b = {"messages": ["z", "c", "d"]}
+
+        assert fuse._hash_state(a) == fuse._hash_state(b)
+        assert fuse._hash_state(a) != fuse._hash_state({"messages": ["c", "e"]})
+
+    def test_empty_spec_matches_plain_hash(self):
+        """Test a default spec hashes like no spec."""
+        state = {"a": 1}
+        assert Fuse(fingerprint=FingerprintSpec())._hash_state(state) == Fuse()._hash_state(state)
+
+    def test_non_dict_state(self):
+        """Test path options ignore non-dict states."""
+        fuse = Fuse(fingerprint=FingerprintSpec(include=["a"], exclude=["b"], last_k=1))
+        assert fuse._hash_state("text") == Fuse()._hash_state("text")
+
+
+class TestCycleDetector:
+    """Test run-level multi-node cycle detection."""
+
+    def test_ping_pong_detected(self):
+        """Test A -> B -> A -> B trips after the configured repeats."""
+        detector = CycleDetector(repeats=3)
+        steps = [("A", {"x": 1}), ("B", {"y": 1})] * 3
+
+        with pytest.raises(CycleError, match="A -> B"):
+            for node, state in steps:
+                detector.observe("run", node, state)
+
+    def test_trips_on_final_repeat_only(self):
+        """Test two repeats of the cycle do not trip with repeats=3."""
+        detector = CycleDetector(repeats=3)
+        for node, state in [("A", {"x": 1}), ("B", {"y": 1})] * 2 + [("A", {"x": 1})]:
+            detector.observe("run", node, state)
+
+        with pytest.raises(CycleError):
+            detector.observe("run", "B", {"y": 1})
+
+    def test_progress_not_flagged(self):
+        """Test alternating nodes with changing states never trip."""
+        detector = CycleDetector(repeats=2)
+        for i in range(50):
+            detector.observe("run", "agent", {"step": i})
+            detector.observe("run", "tools", {"step": i})
+
+    def test_fingerprint_ignores_noise(self):
+        """Test a FingerprintSpec makes slightly different states match."""
+        detector = CycleDetector(repeats=3, fingerprint=FingerprintSpec(exclude=["ts"]))
+        with pytest.raises(CycleError):
+            for i in range(3):
+                detector.observe("run", "A", {"q": "a", "ts": i})
+                detector.observe("run", "B", {"q": "b", "ts": i})
+                detector.observe("run", "C", {"q": "c", "ts": i})
+
+    def test_runs_are_independent(self):
+        """Test transitions from different runs don't combine."""
+        detector = CycleDetector(repeats=2)
+        detector.observe("run-1", "A", {})
+        detector.observe("run-2", "B", {})
+        detector.observe("run-1", "B", {})
+        detector.observe("run-2", "A", {})
+
+    def test_is_a_loop_error(self):
+        """Test existing LoopError handlers also catch cycles."""
+        detector = CycleDetector(max_period=1, repeats=2)
+        detector.observe("run", "A", {})
+        with pytest.raises(LoopError):
+            detector.observe("run", "A", {})
+
+    def test_bounded_runs(self):
+        """Test the least recently active runs are dropped."""
+        detector = CycleDetector(max_runs=2)
+        for run in ("r1", "r2", "r3"):
+            detector.observe(run, "A", {})
+
+        assert list(detector._runs) == ["r2", "r3"]
+        detector.reset("r2")
+        assert list(detector._runs) == ["r3"]
+
+
+class TestSimilarityFuse:
+    """Test near-duplicate loop detection."""
+
+    BASE = "I will search the web for the {} weather in Paris and report back to the user with details"
+
+    def test_simhash_distance(self):
+        """Test reworded texts are close and unrelated texts are far."""
+        a = simhash(self.BASE.format("latest"))
+        b = simhash(self.BASE.format("current"))
+        c = simhash("The quarterly revenue grew by twelve percent driven by subscription sales")
+
+        assert (a ^ b).bit_count() <= 7
+        assert (a ^ c).bit_count() > 16
+
+    def test_trips_on_reworded_loop(self):
+        """Test near-identical states trip after `limit` earlier matches."""
+        fuse = SimilarityFuse(limit=2)
+        fuse.check("run", "node", {"thought": self.BASE.format("latest")})
+        fuse.check("run", "node", {"thought": self.BASE.format("current")})
+
+        with pytest.raises(LoopError, match="Near-duplicate"):
+            fuse.check("run", "node", {"thought": self.BASE.format("newest")})
+
+    def test_distinct_states_pass(self):
+        """Test unrelated states never trip."""
+        fuse = SimilarityFuse(limit=1)
+        for i in range(30):
+            fuse.check("run", "node", {"step": f"step {i} handles topic {i * 7919} with item {i ** 3}"})
+
+    def test_scoped_per_node_and_run(self):
+        """Test repeats at other nodes or runs don't count."""
+        fuse = SimilarityFuse(limit=1)
+        state = {"thought": self.BASE.format("latest")}
+        fuse.check("run", "a", state)
+        fuse.check("run", "b", state)
+        fuse.check("other", "a", state)
+
+    def test_window_bounds_history(self):
+        """Test sketches older than the window are forgotten and unindexed."""
+        fuse = SimilarityFuse(limit=1, window=3)
+        state = {"thought": self.BASE.format("latest")}
+        fuse.check("run", "node", state)
+        for i in range(3):
+            fuse.check("run", "node", {"other": f"unrelated text number {i} about topic {i * 31}"})
+        fuse.check("run", "node", state)
+
+        window = fuse._windows[("run", "node")]
+        assert len(window.sketches) == 3
+        indexed = set().union(*window.buckets.values())
+        assert indexed == set(window.sketches)
+
+    def test_fingerprint_excludes_fields(self):
+        """Test a FingerprintSpec limits what is sketched."""
+        fuse = SimilarityFuse(limit=1, fingerprint=FingerprintSpec(include=["thought"]))
+        fuse.check("run", "node", {"thought": self.BASE.format("latest"), "log": "x" * 50})
+
+        with pytest.raises(LoopError):
+            fuse.check("run", "node", {"thought": self.BASE.format("latest"), "log": "totally different"})
+
+
+class TestSketchHistory:
+    """Test the count-min sketch Fuse history."""
+
+    def test_counts_prior_occurrences(self):
+        """Test add returns the count before the new occurrence."""
+        history = SketchHistory()
+        assert history.add("run", "node", "h1") == 0
+        assert history.add("run", "node", "h1") == 1
+        assert history.add("run", "node", "h2") == 0
+        assert history.count("run", "node", "h1") == 2
+        assert history.count("other", "node", "h1") == 0
+
+    def test_fixed_memory(self):
+        """Test memory depends only on the error bounds."""
+        history = SketchHistory(epsilon=0.01, delta=0.01)
+        before = history.memory_bytes
+        for i in range(5000):
+            history.add(f"run-{i % 10}", "node", f"state-{i}")
+
+        assert history.memory_bytes == before
+        assert history.width == 272 and history.depth == 5
+
+    def test_error_bound(self):
+        """Test unseen states stay within the epsilon * N overestimate."""
+        history = SketchHistory(epsilon=0.01, delta=0.001)
+        n = 2000
+        for i in range(n):
+            history.add("run", "node", f"state-{i}")
+
+        worst = max(history.count("run", "node", f"unseen-{i}") for i in range(200))
+        assert worst <= 0.01 * n
+
+    def test_decay_forgets_old_repeats(self, monkeypatch):
+        """Test repeats older than decay_seconds stop counting."""
+        import agentcircuit.fuse as fuse_module
+
+        now = [1000.0]
+        monkeypatch.setattr(fuse_module.time, "monotonic", lambda: now[0])
+        history = SketchHistory(decay_seconds=60, slices=4)
+        history.add("run", "node", "h")
+        history.add("run", "node", "h")
+
+        now[0] += 30
+        assert history.count("run", "node", "h") == 2
+        history.add("run", "node", "h")
+
+        now[0] += 40  # first two are 70s old, the third 40s
+        assert history.count("run", "node", "h") == 1
+
+        now[0] += 120
+        assert history.count("run", "node", "h") == 0
+
+    def test_long_lived_worker_does_not_trip(self):
+        """Test tens of thousands of distinct states across runs never trip the defaults."""
+        fuse = Fuse(limit=3, history=SketchHistory())
+        for i in range(40000):
+            fuse.check_run(None, f"run-{i // 200}", "node", f"state-{i}")
+
+    def test_long_run_does_not_trip(self):
+        """Test one run of ten thousand distinct states stays under the default limit."""
+        fuse = Fuse(limit=3, history=SketchHistory())
+        for i in range(10000):
+            fuse.check_run(None, "run", "node", f"state-{i}")
+
+    def test_short_runs_stay_exact(self):
+        """Test runs with few distinct states keep a small exact table, not a sketch."""
+        history = SketchHistory(exact_entries=8)
+        for i in range(5):
+            history.add("short", "node", f"state-{i % 3}")
+        sketch = history._sketches[("short", "node")]
+        assert sketch.exact
+        assert history.count("short", "node", "state-0") == 2
+
+        for i in range(20):
+            history.add("long", "node", f"state-{i}")
+        history.add("long", "node", "state-0")
+        assert not history._sketches[("long", "node")].exact
+        assert history.count("long", "node", "state-0") >= 2
+        assert history.count("long", "node", "state-5") >= 1
+
+    def test_memory_bound(self):
+        """Test memory_bytes covers max_runs full sketches."""
+        history = SketchHistory(max_runs=10)
+        assert history.sketch_bytes == history.depth * history.width * 2
+        assert history.memory_bytes == 10 * history.sketch_bytes
+
+    def test_counts_are_per_run_and_node(self):
+        """Test each (run, node) has its own counts, bounded by max_runs."""
+        history = SketchHistory(max_runs=2)
+        history.add("a", "node", "h")
+        history.add("a", "other", "h")
+        assert history.count("a", "node", "h") == 1  # ("a", "other") is now least recent
+        history.add("b", "node", "h")
+        assert history.count("a", "other", "h") == 0
+        assert history.count("a", "node", "h") == 1
+        assert history.count("b", "node", "h") == 1
+
+        history.forget("b")
+        assert history.count("b", "node", "h") == 0
+
+    def test_fuse_uses_history(self):
+        """Test Fuse.check_run counts from the sketch without storage."""
+        fuse = Fuse(limit=2, history=SketchHistory())
+        fuse.check_run(None, "run", "node", "h")
+        fuse.check_run(None, "run", "node", "h")
+
+        with pytest.raises(LoopError, match="2 times"):
+            fuse.check_run(None, "run", "node", "h")
@@ -375,3 +375,143 @@ class TestMedicJSONParsing:
         )
 
         assert result == {"key": "value"}
+
+
+# ============================================================================
+# Deadline Tests
+# ============================================================================
+
+class TestMedicDeadline:
+    """Test that no recovery work starts after the deadline."""
+
+    def test_recovery_not_started_after_deadline(self):
+        """Test Medic refuses to call the LLM once the deadline has passed."""
+        from agentcircuit.budget import deadline
+        llm = Mock(return_value='{"message": "fixed", "status": "ok"}')
+        medic = Medic(llm_callable=llm)
+
+        with deadline(-1.0):
+            with pytest.raises(MedicError, match="Deadline exceeded"):
+                medic.attempt_recovery(
+                    error=ValueError("bad output"),
+                    input_state={},
+                    raw_output="{}",
+                    node_id="n",
+                    recovery_attempts=1,
+                )
+        llm.assert_not_called()
+
+    def test_strategy_chain_stops_at_deadline(self):
+        """Test StrategyChain starts no strategy after the deadline."""
+        from agentcircuit.budget import deadline
+        from agentcircuit.errors import ErrorClassifier
+        from agentcircuit.strategies import StrategyChain, JSONRepairStrategy
+
+        strategy = JSONRepairStrategy()
+        strategy.repair = Mock(return_value={"ok": True})
+        chain = StrategyChain(strategies=[strategy])
+        classified = ErrorClassifier.classify(json.JSONDecodeError("bad", "{", 0))
+
+        with deadline(-1.0):
+            with pytest.raises(json.JSONDecodeError):
+                chain.execute(classified, {}, "{")
+        strategy.repair.assert_not_called()
+        assert chain.execute(classified, {}, "{") == {"ok": True}
+
+    def test_backoff_skips_sleep_past_deadline(self):
+        """Test RetryWithBackoffStrategy does not sleep past the deadline."""
+        from agentcircuit.budget import deadline
+        from agentcircuit.errors import ErrorClassifier
+        from agentcircuit.strategies import RetryConfig, RetryWithBackoffStrategy
+
+        strategy = RetryWithBackoffStrategy(RetryConfig(base_delay=30.0))
+        classified = ErrorClassifier.classify(TimeoutError("timed out"))
+
+        with patch("agentcircuit.strategies.time.sleep") as sleep:
+            with deadline(1.0):
+                with pytest.raises(TimeoutError):
+                    strategy.repair(classified, {}, None)
+        sleep.assert_not_called()
+
+    def test_provider_chain_skips_after_deadline(self):
+        """Test ProviderChain tries no provider once the deadline has passed."""
+        from agentcircuit.budget import deadline
+        from agentcircuit.errors import ProviderError
+        from agentcircuit.providers import CustomProvider, ModelConfig, ProviderChain, ProviderType
+
+        llm = Mock(return_value="ok")
+        chain = ProviderChain([CustomProvider(ModelConfig(provider=ProviderType.CUSTOM, model_id="m"), llm)])
+
+        with deadline(-1.0):
+            with pytest.raises(ProviderError, match="deadline exceeded"):
+                chain.complete("prompt")
+        llm.assert_not_called()
+        assert chain.complete("prompt") == "ok"
+
+
+class TestProviderChainRateLimits:
+    """Test ProviderChain skipping rate-limited providers."""
+
+    @staticmethod
+    def _provider(name, llm, limiter):
+        from agentcircuit.providers import CustomProvider, ModelConfig, ProviderType
+        config = ModelConfig(provider=ProviderType.CUSTOM, model_id=name, rate_limits=[limiter])
+        return CustomProvider(config, llm)
+
+    def test_skips_saturated_provider(self):
+        """Test the chain moves on to the next provider instead of waiting."""
+        from agentcircuit.budget import SlidingWindowLimiter
+        from agentcircuit.providers import ProviderChain
+
+        primary, backup = Mock(return_value="primary"), Mock(return_value="backup")
+        chain = ProviderChain([
+            self._provider("a", primary, SlidingWindowLimiter(1, window_seconds=60)),
+            self._provider("b", backup, SlidingWindowLimiter(10, window_seconds=60)),
+        ])
+
+        assert chain.complete("prompt") == "primary"
+        assert chain.complete("prompt") == "backup"
+        assert primary.call_count == 1
+
+    def test_all_limited_raises_past_max_wait(self):
+        """Test RateLimitExceededError when no provider frees up in time."""
+        from agentcircuit.budget import SlidingWindowLimiter
+        from agentcircuit.errors import RateLimitExceededError
+        from agentcircuit.providers import ProviderChain
+
+        llm = Mock(return_value="ok")
+        chain = ProviderChain([
+            self._provider("a", llm, SlidingWindowLimiter(1, window_seconds=60, max_wait=1.0)),
+        ])
+        chain.complete("prompt")
+        with pytest.raises(RateLimitExceededError, match="rate limited"):
+            chain.complete("prompt")
+        assert llm.call_count == 1
+
+    def test_all_limited_waits_for_soonest(self):
+        """Test the chain sleeps for the first provider to free up."""
+        from agentcircuit.budget import TokenBucketLimiter
+        from agentcircuit.providers import ProviderChain
+
+        llm = Mock(return_value="ok")
+        chain = ProviderChain([self._provider("a", llm, TokenBucketLimiter(20, per=1.0, capacity=1))])
+        chain.complete("prompt")
+        assert chain.complete("prompt") == "ok"
+        assert llm.call_count == 2
+
+    def test_token_limit_refunded_when_later_limit_refuses(self):
+        """Test capacity taken from one limit is returned if another refuses."""
+        from agentcircuit.budget import SlidingWindowLimiter
+        from agentcircuit.providers import CustomProvider, ModelConfig, ProviderChain, ProviderType
+
+        tokens = SlidingWindowLimiter(1000, window_seconds=60, unit="tokens")
+        requests = SlidingWindowLimiter(1, window_seconds=60, max_wait=0)
+        config = ModelConfig(provider=ProviderType.CUSTOM, model_id="m", rate_limits=[tokens, requests])
+        chain = ProviderChain([CustomProvider(config, Mock(return_value="ok"))])
+
+        chain.complete("x" * 400)
+        used = tokens.used
+        from agentcircuit.errors import RateLimitExceededError
+        with pytest.raises(RateLimitExceededError):
+            chain.complete("x" * 400)
+        assert tokens.used == pytest.approx(used)
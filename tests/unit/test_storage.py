@@ -8,7 +8,8 @@ import tempfile
 import shutil
 from datetime import datetime
 
-from agentcircuit.storage import Storage
+from agentcircuit.fuse import hash_state
+from agentcircuit.storage import Storage, InMemoryStorage, StorageConfig, create_storage
 
 
 class TestStorageBasics:
@@ -244,6 +245,77 @@ class TestStorageRunCost:
         assert abs(cost - 0.3) < 0.001  # Float comparison
 
 
+class TestStorageRunCostLedger:
+    """Test the incrementally maintained per-run cost ledger."""
+
+    def test_ledger_table_updated_with_trace(self, temp_db_path):
+        """Test run_totals is written alongside each trace."""
+        storage = Storage(db_path=temp_db_path)
+        for cost in (0.25, 0.5):
+            storage.log_trace(
+                run_id="ledger-run",
+                node_id="node",
+                input_state={},
+                output_state={},
+                status="success",
+                estimated_cost=cost
+            )
+
+        import sqlite3
+        conn = sqlite3.connect(temp_db_path)
+        total = conn.execute(
+            "SELECT total_cost FROM run_totals WHERE run_id = ?", ("ledger-run",)
+        ).fetchone()[0]
+        conn.close()
+        assert total == pytest.approx(0.75)
+        assert storage.get_run_cost("ledger-run") == pytest.approx(0.75)
+
+    def test_ledger_backfilled_for_existing_database(self, temp_db_path):
+        """Test a database created before run_totals gets its ledger rebuilt."""
+        storage = Storage(db_path=temp_db_path)
+        storage.log_trace(
+            run_id="old-run",
+            node_id="node",
+            input_state={},
+            output_state={},
+            status="success",
+            estimated_cost=0.4
+        )
+
+        import sqlite3
+        conn = sqlite3.connect(temp_db_path)
+        conn.execute("DROP TABLE run_totals")
+        conn.commit()
+        conn.close()
+
+        reopened = Storage(db_path=temp_db_path)
+        assert reopened.get_run_cost("old-run") == pytest.approx(0.4)
+
+    def test_in_memory_ledger_rebuilt_on_prune(self):
+        """Test pruning old traces removes their cost from the ledger."""
+        storage = InMemoryStorage()
+        storage.log_trace(
+            run_id="run",
+            node_id="node",
+            input_state={},
+            output_state={},
+            status="success",
+            estimated_cost=1.0
+        )
+        storage.get_run_history("run")[0]["timestamp"] = "2000-01-01T00:00:00"
+        storage.log_trace(
+            run_id="run",
+            node_id="node",
+            input_state={},
+            output_state={},
+            status="success",
+            estimated_cost=0.5
+        )
+
+        assert storage.prune_old_traces(days=30) == 1
+        assert storage.get_run_cost("run") == pytest.approx(0.5)
+
+
 class TestStorageRunHistory:
     """Test run history retrieval."""
 
@@ -290,6 +362,55 @@ class TestStorageRunHistory:
         assert history[0]["diagnosis"] == "Fixed validation error"
 
 
+class TestStorageStateIndex:
+    """Test the (run_id, node_id, state_hash) index used by the Fuse."""
+
+    @pytest.fixture(params=["sqlite", "memory"])
+    def storage(self, request, temp_db_path):
+        if request.param == "sqlite":
+            return Storage(db_path=temp_db_path)
+        return InMemoryStorage()
+
+    def test_count_state_empty(self, storage):
+        """Test unseen state counts as zero."""
+        assert storage.count_state("run", "node", hash_state({"a": 1})) == 0
+
+    def test_count_state_scoped_by_run_and_node(self, storage):
+        """Test counts are tracked per run and per node."""
+        state = {"a": 1}
+        for run_id, node_id in [("r1", "n1"), ("r1", "n1"), ("r1", "n2"), ("r2", "n1")]:
+            storage.log_trace(
+                run_id=run_id,
+                node_id=node_id,
+                input_state=state,
+                output_state={},
+                status="success",
+                state_hash=hash_state(state)
+            )
+
+        state_hash = hash_state(state)
+        assert storage.count_state("r1", "n1", state_hash) == 2
+        assert storage.count_state("r1", "n2", state_hash) == 1
+        assert storage.count_state("r2", "n1", state_hash) == 1
+
+    def test_no_state_hash_not_indexed(self, storage):
+        """Test traces logged without a hash (no Fuse) are neither hashed nor counted."""
+        storage.log_trace(run_id="r", node_id="n", input_state={"a": 1}, output_state={}, status="success")
+        assert storage.count_state("r", "n", hash_state({"a": 1})) == 0
+
+    def test_explicit_state_hash_used(self, storage):
+        """Test a caller-supplied hash is indexed as-is."""
+        storage.log_trace(
+            run_id="r",
+            node_id="n",
+            input_state={"a": 1},
+            output_state={},
+            status="success",
+            state_hash="custom"
+        )
+        assert storage.count_state("r", "n", "custom") == 1
+
+
 class TestStorageMigrations:
     """Test database migrations."""
 
@@ -338,3 +459,499 @@ class TestStorageMigrations:
         # Should not raise
         history = storage.get_run_history("migration-test")
         assert len(history) == 1
+
+    def test_migration_backfills_state_hash(self, temp_db_path):
+        """Test traces written before state_hash existed are indexed."""
+        os.makedirs(os.path.dirname(temp_db_path), exist_ok=True)
+
+        import sqlite3
+        conn = sqlite3.connect(temp_db_path)
+        conn.execute("""
+            CREATE TABLE traces (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT,
+                node_id TEXT,
+                input_state TEXT,
+                output_state TEXT,
+                status TEXT,
+                cost_tokens INTEGER,
+                recovery_attempts INTEGER,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute(
+            "INSERT INTO traces (run_id, node_id, input_state, output_state, status) VALUES (?, ?, ?, ?, ?)",
+            ("old-run", "node", json.dumps({"q": "x"}), "{}", "success")
+        )
+        conn.commit()
+        conn.close()
+
+        storage = Storage(db_path=temp_db_path)
+        assert storage.count_state("old-run", "node", hash_state({"q": "x"})) == 1
+
+
+class TestStorageWriteBehind:
+    """Test buffered (write-behind) trace logging."""
+
+    @pytest.fixture
+    def storage(self, temp_db_path):
+        from agentcircuit.storage import StorageConfig
+        config = StorageConfig(db_path=temp_db_path, write_behind=True, batch_size=50, flush_interval=60)
+        storage = Storage(db_path=temp_db_path, config=config)
+        yield storage
+        storage.close()
+
+    def _log(self, storage, i, cost=0.1):
+        return storage.log_trace(
+            run_id="wb-run",
+            node_id="node",
+            input_state={"i": i},
+            output_state={},
+            status="success",
+            estimated_cost=cost,
+            state_hash=hash_state({"i": i})
+        )
+
+    def test_log_trace_does_not_commit_synchronously(self, storage, temp_db_path):
+        """Test traces are queued rather than committed on the caller's thread."""
+        assert self._log(storage, 0) == -1
+
+        import sqlite3
+        conn = sqlite3.connect(temp_db_path)
+        count = conn.execute("SELECT COUNT(*) FROM traces").fetchone()[0]
+        conn.close()
+        assert count == 0
+
+    def test_cost_and_state_counts_include_pending(self, storage):
+        """Test budget and Fuse reads see traces that are still queued."""
+        self._log(storage, 0, cost=0.25)
+        self._log(storage, 0, cost=0.25)
+
+        assert storage.get_run_cost("wb-run") == pytest.approx(0.5)
+        assert storage.count_state("wb-run", "node", hash_state({"i": 0})) == 2
+
+    def test_flush_commits_queue(self, storage):
+        """Test flush() writes everything queued so far."""
+        for i in range(120):
+            self._log(storage, i)
+        storage.flush()
+
+        assert len(storage.get_run_history("wb-run")) == 120
+        assert storage.get_run_cost("wb-run") == pytest.approx(12.0)
+        assert storage._pending_costs == {}
+        assert storage._pending_states == {}
+
+    def test_batch_size_triggers_commit(self, temp_db_path):
+        """Test a full batch is committed without waiting for the interval."""
+        from agentcircuit.storage import StorageConfig
+        import time
+        config = StorageConfig(db_path=temp_db_path, write_behind=True, batch_size=5, flush_interval=60)
+        storage = Storage(db_path=temp_db_path, config=config)
+        for i in range(5):
+            self._log(storage, i)
+
+        deadline = time.time() + 5
+        while storage._pending_costs and time.time() < deadline:
+            time.sleep(0.01)
+        assert storage._pending_costs == {}
+        storage.close()
+
+    def test_close_flushes_and_stops_writer(self, storage, temp_db_path):
+        """Test close() drains the queue before stopping."""
+        self._log(storage, 0)
+        storage.close()
+
+        assert not storage._writer.is_alive()
+        assert len(Storage(db_path=temp_db_path).get_run_history("wb-run")) == 1
+
+
+class TestStorageConnections:
+    """Test persistent per-thread connections and the pragma profile."""
+
+    def test_connection_reused_within_thread(self, temp_db_path):
+        """Test repeated operations on one thread share a connection."""
+        storage = Storage(db_path=temp_db_path)
+        with storage._get_connection() as first:
+            pass
+        storage.get_run_cost("any")
+        with storage._get_connection() as second:
+            pass
+        assert first is second
+
+    def test_separate_connection_per_thread(self, temp_db_path):
+        """Test each thread gets its own connection."""
+        import threading
+        storage = Storage(db_path=temp_db_path)
+        seen = []
+
+        def grab():
+            with storage._get_connection() as conn:
+                seen.append(conn)
+
+        threads = [threading.Thread(target=grab) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert seen[0] is not seen[1]
+
+    def test_exited_thread_connection_closed(self, temp_db_path):
+        """Test connections of finished threads are closed rather than kept until close()."""
+        import sqlite3
+        import threading
+        storage = Storage(db_path=temp_db_path)
+        storage.get_run_cost("main")
+        opened = []
+
+        def work():
+            storage.get_run_cost("any")
+            with storage._get_connection() as conn:
+                opened.append(conn)
+
+        for _ in range(50):
+            t = threading.Thread(target=work)
+            t.start()
+            t.join()
+
+        assert len(storage._connections) == 1
+        with pytest.raises(sqlite3.ProgrammingError):
+            opened[0].execute("SELECT 1")
+        storage.close()
+
+    def test_pragma_profile_applied(self, temp_db_path):
+        """Test the configured pragmas are set on the connection."""
+        from agentcircuit.storage import StorageConfig
+        config = StorageConfig(db_path=temp_db_path, synchronous="FULL", cache_size=-4000, busy_timeout_ms=1234)
+        storage = Storage(db_path=temp_db_path, config=config)
+        with storage._get_connection() as conn:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -4000
+            assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+
+    def test_failed_write_does_not_leave_open_transaction(self, temp_db_path):
+        """Test a failed statement is rolled back before the connection is reused."""
+        storage = Storage(db_path=temp_db_path)
+        with pytest.raises(Exception):
+            with storage._get_connection() as conn:
+                conn.execute("INSERT INTO global_settings (key, value) VALUES ('k', 'v')")
+                raise RuntimeError("boom")
+        assert storage.get_setting("k") is None
+
+    def test_close_closes_connections(self, temp_db_path):
+        """Test close() releases connections and later calls reconnect."""
+        storage = Storage(db_path=temp_db_path)
+        storage.set_setting("k", "v")
+        storage.close()
+        assert storage._connections == []
+        assert storage.get_setting("k") == "v"
+
+
+class TestInMemoryStorage:
+    """Test the run-bucketed, thread-safe in-memory backend."""
+
+    def _log(self, storage, run_id, node_id="node", cost=0.0):
+        return storage.log_trace(
+            run_id=run_id,
+            node_id=node_id,
+            input_state={"run": run_id},
+            output_state={},
+            status="success",
+            estimated_cost=cost
+        )
+
+    def test_history_scoped_to_run(self):
+        """Test a run's history only contains its own traces."""
+        storage = InMemoryStorage()
+        for i in range(10):
+            self._log(storage, f"run-{i % 3}")
+
+        history = storage.get_run_history("run-1")
+        assert len(history) == 3
+        assert all(h["run_id"] == "run-1" for h in history)
+        assert storage.get_run_history("missing") == []
+
+    def test_node_history_index(self):
+        """Test per-node history within a run."""
+        storage = InMemoryStorage()
+        self._log(storage, "r", node_id="a")
+        self._log(storage, "r", node_id="b")
+        self._log(storage, "r", node_id="a")
+
+        assert [h["node_id"] for h in storage.get_node_history("r", "a")] == ["a", "a"]
+        assert storage.get_node_history("r", "missing") == []
+
+    def test_concurrent_logging_ids_unique_and_ordered(self):
+        """Test IDs are unique across threads and ordered within each run."""
+        import threading
+        storage = InMemoryStorage(shards=4)
+
+        def worker(n):
+            for _ in range(200):
+                self._log(storage, f"run-{n % 5}", cost=0.01)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        all_ids = []
+        for r in range(5):
+            ids = [h["id"] for h in storage.get_run_history(f"run-{r}")]
+            assert ids == sorted(ids)
+            all_ids.extend(ids)
+            assert storage.get_run_cost(f"run-{r}") == pytest.approx(4.0)
+        assert len(all_ids) == len(set(all_ids)) == 2000
+
+    def test_prune_drops_empty_runs(self):
+        """Test runs whose traces are all pruned disappear entirely."""
+        storage = InMemoryStorage()
+        self._log(storage, "old", cost=1.0)
+        storage.get_run_history("old")[0]["timestamp"] = "2000-01-01T00:00:00"
+
+        assert storage.prune_old_traces(days=30) == 1
+        assert storage.get_run_history("old") == []
+        assert storage.get_run_cost("old") == 0.0
+
+
+class TestInMemoryStorageEviction:
+    """Test bounded InMemoryStorage evicts whole runs."""
+
+    def _log(self, storage, run_id, payload="x"):
+        return storage.log_trace(
+            run_id=run_id,
+            node_id="node",
+            input_state={"payload": payload},
+            output_state={},
+            status="success",
+            estimated_cost=0.01
+        )
+
+    def test_unbounded_by_default(self):
+        """Test nothing is evicted without limits."""
+        storage = InMemoryStorage()
+        for i in range(200):
+            self._log(storage, f"run-{i}")
+
+        assert storage.eviction_stats["evicted_runs"] == 0
+        assert len(storage.get_run_history("run-0")) == 1
+
+    def test_max_traces_evicts_oldest_runs(self):
+        """Test the least recently written runs are evicted first."""
+        storage = InMemoryStorage(shards=1, max_traces=10, active_seconds=0)
+        for i in range(5):
+            self._log(storage, "old")
+        for i in range(5):
+            self._log(storage, "new")
+        self._log(storage, "newest")
+
+        assert storage.get_run_history("old") == []
+        assert storage.get_run_cost("old") == 0.0
+        assert len(storage.get_run_history("new")) == 5
+        stats = storage.eviction_stats
+        assert stats["evicted_runs"] == 1
+        assert stats["evicted_traces"] == 5
+        assert stats["traces"] == 6
+
+    def test_recent_write_protects_run(self):
+        """Test writing to a run moves it to the back of the eviction order."""
+        storage = InMemoryStorage(shards=1, max_traces=3, active_seconds=0)
+        self._log(storage, "a")
+        self._log(storage, "b")
+        self._log(storage, "a")
+        self._log(storage, "c")
+
+        assert storage.get_run_history("b") == []
+        assert len(storage.get_run_history("a")) == 2
+
+    def test_recently_written_runs_kept_over_capacity(self):
+        """Test runs still being written keep their cost and state counts."""
+        storage = InMemoryStorage(shards=1, max_traces=3)
+        storage.log_trace(run_id="a", node_id="node", input_state={}, output_state={},
+                          status="success", estimated_cost=5.0)
+        for run_id in ("b", "c", "d"):
+            self._log(storage, run_id)
+
+        assert storage.get_run_cost("a") == 5.0
+        assert storage.eviction_stats["evicted_runs"] == 0
+
+        storage._bucket("a").last_write -= 600  # idle past active_seconds
+        self._log(storage, "e")
+        assert storage.get_run_cost("a") == 0.0
+        assert storage.eviction_stats["evicted_runs"] >= 1
+
+    def test_active_run_never_evicted(self):
+        """Test a single run larger than the budget is kept."""
+        storage = InMemoryStorage(shards=4, max_traces=5)
+        for i in range(20):
+            self._log(storage, "only")
+
+        assert len(storage.get_run_history("only")) == 20
+
+    def test_max_bytes(self):
+        """Test the approximate byte budget."""
+        storage = InMemoryStorage(shards=2, max_bytes=2000, active_seconds=0)
+        for i in range(50):
+            self._log(storage, f"run-{i}", payload="x" * 100)
+
+        stats = storage.eviction_stats
+        assert stats["evicted_runs"] > 0
+        assert stats["approx_bytes"] <= 2000
+        assert len(storage.get_run_history("run-49")) == 1
+
+    def test_retention_expires_idle_runs(self):
+        """Test runs idle past retention_days are evicted."""
+        storage = InMemoryStorage(shards=1, retention_days=1)
+        self._log(storage, "stale")
+        storage._bucket("stale").last_write -= 2 * 86400
+        self._log(storage, "fresh")
+
+        assert storage.get_run_history("stale") == []
+        assert storage.eviction_stats["evicted_runs"] == 1
+
+    def test_config_limits(self):
+        """Test StorageConfig limits apply when pruning is enabled."""
+        storage = create_storage("memory", config=StorageConfig(max_traces=4))
+        assert storage.max_traces == 4
+
+        unbounded = InMemoryStorage(config=StorageConfig(enable_pruning=False))
+        assert unbounded.max_traces is None
+
+    def test_prune_updates_accounting(self):
+        """Test prune_old_traces keeps the capacity counters in sync."""
+        storage = InMemoryStorage(max_traces=100)
+        self._log(storage, "old")
+        self._log(storage, "kept")
+        storage.get_run_history("old")[0]["timestamp"] = "2000-01-01T00:00:00"
+
+        assert storage.prune_old_traces(days=30) == 1
+        assert storage.eviction_stats["traces"] == 1
+
+
+class TestStorageStateDedup:
+    """Test content-addressed state storage."""
+
+    @pytest.fixture
+    def storage(self, temp_db_path):
+        config = StorageConfig(db_path=temp_db_path, dedup_states=True)
+        storage = Storage(db_path=temp_db_path, config=config)
+        yield storage
+        storage.close()
+
+    def _messages(self, n):
+        return [{"role": "user", "content": f"message {i} " + "lorem ipsum " * 10} for i in range(n)]
+
+    def _blob_count(self, storage):
+        with storage._get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM state_blobs").fetchone()[0]
+
+    def test_round_trip(self, storage):
+        """Test states are rebuilt exactly on read."""
+        state = {"messages": self._messages(3), "step": 1, "meta": {"k": "v" * 100}, "tags": ["a"]}
+        output = {"answer": "x" * 200}
+        storage.log_trace(
+            run_id="run", node_id="node", input_state=state, output_state=output, status="success"
+        )
+
+        history = storage.get_run_history("run")
+        assert history[0]["input_state"] == state
+        assert history[0]["output_state"] == output
+
+    def test_non_dict_states(self, storage):
+        """Test list, scalar and None states round-trip."""
+        storage.log_trace(run_id="run", node_id="n", input_state=["a" * 100, 1],
+                          output_state=None, status="success")
+        storage.log_trace(run_id="run", node_id="n", input_state="s" * 100,
+                          output_state=42, status="success")
+
+        history = storage.get_run_history("run")
+        assert history[0]["input_state"] == ["a" * 100, 1]
+        assert history[0]["output_state"] is None
+        assert history[1]["input_state"] == "s" * 100
+        assert history[1]["output_state"] == 42
+
+    def test_repeated_messages_stored_once(self, storage):
+        """Test a growing message history adds one blob per new message."""
+        for step in range(1, 11):
+            storage.log_trace(
+                run_id="run", node_id="node",
+                input_state={"messages": self._messages(step)},
+                output_state={"messages": self._messages(step + 1)},
+                status="success"
+            )
+
+        assert self._blob_count(storage) == 11
+        history = storage.get_run_history("run")
+        assert history[-1]["input_state"]["messages"] == self._messages(10)
+
+    def test_get_traces_returns_full_json(self, storage):
+        """Test get_traces returns state JSON rather than manifests."""
+        state = {"messages": self._messages(2)}
+        storage.log_trace(run_id="run", node_id="node", input_state=state, output_state={}, status="success")
+
+        trace = storage.get_traces()[0]
+        assert json.loads(trace["input_state"]) == state
+
+    def test_prune_collects_orphan_blobs(self, storage):
+        """Test pruning deletes blobs only referenced by pruned traces."""
+        storage.log_trace(run_id="old", node_id="n", input_state={"big": "o" * 200},
+                          output_state={}, status="success")
+        storage.log_trace(run_id="new", node_id="n", input_state={"big": "n" * 200},
+                          output_state={}, status="success")
+        with storage._get_connection() as conn:
+            conn.execute("UPDATE traces SET timestamp = '2000-01-01T00:00:00' WHERE run_id = 'old'")
+            conn.commit()
+
+        assert storage.prune_old_traces(days=30) == 1
+        assert self._blob_count(storage) == 1
+        assert storage.get_run_history("new")[0]["input_state"] == {"big": "n" * 200}
+
+    def test_prune_from_another_instance(self, storage, temp_db_path):
+        """Test a state is rewritten after another instance pruned its blobs."""
+        state = {"big": "s" * 200}
+        storage.log_trace(run_id="old", node_id="n", input_state=state, output_state={}, status="success")
+        with storage._get_connection() as conn:
+            conn.execute("UPDATE traces SET timestamp = '2000-01-01T00:00:00'")
+            conn.commit()
+
+        other = Storage(db_path=temp_db_path, config=StorageConfig(db_path=temp_db_path, dedup_states=True))
+        try:
+            assert other.prune_old_traces(days=30) == 1
+        finally:
+            other.close()
+        assert self._blob_count(storage) == 0
+
+        storage.log_trace(run_id="new", node_id="n", input_state=state, output_state={}, status="success")
+        assert storage.get_run_history("new")[0]["input_state"] == state
+
+    def test_missing_blob_reads_as_none(self, storage):
+        """Test a trace whose blob is gone still reads back."""
+        storage.log_trace(run_id="run", node_id="n", input_state={"big": "m" * 200, "small": 1},
+                          output_state={}, status="success")
+        with storage._get_connection() as conn:
+            conn.execute("DELETE FROM state_blobs")
+            conn.commit()
+
+        assert storage.get_run_history("run")[0]["input_state"] == {"big": None, "small": 1}
+
+    def test_write_behind(self, temp_db_path):
+        """Test dedup works with write-behind batching."""
+        config = StorageConfig(db_path=temp_db_path, dedup_states=True, write_behind=True)
+        storage = Storage(db_path=temp_db_path, config=config)
+        try:
+            for step in range(1, 4):
+                storage.log_trace(run_id="run", node_id="n",
+                                  input_state={"messages": self._messages(step)},
+                                  output_state={}, status="success")
+            history = storage.get_run_history("run")
+            assert [len(h["input_state"]["messages"]) for h in history] == [1, 2, 3]
+        finally:
+            storage.close()
+
+    def test_readable_without_dedup_enabled(self, storage, temp_db_path):
+        """Test deduplicated traces still read back from a plain Storage."""
+        state = {"messages": self._messages(2)}
+        storage.log_trace(run_id="run", node_id="n", input_state=state, output_state={}, status="success")
+
+        plain = Storage(db_path=temp_db_path)
+        assert plain.get_run_history("run")[0]["input_state"] == state